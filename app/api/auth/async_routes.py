@@ -0,0 +1,130 @@
+# app/api/auth/async_routes.py
+# Async variants of the read-heavy catalogue and profile endpoints.
+# They run on the AsyncSession stack and are mounted next to the sync router during the migration.
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import asc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.auth.loaders import build_user_profile, parse_user_include, user_load_options
+from app.api.auth.schemas import UserProfileResponse
+from app.api.formation.loaders import formation_detail_options
+from app.api.formation.schemas import FormationSchema, AcademieOut, EtablissementOut
+from app.core.database import get_async_db, get_async_read_db
+from app.models.Academies import Academie, Etablissement
+from app.models.Formation import Formation
+from app.models.user import User
+
+router = APIRouter()
+
+
+@router.get("/formations/", response_model=List[FormationSchema])
+async def get_formations(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_async_read_db)):
+    limit = min(limit, 10)
+    result = await db.execute(
+        select(Formation)
+        .options(*formation_detail_options())
+        .order_by(Formation.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.get("/formations/{formation_id}", response_model=FormationSchema)
+async def get_formation(formation_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.execute(
+        select(Formation)
+        .options(*formation_detail_options())
+        .where(Formation.id == formation_id)
+    )
+    formation = result.scalars().first()
+    if not formation:
+        raise HTTPException(status_code=404, detail="Formation not found")
+    return formation
+
+
+@router.get("/academies", response_model=List[AcademieOut])
+async def list_academies(q: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    # Only id/name are returned: select the columns so the selectin on etablissements never fires
+    query = select(Academie.id, Academie.name)
+    if q:
+        query = query.where(Academie.name.ilike(f"%{q}%"))
+    rows = (await db.execute(query.order_by(asc(Academie.name)))).all()
+    return [AcademieOut(id=a.id, name=a.name) for a in rows]
+
+
+@router.get("/academies/{academie_id}", response_model=AcademieOut)
+async def get_academie(
+    academie_id: int,
+    with_etablissements: bool = True,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    a = (await db.execute(select(Academie.id, Academie.name).where(Academie.id == academie_id))).first()
+    if not a:
+        raise HTTPException(status_code=404, detail="Académie non trouvée")
+
+    etablissements = None
+    if with_etablissements:
+        rows = await db.execute(
+            select(Etablissement)
+            .where(Etablissement.academie_id == academie_id)
+            .order_by(asc(Etablissement.etablissement), asc(Etablissement.city))
+        )
+        etablissements = [EtablissementOut.from_orm(e) for e in rows.scalars().all()]
+    return AcademieOut(id=a.id, name=a.name, etablissements=etablissements)
+
+
+@router.get("/etablissements", response_model=List[EtablissementOut])
+async def list_etablissements(
+    q: Optional[str] = None,
+    academie_id: Optional[int] = None,
+    city: Optional[str] = None,
+    track: Optional[str] = None,
+    sector: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    base = select(Etablissement)
+
+    if academie_id is not None:
+        base = base.where(Etablissement.academie_id == academie_id)
+    if q:
+        base = base.where(Etablissement.etablissement.ilike(f"%{q}%"))
+    if city:
+        base = base.where(Etablissement.city.ilike(f"%{city}%"))
+    if track:
+        base = base.where(Etablissement.track.ilike(f"%{track}%"))
+    if sector:
+        base = base.where(Etablissement.sector.ilike(f"%{sector}%"))
+
+    rows = await db.execute(base.order_by(asc(Etablissement.etablissement), asc(Etablissement.city)))
+    return [EtablissementOut.from_orm(e) for e in rows.scalars().all()]
+
+
+@router.get("/etablissements/{etablissement_id}", response_model=EtablissementOut)
+async def get_etablissement(etablissement_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    e = await db.get(Etablissement, etablissement_id)
+    if not e:
+        raise HTTPException(status_code=404, detail="Établissement non trouvé")
+    return EtablissementOut.from_orm(e)
+
+
+@router.get("/me", response_model=UserProfileResponse, response_model_exclude_unset=True)
+async def me(
+    include: Optional[str] = Query(None, description="Sections supplémentaires: profile, step_progress, all."),
+    Authorize: AuthJWT = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get current user's profile. JSON blobs and step progress are only loaded when requested."""
+    Authorize.jwt_required()
+    includes = parse_user_include(include)
+    email = Authorize.get_jwt_subject()
+    result = await db.execute(
+        select(User).options(*user_load_options(includes)).where(User.email == email)
+    )
+    user = result.scalars().unique().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return build_user_profile(user, includes)
@@ -0,0 +1,67 @@
+# app/api/auth/loaders.py
+from typing import Iterable, Optional, Set
+
+from fastapi import HTTPException
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy.orm import Session, joinedload, load_only
+
+from app.api.auth.schemas import UserIdentity, UserProfileResponse, UserResponse, UserStepProgressResponse
+from app.models.user import User
+
+# ?include= values accepted by the profile endpoints
+USER_INCLUDES = {"profile", "step_progress"}
+USER_PROFILE_BLOBS = ("orientation_choices", "riasec_differentiation", "preferences", "notes")
+
+
+def parse_user_include(include: Optional[str]) -> Set[str]:
+    values = {v.strip() for v in (include or "").split(",") if v.strip()}
+    if "all" in values:
+        return set(USER_INCLUDES)
+    unknown = values - USER_INCLUDES
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Valeur include invalide: {', '.join(sorted(unknown))}. Valeurs autorisées: profile, step_progress, all.",
+        )
+    return values
+
+
+def user_load_options(include: Iterable[str] = (), extra_columns: Iterable[str] = (), identity_only: bool = False):
+    """Load only the columns the response needs; step progress is joined into the same SELECT."""
+    include = set(include)
+    fields = UserIdentity.__fields__ if identity_only else UserResponse.__fields__
+    columns = set(fields) | set(extra_columns)
+    if "profile" in include:
+        columns.update(USER_PROFILE_BLOBS)
+    options = [load_only(*(getattr(User, c) for c in sorted(columns)))]
+    if "step_progress" in include:
+        options.append(joinedload(User.step_progress))
+    return options
+
+
+def load_user(db: Session, criterion, include: Iterable[str] = (), extra_columns: Iterable[str] = (),
+              identity_only: bool = False) -> Optional[User]:
+    return (
+        db.query(User)
+        .options(*user_load_options(include, extra_columns, identity_only))
+        .filter(criterion)
+        .first()
+    )
+
+
+def build_user_profile(user: User, include: Set[str]) -> UserProfileResponse:
+    data = UserResponse.from_orm(user).dict()
+    if "profile" in include:
+        data.update({field: getattr(user, field) for field in USER_PROFILE_BLOBS})
+    if "step_progress" in include:
+        data["step_progress"] = [UserStepProgressResponse.from_orm(p) for p in user.step_progress]
+    return UserProfileResponse(**data)
+
+
+def current_student(db: Session, Authorize: AuthJWT) -> Optional[User]:
+    """The authenticated user when a valid access token is sent; catalogue endpoints stay public."""
+    Authorize.jwt_optional()
+    email = Authorize.get_jwt_subject()
+    if not email:
+        return None
+    return load_user(db, User.email == email, extra_columns=("notes",))
@@ -0,0 +1,14 @@
+# app/api/auth/permissions.py
+from fastapi import Depends, HTTPException
+from fastapi_jwt_auth import AuthJWT
+
+from app.core.config import settings
+
+
+def require_admin(Authorize: AuthJWT = Depends()) -> str:
+    """Dependency for admin-only endpoints: a valid access token whose subject is in ADMIN_EMAILS."""
+    Authorize.jwt_required()
+    email = Authorize.get_jwt_subject()
+    if (email or "").lower() not in {e.lower() for e in settings.ADMIN_EMAILS}:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs.")
+    return email
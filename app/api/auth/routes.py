@@ -1,73 +1,77 @@
+# app/api/auth/routes.py
+# Accounts, authentication and the student's own profile (/me, favourites, recommendations).
+# The catalogue and the plans are separate routers: app.api.formation.route, app.api.plan_action.route.
 import re
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from fastapi_jwt_auth import AuthJWT
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session, lazyload, selectinload
-from sqlalchemy import func, asc
+from sqlalchemy.orm import Session
+from sqlalchemy import func
 from datetime import datetime, timedelta, date
 import random
 import string
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
-from app.api.formation.schemas import AcademieSchema, LieuSchema, EtablissementSchema, FormationSchema, AcademieOut, \
-    EtablissementOut
+from app.api.auth.loaders import build_user_profile, load_user, parse_user_include
+from app.api.auth.permissions import require_admin
+from app.api.formation.loaders import load_formations_by_ids, with_admission
+from app.api.formation.schemas import FormationRecommendationOut, FavoritesOut, FavoritesUpdate
 # --- Core / DB ---
-from app.core.database import SessionLocal
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, in_batches
+from app.core.metrics import PASSWORD_HASH_DURATION
+from app.core.rate_limit import client_ip, concurrency_limit, rate_limiter
 from app.core.email import (
     send_registration_code_email,
     send_reset_code_email,
     EmailNotExistError,
 )
-from passlib.context import CryptContext
 
-from app.models.Academies import Academie, Etablissement
 # --- Models ---
-from app.models.user import User
+from app.models.user import User, UserFavoriteFormation, derived_user_columns, password_context
 from app.models.PlanAction import PlanAction, PlanStep, UserStepProgress
-from app.models.Formation import Formation, CriteresCandidature, Lieu  # keep your formation model
+from app.models.Formation import Formation
+from app.services.analytics import DIMENSIONS, cohort_stats_refresher, read_cohort_stats
+from app.services.json_patch import PatchConflict, PatchError, apply_json_patch, apply_merge_patch, jsonb_expression
+from app.services.recommendation import recommendation_engine
 
 # --- Schemas (your updated file we aligned earlier) ---
 from app.api.auth.schemas import (
     # Auth / user
-    UserCreate, UserResponse, LoginRequest, TokenResponse, UserUpdate,
-    ForgotPasswordRequest, VerifyCodeRequest, ResetPasswordRequest, VerifyRegistrationRequest,
-    # Plan
-    PlanActionCreate, PlanActionResponse,
-    PlanStepCreate, PlanStepResponse,
-    UserStepProgressCreate, UserStepProgressUpdate, UserStepProgressResponse,
+    UserCreate, UserProfileResponse, LoginRequest, TokenResponse, UserUpdate,
+    ForgotPasswordRequest, VerifyCodeRequest, ResetPasswordRequest, VerifyRegistrationRequest, ProfilePatchResponse,
+    CohortAnalyticsOut, CohortStatOut,
 )
 
-# --- Google ---
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # In-memory storage for pending registrations (email -> {code, user_data, expires_at})
 pending_registrations: Dict[str, dict] = {}
 CODE_EXPIRATION_MINUTES = 30  # Codes expire after 30 minutes
 
+def _hash_password(password: str) -> str:
+    with PASSWORD_HASH_DURATION.labels("hash").time():
+        return password_context().hash(password)
+
+def throttle(http_request: Request, scope: str, email: Optional[str] = None) -> None:
+    """Take a token from the scope's per-IP and per-email buckets (429 when one is empty)."""
+    rate_limiter().check(scope, ip=client_ip(http_request, settings.RATE_LIMIT_TRUSTED_PROXIES), email=email)
+
 class GoogleTokenRequest(BaseModel):
     token: str
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 def bootstrap_user_plan(db: Session, user: User) -> PlanAction:
     """
-    Create a default PlanAction + 6 PlanSteps for the user and initialize UserStepProgress.
+    Create a default PlanAction + 6 PlanSteps for the user and initialize UserStepProgress, then commit.
     Safe to call multiple times: it won't create a new plan if user already has one.
+    The user may still be pending: the plan, the steps and the progress rows go out in the same flush.
     """
     if user.plan_action_id:
         # User already has a plan assigned
@@ -83,7 +87,6 @@ def bootstrap_user_plan(db: Session, user: User) -> PlanAction:
         is_active=True,
     )
     db.add(plan)
-    db.flush()  # to get plan.id
 
     steps_spec = [
         ("mes infos de base", "Complète tes infos personnelles de base."),
@@ -98,28 +101,22 @@ def bootstrap_user_plan(db: Session, user: User) -> PlanAction:
         step_start = today + timedelta(days=7 * (idx - 1))
         step_end = step_start + timedelta(days=14)
         step = PlanStep(
-            plan_action_id=plan.id,
+            plan_action=plan,
             titre=titre,
             description=description,
             ordre=idx,
             start_date=step_start,
             end_date=step_end,
         )
-        db.add(step)
-        db.flush()  # to get step.id
-
-        progress = UserStepProgress(
-            user_id=user.id,
-            step_id=step.id,
+        UserStepProgress(
+            user=user,
+            step=step,
             is_done=False,
             done_at=None,
         )
-        db.add(progress)
 
-    user.plan_action_id = plan.id
+    user.plan_action = plan
     db.commit()
-    db.refresh(plan)
-    db.refresh(user)
     return plan
 
 def generate_code(length=6):
@@ -145,8 +142,9 @@ def validate_sexe(sexe: str) -> bool:
     return sexe in valid_values
 
 @router.post("/register", status_code=status.HTTP_202_ACCEPTED)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
+def register(user_in: UserCreate, http_request: Request, db: Session = Depends(get_db)):
     """Register a new user and send verification code."""
+    throttle(http_request, "register", user_in.email)
     if not is_valid_email(user_in.email):
         raise HTTPException(
             status_code=400,
@@ -163,25 +161,26 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=409, detail="Email déjà utilisé")
 
     code = generate_code()
-    try:
-        send_registration_code_email(to_email=user_in.email, code=code, verification_token="")
-    except EmailNotExistError as e:
-        logger.error(f"Email validation failed: {str(e)}")
-        raise HTTPException(
-            status_code=404,
-            detail=f"{str(e)}. Veuillez réessayer avec une adresse email correcte."
-        )
-    except Exception as e:
-        logger.error(f"Email sending failed: {str(e)}")
-        if "SMTP authentication failed" in str(e):
+    with concurrency_limit("email").slot():  # DNS + SMTP probe + SMTP send
+        try:
+            send_registration_code_email(to_email=user_in.email, code=code, verification_token="")
+        except EmailNotExistError as e:
+            logger.error(f"Email validation failed: {str(e)}")
+            raise HTTPException(
+                status_code=404,
+                detail=f"{str(e)}. Veuillez réessayer avec une adresse email correcte."
+            )
+        except Exception as e:
+            logger.error(f"Email sending failed: {str(e)}")
+            if "SMTP authentication failed" in str(e):
+                raise HTTPException(
+                    status_code=500,
+                    detail="Erreur de configuration du serveur email. Veuillez contacter l'administrateur."
+                )
             raise HTTPException(
                 status_code=500,
-                detail="Erreur de configuration du serveur email. Veuillez contacter l'administrateur."
+                detail=f"Échec de l'envoi de l'email: {str(e)}. Veuillez réessayer."
             )
-        raise HTTPException(
-            status_code=500,
-            detail=f"Échec de l'envoi de l'email: {str(e)}. Veuillez réessayer."
-        )
 
     expires_at = datetime.now() + timedelta(minutes=CODE_EXPIRATION_MINUTES)
     pending_registrations[user_in.email] = {
@@ -193,8 +192,10 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
     return {"message": "Code de vérification envoyé par email"}
 
 @router.post("/verify-registration", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-def verify_registration(request: VerifyRegistrationRequest, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def verify_registration(request: VerifyRegistrationRequest, http_request: Request, db: Session = Depends(get_db),
+                        Authorize: AuthJWT = Depends()):
     """Verify registration code and create user."""
+    throttle(http_request, "verify_code", request.email)
     email = request.email
     code = request.code
 
@@ -216,13 +217,12 @@ def verify_registration(request: VerifyRegistrationRequest, db: Session = Depend
         sexe=user_data["sexe"],
         date_naissance=user_data["date_naissance"]
     )
-    user.set_password(user_data["password"])  # Use set_password method for validation
+    with concurrency_limit("password").slot():
+        user.set_password(user_data["password"])  # Use set_password method for validation
 
     try:
         db.add(user)
-        db.commit()
-        db.refresh(user)
-        # 🔥 Create plan/steps/progress
+        # 🔥 Create plan/steps/progress, committed with the user
         bootstrap_user_plan(db, user)
     except Exception as e:
         db.rollback()
@@ -242,10 +242,16 @@ def verify_registration(request: VerifyRegistrationRequest, db: Session = Depend
     }
 
 @router.post("/login", response_model=TokenResponse)
-def login(login_data: LoginRequest, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def login(login_data: LoginRequest, http_request: Request, db: Session = Depends(get_db),
+          Authorize: AuthJWT = Depends()):
     """Authenticate user and return tokens."""
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not user.check_password(login_data.password):
+    throttle(http_request, "login", login_data.email)
+    user = load_user(db, User.email == login_data.email, extra_columns=("password_hash",), identity_only=True)
+    if not user:
+        raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
+    with concurrency_limit("password").slot():  # bcrypt
+        valid = user.check_password(login_data.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
 
     access_token = Authorize.create_access_token(subject=user.email, user_claims={"email": user.email})
@@ -262,7 +268,7 @@ def refresh(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
     """Refresh access and refresh tokens."""
     Authorize.jwt_refresh_token_required()
     email = Authorize.get_jwt_subject()
-    user = db.query(User).filter(User.email == email).first()
+    user = load_user(db, User.email == email, identity_only=True)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
@@ -275,31 +281,44 @@ def refresh(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
         "token_type": "bearer"
     }
 
-@router.get("/me", response_model=UserResponse)
-def me(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
-    """Get current user's profile."""
+USER_INCLUDE_DESCRIPTION = "Sections supplémentaires, séparées par des virgules: profile, step_progress, all."
+
+
+@router.get("/me", response_model=UserProfileResponse, response_model_exclude_unset=True)
+def me(
+    include: Optional[str] = Query(None, description=USER_INCLUDE_DESCRIPTION),
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Get current user's profile. JSON blobs and step progress are only loaded when requested."""
     Authorize.jwt_required()
+    includes = parse_user_include(include)
     email = Authorize.get_jwt_subject()
-    user = db.query(User).filter(User.email == email).first()
+    user = load_user(db, User.email == email, includes)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    return user
+    return build_user_profile(user, includes)
 
-@router.patch("/me", response_model=UserResponse)
+@router.patch("/me", response_model=UserProfileResponse, response_model_exclude_unset=True)
 def update_profile(
     user_update: UserUpdate,
+    include: Optional[str] = Query(None, description=USER_INCLUDE_DESCRIPTION),
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(get_db)
 ):
     """Update current user's profile."""
     Authorize.jwt_required()
+    includes = parse_user_include(include)
     email = Authorize.get_jwt_subject()
-    user = db.query(User).filter(User.email == email).first()
+    update_data = user_update.dict(exclude_unset=True)
+    user = load_user(
+        db, User.email == email, includes,
+        extra_columns=[key for key in update_data if key in User.__table__.columns],
+    )
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    update_data = user_update.dict(exclude_unset=True)
     logger.debug(f"Updating user {email} with fields: {update_data}")
 
     if "sexe" in update_data and not validate_sexe(update_data["sexe"]):
@@ -316,18 +335,166 @@ def update_profile(
                 setattr(user, key, value)
 
     try:
-        db.commit()
-        db.refresh(user)
+        db.commit()  # updated_at comes back with the UPDATE (eager_defaults)
     except Exception as e:
         db.rollback()
         logger.error(f"Database error during profile update: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du profil: {str(e)}")
 
+    return build_user_profile(user, includes)
+
+# Profile blobs accepting partial updates, with the document a NULL column starts from
+MAX_FAVORITES = 200
+
+PATCHABLE_BLOBS = {
+    "orientation_choices": {}, "riasec_differentiation": {}, "preferences": {}, "notes": [], "specialites": [],
+}
+MERGE_PATCH = "application/merge-patch+json"
+JSON_PATCH = "application/json-patch+json"
+
+@router.patch("/me/profile/{field}", response_model=ProfilePatchResponse)
+def patch_profile_blob(
+    field: str,
+    request: Request,
+    patch: Any = Body(..., description=f"{MERGE_PATCH} (RFC 7396) ou {JSON_PATCH} (RFC 6902)"),
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Partial update of one profile blob: only the changed fragments are written (jsonb_set on PostgreSQL) and returned."""
+    Authorize.jwt_required()
+    if field not in PATCHABLE_BLOBS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Champ inconnu: {field}. Valeurs autorisées: {', '.join(PATCHABLE_BLOBS)}.",
+        )
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in (MERGE_PATCH, JSON_PATCH):
+        raise HTTPException(status_code=415, detail=f"Content-Type attendu: {MERGE_PATCH} ou {JSON_PATCH}.")
+
+    column = User.__table__.c[field]
+    # Only this column is read, and the row stays locked until the UPDATE
+    row = db.query(User.id, column).filter(User.email == Authorize.get_jwt_subject()).with_for_update().first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    default = PATCHABLE_BLOBS[field]
+    document = row[1] if row[1] is not None else default
+    try:
+        if media_type == MERGE_PATCH:
+            patched, changes = apply_merge_patch(document, patch)
+        else:
+            patched, changes = apply_json_patch(document, patch)
+    except PatchConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    _, errors = UserUpdate.__fields__[field].validate(patched, {}, loc=field)
+    if errors:
+        raise HTTPException(status_code=422, detail=ValidationError([errors], UserUpdate).errors())
+
+    if changes:
+        postgresql = db.get_bind().dialect.name == "postgresql"
+        value = jsonb_expression(column, changes, default) if postgresql else patched
+        values = {field: value, **derived_user_columns(field, patched)}  # Core UPDATE: no @validates
+        db.execute(User.__table__.update().where(User.id == row.id).values(values))
+        db.commit()
+    return ProfilePatchResponse(field=field, changes=[c.as_operation() for c in changes])
+
+@router.get("/me/recommendations", response_model=List[FormationRecommendationOut])
+def my_recommendations(
+    limit: int = Query(20, ge=1, le=100),
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Rank the whole catalogue against my profile (spécialités, voie, intérêts, budget, distance)."""
+    Authorize.jwt_required()
+    email = Authorize.get_jwt_subject()
+    user = load_user(db, User.email == email, extra_columns=("orientation_choices", "notes"))
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    return [
+        FormationRecommendationOut(
+            formation_id=r.formation.id,
+            titre=r.formation.titre,
+            etablissement=r.formation.etablissement,
+            type_formation=r.formation.type_formation,
+            ville=r.formation.ville,
+            prix_annuel=r.formation.prix_annuel,
+            distance_km=r.distance_km,
+            score=r.score,
+            details=r.details,
+            admission=r.admission,
+        )
+        for r in recommendation_engine.recommend(db, user, limit)
+    ]
+
+def _favorites_owner(db: Session, Authorize: AuthJWT) -> User:
+    Authorize.jwt_required()
+    user = load_user(db, User.email == Authorize.get_jwt_subject(), extra_columns=("notes",))
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     return user
 
+def _favorite_ids(db: Session, user_id: int) -> List[int]:
+    return [fid for (fid,) in db.query(UserFavoriteFormation.formation_id)
+            .filter(UserFavoriteFormation.user_id == user_id)
+            .order_by(UserFavoriteFormation.position, UserFavoriteFormation.created_at)]
+
+def _favorites_response(db: Session, user: User) -> FavoritesOut:
+    formations, missing = load_formations_by_ids(db, _favorite_ids(db, user.id))
+    return FavoritesOut(formations=with_admission(db, user, formations), missing=missing)
+
+def _require_formations_exist(db: Session, ids: List[int]) -> None:
+    existing = {fid for (fid,) in in_batches(db.query(Formation.id), Formation.id, ids)} if ids else set()
+    missing = [i for i in ids if i not in existing]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Formations introuvables: {', '.join(map(str, missing))}")
+
+@router.get("/me/favorites", response_model=FavoritesOut)
+def my_favorites(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
+    """My favourite formations in my order, loaded through the batch loader."""
+    return _favorites_response(db, _favorites_owner(db, Authorize))
+
+@router.put("/me/favorites", response_model=FavoritesOut)
+def replace_favorites(payload: FavoritesUpdate, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
+    """Replace the whole list (add, remove and reorder in one call); the order given is kept."""
+    user = _favorites_owner(db, Authorize)
+    ids = list(dict.fromkeys(payload.formation_ids))
+    if len(ids) > MAX_FAVORITES:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_FAVORITES} formations favorites.")
+    _require_formations_exist(db, ids)
+    db.query(UserFavoriteFormation).filter(UserFavoriteFormation.user_id == user.id).delete(synchronize_session=False)
+    db.add_all([UserFavoriteFormation(user_id=user.id, formation_id=fid, position=i) for i, fid in enumerate(ids)])
+    db.commit()
+    return _favorites_response(db, user)
+
+@router.put("/me/favorites/{formation_id}", status_code=status.HTTP_204_NO_CONTENT)
+def add_favorite(formation_id: int, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
+    """Append a formation to my favourites; adding it twice is a no-op."""
+    user = _favorites_owner(db, Authorize)
+    _require_formations_exist(db, [formation_id])
+    if db.get(UserFavoriteFormation, (user.id, formation_id)) is None:
+        count, last = db.query(func.count(), func.max(UserFavoriteFormation.position)) \
+            .filter(UserFavoriteFormation.user_id == user.id).one()
+        if count >= MAX_FAVORITES:
+            raise HTTPException(status_code=400, detail=f"Au plus {MAX_FAVORITES} formations favorites.")
+        db.add(UserFavoriteFormation(user_id=user.id, formation_id=formation_id, position=(last or 0) + 1))
+        db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/me/favorites/{formation_id}", status_code=status.HTTP_204_NO_CONTENT)
+def remove_favorite(formation_id: int, Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
+    user = _favorites_owner(db, Authorize)
+    db.query(UserFavoriteFormation).filter(
+        UserFavoriteFormation.user_id == user.id, UserFavoriteFormation.formation_id == formation_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @router.post("/forgot-password")
-def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
+def forgot_password(request: ForgotPasswordRequest, http_request: Request, db: Session = Depends(get_db)):
     """Send password reset code."""
+    throttle(http_request, "forgot_password", request.email)
     user = db.query(User).filter(User.email == request.email).first()
     if not user:
         raise HTTPException(status_code=404, detail="Email non trouvé")
@@ -339,17 +506,19 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
         "expires_at": expires_at
     }
 
-    try:
-        send_reset_code_email(to_email=user.email, code=code, reset_token="")
-    except Exception as e:
-        logger.error(f"Email sending failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Échec de l'envoi de l'email: {str(e)}")
+    with concurrency_limit("email").slot():
+        try:
+            send_reset_code_email(to_email=user.email, code=code, reset_token="")
+        except Exception as e:
+            logger.error(f"Email sending failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Échec de l'envoi de l'email: {str(e)}")
 
     return {"message": "Code de vérification envoyé par email"}
 
 @router.post("/reset-password")
-def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+def reset_password(request: ResetPasswordRequest, http_request: Request, db: Session = Depends(get_db)):
     """Reset user password with verification code."""
+    throttle(http_request, "verify_code", request.email)
     email = request.email
     code = request.code
 
@@ -367,26 +536,34 @@ def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db))
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    try:
-        user.set_password(request.new_password)
-        db.commit()
-        del pending_registrations[email]
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Database error during password reset: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur de base de données: {str(e)}")
+    with concurrency_limit("password").slot():
+        try:
+            user.set_password(request.new_password)
+            db.commit()
+            del pending_registrations[email]
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Database error during password reset: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Erreur de base de données: {str(e)}")
 
     return {"message": "Mot de passe réinitialisé avec succès"}
 
 @router.post("/auth/google", response_model=TokenResponse)
 def google_login(
     token_data: GoogleTokenRequest,
+    http_request: Request,
     db: Session = Depends(get_db),
     Authorize: AuthJWT = Depends(),
 ):
     """Authenticate with Google and hydrate user with picture / gender / birthdate / address (if present)."""
+    throttle(http_request, "login")  # per IP: the e-mail is only known once the token is verified
+    # google-auth (and requests) load on the first Google login rather than on every worker boot
+    from google.oauth2 import id_token
+    from google.auth.transport import requests as google_requests
+
     try:
-        idinfo = id_token.verify_oauth2_token(token_data.token, google_requests.Request())
+        with concurrency_limit("google").slot():  # fetches Google's certificates over the network
+            idinfo = id_token.verify_oauth2_token(token_data.token, google_requests.Request())
     except ValueError as e:
         logger.error(f"Invalid Google token: {e}")
         raise HTTPException(status_code=401, detail="Token Google invalide")
@@ -447,7 +624,7 @@ def google_login(
             prenom=given_name or "Prénom",
             sexe=map_gender_to_sexe(gender),
             date_naissance=parse_birthdate(birthdate) if birthdate else date(2000, 1, 1),
-            password_hash=pwd_context.hash("google_login_" + email),
+            password_hash=_hash_password("google_login_" + email),
             profile_picture=picture,
             # Optional user profile fields:
             objectif=None,
@@ -468,8 +645,6 @@ def google_login(
         )
         try:
             db.add(user)
-            db.commit()
-            db.refresh(user)
             bootstrap_user_plan(db, user)
         except Exception as e:
             db.rollback()
@@ -492,7 +667,6 @@ def google_login(
         if changed:
             try:
                 db.commit()
-                db.refresh(user)
             except Exception as e:
                 db.rollback()
                 logger.error(f"DB error during Google user update: {e}")
@@ -502,491 +676,32 @@ def google_login(
     refresh_token = Authorize.create_refresh_token(subject=user.email)
     return {"user": user, "access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
-# =========================
-# Plan Actions & Steps
-# =========================
 
-@router.post("/plans", response_model=PlanActionResponse, status_code=201)
-def create_plan(
-    payload: PlanActionCreate,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
+@router.get("/admin/analytics/cohorts", response_model=CohortAnalyticsOut)
+def get_cohort_analytics(
+    dimension: Optional[str] = Query(None, description=f"Une seule dimension parmi: {', '.join(DIMENSIONS)}"),
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_read_db),
+    admin: str = Depends(require_admin),
 ):
-    Authorize.jwt_required()
-    plan = PlanAction(
-        nom=payload.nom,
-        start_date=payload.start_date,
-        end_date=payload.end_date,
-        is_active=payload.is_active if payload.is_active is not None else True,
-    )
-    db.add(plan)
-    db.commit()
-    db.refresh(plan)
-    return plan
-
-@router.get("/plans/{plan_id}", response_model=PlanActionResponse)
-def get_plan(
-    plan_id: int,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    plan = (
-        db.query(PlanAction)
-        .options(selectinload(PlanAction.steps))
-        .filter(PlanAction.id == plan_id)
-        .first()
-    )
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
-    return plan
-
-@router.post("/plans/{plan_id}/steps", response_model=PlanStepResponse, status_code=201)
-def create_plan_step(
-    plan_id: int,
-    payload: PlanStepCreate,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    plan = db.query(PlanAction).filter(PlanAction.id == plan_id).first()
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
-
-    step = PlanStep(
-        plan_action_id=plan_id,
-        titre=payload.titre,
-        description=payload.description,
-        ordre=payload.ordre,
-        start_date=payload.start_date,
-        end_date=payload.end_date,
-    )
-    db.add(step)
-    db.commit()
-    db.refresh(step)
-    return step
-
-@router.post("/users/{user_id}/assign-plan/{plan_id}", response_model=UserResponse)
-def assign_plan_to_user(
-    user_id: int,
-    plan_id: int,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    plan = db.query(PlanAction).filter(PlanAction.id == plan_id).first()
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
-
-    user.plan_action_id = plan.id
-    db.commit()
-    db.refresh(user)
-    return user
-
-@router.get("/me/plan-action", response_model=PlanActionResponse)
-def get_user_plan_action(
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    """Return my assigned plan with ordered steps."""
-    Authorize.jwt_required()
-    email = Authorize.get_jwt_subject()
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    if not user.plan_action_id:
-        raise HTTPException(status_code=404, detail="Plan d’action non assigné")
-
-    plan = (
-        db.query(PlanAction)
-        .options(selectinload(PlanAction.steps))
-        .filter(PlanAction.id == user.plan_action_id)
-        .first()
-    )
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
-    return plan
-
-# =========================
-# User Step Progress
-# =========================
-
-@router.post("/users/{user_id}/steps/{step_id}/done", response_model=UserStepProgressResponse, status_code=201)
-def mark_step_done(
-    user_id: int,
-    step_id: int,
-    payload: UserStepProgressCreate,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    step = db.query(PlanStep).filter(PlanStep.id == step_id).first()
-    if not step:
-        raise HTTPException(status_code=404, detail="Étape non trouvée")
-
-    progress = (
-        db.query(UserStepProgress)
-        .filter(UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id)
-        .first()
-    )
-    now = datetime.utcnow()
-    if progress:
-        progress.is_done = True
-        progress.done_at = now
+    """Counselor dashboard figures, read from the cohort_stats summary (refreshed in the background)."""
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dimension invalide: {dimension}. Valeurs autorisées: {', '.join(DIMENSIONS)}.",
+        )
+    dimensions = (dimension,) if dimension else DIMENSIONS
+    stats = read_cohort_stats(db, dimensions, limit)
+    if stats.refreshed_at is None:  # never computed: the first dashboard waits for it once
+        cohort_stats_refresher.refresh()
+        db.rollback()  # start a new transaction to see the summary
+        stats = read_cohort_stats(db, dimensions, limit)
+        refreshing = False
     else:
-        progress = UserStepProgress(user_id=user_id, step_id=step_id, is_done=True, done_at=now)
-        db.add(progress)
-    db.commit()
-    db.refresh(progress)
-    return progress
-
-@router.patch("/users/{user_id}/steps/{step_id}", response_model=UserStepProgressResponse)
-def update_step_progress(
-    user_id: int,
-    step_id: int,
-    payload: UserStepProgressUpdate,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    progress = (
-        db.query(UserStepProgress)
-        .filter(UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id)
-        .first()
-    )
-    if not progress:
-        raise HTTPException(status_code=404, detail="Progression introuvable")
-
-    progress.is_done = payload.is_done
-    progress.done_at = datetime.utcnow() if payload.is_done else None
-    db.commit()
-    db.refresh(progress)
-    return progress
-
-@router.get("/users/{user_id}/progress", response_model=List[UserStepProgressResponse])
-def list_user_progress(
-    user_id: int,
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends(),
-):
-    Authorize.jwt_required()
-    progress = (
-        db.query(UserStepProgress)
-        .filter(UserStepProgress.user_id == user_id)
-        .all()
-    )
-    return progress
-
-
-# Get a specific formation with all details
-
-
-
-@router.get("/formations/{formation_id}", response_model=FormationSchema)
-def get_formation(formation_id: int, db: Session = Depends(get_db)):
-    # Use lazyload('*') to defer all relationship loading
-    formation = db.query(Formation).options(
-        lazyload('*')  # Defer loading of all relationships
-    ).filter(Formation.id == formation_id).first()
-
-    if not formation:
-        raise HTTPException(status_code=404, detail="Formation not found")
-
-    # Force loading of relationships to ensure all data is available for serialization
-    formation.lieu  # Accessing triggers lazy load
-    formation.salaire_bornes
-    formation.badges  # Accessing collections triggers lazy load
-    formation.filieres_bac
-    formation.specialites_favorisees
-    formation.matieres_enseignees
-    formation.debouches_metiers
-    formation.debouches_secteurs
-    formation.ts_taux_par_bac
-    formation.intervalles_admis
-    formation.profils_admis
-    formation.criteres_candidature  # Includes sous_criteres due to relationship
-    formation.boursiers
-    formation.promo_characteristics
-    formation.post_formation_outcomes
-    formation.voie_generale
-    formation.voie_pro
-    formation.voie_technologique
-
-    return formation
-
-
-
-
-# Get a specific formation with all details
-
-@router.get("/formations/voie_technologique", response_model=List[FormationSchema])
-def get_formations_voie_technologique(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    formations = db.query(Formation).filter(Formation.voie_technologique != None).offset(skip).limit(limit).all()
-
-    if not formations:
-        raise HTTPException(status_code=404, detail="Aucune formation voie technologique trouvée.")
-
-    return formations
-
-
-@router.get("/formations/{formation_id}", response_model=FormationSchema)
-def get_formation(formation_id: int, db: Session = Depends(get_db)):
-    # Use lazyload('*') to defer all relationship loading
-    formation = db.query(Formation).options(
-        lazyload('*')  # Defer loading of all relationships
-    ).filter(Formation.id == formation_id).first()
-
-    if not formation:
-        raise HTTPException(status_code=404, detail="Formation not found")
-
-    # Force loading of relationships to ensure all data is available for serialization
-    formation.lieu  # Accessing triggers lazy load
-    formation.salaire_bornes
-    formation.badges  # Accessing collections triggers lazy load
-    formation.filieres_bac
-    formation.specialites_favorisees
-    formation.matieres_enseignees
-    formation.debouches_metiers
-    formation.debouches_secteurs
-    formation.ts_taux_par_bac
-    formation.intervalles_admis
-    formation.profils_admis
-    formation.criteres_candidature  # Includes sous_criteres due to relationship
-    formation.boursiers
-    formation.promo_characteristics
-    formation.post_formation_outcomes
-    formation.voie_generale
-    formation.voie_pro
-    formation.voie_technologique
-
-    return formation
-
-# Get 10 formations
-@router.get("/formations/", response_model=List[FormationSchema])
-def get_formations(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    limit = min(limit, 10)
-
-    try:
-        formations = db.query(Formation).options(
-            lazyload('*'),  # Pour éviter les accès indésirables
-            selectinload(Formation.lieu),
-            selectinload(Formation.salaire_bornes),
-            selectinload(Formation.badges),
-            selectinload(Formation.filieres_bac),
-            selectinload(Formation.specialites_favorisees),
-            selectinload(Formation.matieres_enseignees),
-            selectinload(Formation.debouches_metiers),
-            selectinload(Formation.debouches_secteurs),
-            selectinload(Formation.ts_taux_par_bac),
-            selectinload(Formation.intervalles_admis),
-            selectinload(Formation.criteres_candidature).selectinload(CriteresCandidature.sous_criteres),
-            selectinload(Formation.boursiers),
-            selectinload(Formation.profils_admis),
-            selectinload(Formation.promo_characteristics),
-            selectinload(Formation.post_formation_outcomes),
-            selectinload(Formation.voie_generale),
-            selectinload(Formation.voie_pro),
-            selectinload(Formation.voie_technologique)
-        ).offset(skip).limit(limit).all()
-
-        return formations
-
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des formations: {str(e)}")
-# Updated route to get etablissements
-@router.get("/etablissements/", response_model=List[EtablissementSchema])
-def get_etablissements(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    limit = min(limit, 10)  # Cap limit to prevent overload
-
-    # Fetch establishments from Formation.lieu and Location
-    etab_from_formation = db.query(Formation.etablissement).distinct().filter(
-        Formation.etablissement.isnot(None)
-    ).subquery()
-
-    etab_from_location = db.query(Formation.etablissement).distinct().filter(
-        Formation.etablissement.isnot(None)
-    ).subquery()
-
-    all_etablissements = db.query(
-        func.coalesce(etab_from_formation.c.etablissement, etab_from_location.c.etablissement)).distinct().all()
-
-    # Paginate the results
-    start = skip
-    end = min(skip + limit, len(all_etablissements))
-    paginated_etablissements = all_etablissements[start:end]
-
-    # Create EtablissementSchema objects with a default description
-    result = [
-        EtablissementSchema(name=etab[0], description=f"Établissement à {etab[0]}")
-        for etab in paginated_etablissements
-    ]
-    return result
-
-
-# Updated route to get academies on lieu
-@router.get("/lieu/academies/", response_model=List[AcademieSchema])
-def get_academies(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    limit = min(limit, 10)  # Cap limit to prevent overload
-
-    # Fetch academies from Formation.lieu and Location
-    acad_from_formation = db.query(Formation.lieu.of_type(LieuSchema).academy).distinct().filter(
-        Formation.lieu.has(LieuSchema.academy.isnot(None))
-    ).subquery()
-
-    acad_from_location = db.query(Lieu.academie).distinct().filter(
-        Lieu.academie.isnot(None)
-    ).subquery()
-
-    all_academies = db.query(
-        func.coalesce(acad_from_formation.c.academy, acad_from_location.c.academie)).distinct().all()
-
-    # Paginate the results
-    start = skip
-    end = min(skip + limit, len(all_academies))
-    paginated_academies = all_academies[start:end]
-
-    # Create AcademieSchema objects
-    result = [
-        AcademieSchema(name=acad[0])
-        for acad in paginated_academies
-    ]
-    return result
-
-@router.get("/academies", response_model=List[AcademieOut])
-def list_academies(
-    q: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    query = db.query(Academie)
-    if q:
-        query = query.filter(Academie.name.ilike(f"%{q}%"))
-    rows = query.order_by(asc(Academie.name)).all()
-    return [AcademieOut(id=a.id, name=a.name) for a in rows]
-
-@router.get("/academies/{academie_id}", response_model=AcademieOut)
-def get_academie(
-    academie_id: int,
-    with_etablissements: bool = True,
-    db: Session = Depends(get_db),
-):
-    query = db.query(Academie)
-    if with_etablissements:
-        query = query.options(selectinload(Academie.etablissements))
-    a = query.filter(Academie.id == academie_id).first()
-    if not a:
-        raise HTTPException(status_code=404, detail="Académie non trouvée")
-
-    return AcademieOut(
-        id=a.id,
-        name=a.name,
-        etablissements=[
-            EtablissementOut(
-                id=e.id,
-                academie_id=e.academie_id,
-                etablissement=e.etablissement,
-                city=e.city,
-                sector=e.sector,
-                track=e.track,
-            ) for e in (a.etablissements or [])
-        ] if with_etablissements else None
-    )
-
-@router.get("/academies/{academie_id}/etablissements", response_model=List[EtablissementOut])
-def list_etablissements_in_academie(
-    academie_id: int,
-    q: Optional[str] = None,
-    city: Optional[str] = None,
-    track: Optional[str] = None,
-    sector: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    exists = db.query(Academie.id).filter(Academie.id == academie_id).first()
-    if not exists:
-        raise HTTPException(status_code=404, detail="Académie non trouvée")
-
-    base = db.query(Etablissement).filter(Etablissement.academie_id == academie_id)
-    if q:
-        base = base.filter(Etablissement.etablissement.ilike(f"%{q}%"))
-    if city:
-        base = base.filter(Etablissement.city.ilike(f"%{city}%"))
-    if track:
-        base = base.filter(Etablissement.track.ilike(f"%{track}%"))
-    if sector:
-        base = base.filter(Etablissement.sector.ilike(f"%{sector}%"))
-
-    rows = base.order_by(asc(Etablissement.etablissement), asc(Etablissement.city)).all()
-    return [
-        EtablissementOut(
-            id=e.id,
-            academie_id=e.academie_id,
-            etablissement=e.etablissement,
-            city=e.city,
-            sector=e.sector,
-            track=e.track,
-        ) for e in rows
-    ]
-
-@router.get("/etablissements", response_model=List[EtablissementOut])
-def list_etablissements(
-    q: Optional[str] = None,
-    academie_id: Optional[int] = None,
-    city: Optional[str] = None,
-    track: Optional[str] = None,
-    sector: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    base = db.query(Etablissement)
-
-    if academie_id is not None:
-        base = base.filter(Etablissement.academie_id == academie_id)
-    if q:
-        base = base.filter(Etablissement.etablissement.ilike(f"%{q}%"))
-    if city:
-        base = base.filter(Etablissement.city.ilike(f"%{city}%"))
-    if track:
-        base = base.filter(Etablissement.track.ilike(f"%{track}%"))
-    if sector:
-        base = base.filter(Etablissement.sector.ilike(f"%{sector}%"))
-
-    rows = base.order_by(asc(Etablissement.etablissement), asc(Etablissement.city)).all()
-    return [
-        EtablissementOut(
-            id=e.id,
-            academie_id=e.academie_id,
-            etablissement=e.etablissement,
-            city=e.city,
-            sector=e.sector,
-            track=e.track,
-        ) for e in rows
-    ]
-
-@router.get("/etablissements/{etablissement_id}", response_model=EtablissementOut)
-def get_etablissement(
-    etablissement_id: int,
-    db: Session = Depends(get_db),
-):
-    e = (
-        db.query(Etablissement)
-        .options(selectinload(Etablissement.academie))
-        .filter(Etablissement.id == etablissement_id)
-        .first()
+        refreshing = cohort_stats_refresher.refresh_if_stale(stats.refreshed_at)
+    return CohortAnalyticsOut(
+        refreshed_at=stats.refreshed_at,
+        refreshing=refreshing,
+        totals=CohortStatOut.from_stat(stats.totals) if stats.totals else None,
+        dimensions={name: [CohortStatOut.from_stat(s) for s in rows] for name, rows in stats.dimensions.items()},
     )
-    if not e:
-        raise HTTPException(status_code=404, detail="Établissement non trouvé")
-
-    return EtablissementOut(
-        id=e.id,
-        academie_id=e.academie_id,
-        etablissement=e.etablissement,
-        city=e.city,
-        sector=e.sector,
-        track=e.track,
-    )
\ No newline at end of file
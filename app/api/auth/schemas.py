@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import date, datetime
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 
 # =========================
 # Auth / User create & login
@@ -89,15 +89,23 @@ class UserStepProgressResponse(BaseModel):
 # User responses / updates
 # =========================
 
-class UserResponse(BaseModel):
+class UserIdentity(BaseModel):
+    """Compact user payload embedded in token responses."""
     id: int
     email: EmailStr
     nom: str
     prenom: str
+    profile_picture: Optional[str] = None
+    plan_action_id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+
+class UserResponse(UserIdentity):
     sexe: str
     date_naissance: date
 
-    profile_picture: Optional[str] = None
     niveau_scolaire: Optional[str] = None
     objectif: Optional[str] = None
     voie: Optional[str] = None
@@ -108,10 +116,6 @@ class UserResponse(BaseModel):
 
     score: Optional[float] = None
     idee: Optional[str] = None
-    orientation_choices: Optional[Dict[str, List[str]]] = None  # Menu 1/2/3
-    riasec_differentiation: Optional[Dict] = None
-    preferences: Optional[Dict] = None
-    notes: Optional[List[Dict]] = None
 
     est_boursier: Optional[bool] = None
     adresse: Optional[str] = None
@@ -121,11 +125,6 @@ class UserResponse(BaseModel):
     etablissement: Optional[str] = None
     academie: Optional[str] = None
 
-    plan_action_id: Optional[int] = None
-
-    # New: expose per-step progress entries
-    step_progress: Optional[List[UserStepProgressResponse]] = None
-
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -133,6 +132,21 @@ class UserResponse(BaseModel):
         orm_mode = True
 
 
+class UserProfileResponse(UserResponse):
+    """Full profile. The blobs and step progress are only present when requested with ?include=."""
+    # include=profile
+    orientation_choices: Optional[Dict[str, List[str]]] = None  # Menu 1/2/3
+    riasec_differentiation: Optional[Dict] = None
+    preferences: Optional[Dict] = None
+    notes: Optional[List[Dict]] = None
+
+    # include=step_progress
+    step_progress: Optional[List[UserStepProgressResponse]] = None
+
+    class Config:
+        orm_mode = True
+
+
 class UserUpdate(BaseModel):
     nom: Optional[str] = None
     prenom: Optional[str] = None
@@ -165,12 +179,48 @@ class UserUpdate(BaseModel):
     plan_action_id: Optional[int] = None
 
 
+class ProfilePatchResponse(BaseModel):
+    """What a PATCH /me/profile/{field} changed, as a JSON Patch (RFC 6902) of the stored document."""
+    field: str
+    changes: List[Dict[str, Any]]
+
+
+class CohortStatOut(BaseModel):
+    value: str
+    label: Optional[str] = None
+    users: int
+    boursiers: int
+    boursier_share: float
+    with_plan: int
+    plans_completed: int
+    plan_completion: float  # plans_completed / with_plan
+    steps_total: int
+    steps_done: int
+
+    @classmethod
+    def from_stat(cls, stat) -> "CohortStatOut":
+        return cls(
+            value=stat.value, label=stat.label, users=stat.users, boursiers=stat.boursiers,
+            boursier_share=round(stat.boursiers / stat.users, 4) if stat.users else 0.0,
+            with_plan=stat.with_plan, plans_completed=stat.plans_completed,
+            plan_completion=round(stat.plans_completed / stat.with_plan, 4) if stat.with_plan else 0.0,
+            steps_total=stat.steps_total, steps_done=stat.steps_done,
+        )
+
+
+class CohortAnalyticsOut(BaseModel):
+    refreshed_at: Optional[datetime] = None  # None until the first refresh has completed
+    refreshing: bool = False
+    totals: Optional[CohortStatOut] = None
+    dimensions: Dict[str, List[CohortStatOut]]
+
+
 # =========================
 # Auth token & verification flows
 # =========================
 
 class TokenResponse(BaseModel):
-    user: UserResponse
+    user: UserIdentity
     access_token: str
     refresh_token: str
     token_type: str
@@ -0,0 +1,102 @@
+# app/api/formation/loaders.py
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, lazyload, selectinload
+
+from app.api.formation.schemas import FormationSchema
+from app.core.database import in_batches
+from app.models.Formation import Formation, CriteresCandidature
+from app.models.user import User
+from app.services.recommendation import recommendation_engine
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 500
+MAX_BATCH_IDS = 100
+
+
+def formation_detail_options():
+    """Eager-load options for a full FormationSchema: one SELECT per child table, no lazy loads."""
+    return [
+        lazyload('*'),  # Pour éviter les accès indésirables
+        selectinload(Formation.lieu),
+        selectinload(Formation.salaire_bornes),
+        selectinload(Formation.badges),
+        selectinload(Formation.filieres_bac),
+        selectinload(Formation.specialites_favorisees),
+        selectinload(Formation.matieres_enseignees),
+        selectinload(Formation.debouches_metiers),
+        selectinload(Formation.debouches_secteurs),
+        selectinload(Formation.ts_taux_par_bac),
+        selectinload(Formation.intervalles_admis),
+        selectinload(Formation.criteres_candidature).selectinload(CriteresCandidature.sous_criteres),
+        selectinload(Formation.boursiers),
+        selectinload(Formation.profils_admis),
+        selectinload(Formation.promo_characteristics),
+        selectinload(Formation.post_formation_outcomes),
+        selectinload(Formation.voie_generale),
+        selectinload(Formation.voie_pro),
+        selectinload(Formation.voie_technologique),
+    ]
+
+
+def formation_document(formation: Formation) -> dict:
+    """Compact FormationSchema dict (null fields dropped) used by the NDJSON feeds."""
+    return FormationSchema.from_orm(formation).dict(exclude_none=True)
+
+
+def iter_formation_documents(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """
+    Every formation with its full detail, in id order, in constant memory: rows come from a
+    server-side cursor (yield_per sets stream_results) and each batch of `batch_size` parents gets
+    one selectinload IN query per child table. Yielded objects are not kept by the session.
+    """
+    query = (
+        db.query(Formation)
+        .options(*formation_detail_options())
+        .order_by(Formation.id)
+        .yield_per(batch_size)
+    )
+    for formation in query:
+        try:
+            yield formation_document(formation)
+        except ValidationError as exc:  # one incomplete scraped row must not abort a full export
+            logger.warning("Formation %s skipped in export: %s", formation.id, exc)
+
+
+def parse_formation_ids(value: Optional[str], max_ids: int = MAX_BATCH_IDS) -> List[int]:
+    """"3,1,2" -> [3, 1, 2]: request order kept, duplicates dropped; rejected as soon as it exceeds max_ids."""
+    ids: Dict[int, None] = {}  # insertion-ordered set
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise HTTPException(status_code=400, detail=f"Identifiant de formation invalide: {part}")
+        ids[int(part)] = None
+        if len(ids) > max_ids:
+            raise HTTPException(status_code=400, detail=f"Au plus {max_ids} formations par requête.")
+    return list(ids)
+
+
+def load_formations_by_ids(db: Session, ids: Sequence[int]) -> Tuple[List[Formation], List[int]]:
+    """
+    Formations with their full detail, in the order of `ids`, plus the ids that do not exist.
+    One IN query per slice of ids for the parents, and one per child table (selectinload), whatever
+    the number of ids.
+    """
+    query = db.query(Formation).options(*formation_detail_options())
+    found = {f.id: f for f in in_batches(query, Formation.id, list(dict.fromkeys(ids)))}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+
+def with_admission(db: Session, user: Optional[User], formations: List[Formation]) -> List[FormationSchema]:
+    """Serialize formations, adding the student's admission estimate in one vectorised call."""
+    estimates = recommendation_engine.admission(db, user, [f.id for f in formations]) if user else {}
+    return [
+        FormationSchema.from_orm(f).copy(update={"admission": estimates.get(f.id)})
+        for f in formations
+    ]
@@ -1,78 +1,574 @@
-# app/api/auth/routes.py
-from typing import List
+# app/api/formation/route.py
+# The public catalogue: formations, académies, établissements, search, facets, changes and snapshots.
+# Read-only, on get_read_db; a catalogue-only deployment mounts just this router (API_ROUTERS).
+import logging
+import os
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi_jwt_auth import AuthJWT
+from pydantic import ValidationError
+from sqlalchemy import asc, func
+from sqlalchemy.orm import Session, lazyload, selectinload
+
+from app.api.auth.loaders import current_student
+from app.api.auth.permissions import require_admin
+from app.api.formation.loaders import formation_detail_options, formation_document, iter_formation_documents, \
+    load_formations_by_ids, parse_formation_ids, with_admission
+from app.api.formation.schemas import AcademieSchema, EtablissementSchema, FormationSchema, AcademieOut, \
+    EtablissementOut, SnapshotManifestOut, FormationComparisonOut, SearchResultsOut, AutocompleteOut, \
+    SimilarFormationOut, FacetsOut
+from app.core.database import get_read_db
+from app.core.ndjson import NDJSON_MEDIA_TYPE, ndjson_response
+from app.core.ranges import ranged_file_response
+from app.models.Academies import Academie, Etablissement
+from app.models.catalogue import FormationNeighbor
+from app.models.Formation import Formation, Lieu
+from app.services.autocomplete import autocomplete_engine
+from app.services.catalogue_changes import catalogue_version, changes_since
+from app.services.facets import FormationFilters, facet_cache, facet_counts
+from app.services.search import search_engine
+from app.services.snapshot import read_manifest, snapshot_file
+
+logger = logging.getLogger(__name__)
 
-from app.api.formation.schemas import FormationSchema
-from app.core.database import SessionLocal, engine
-from app.models.Formation import Formation, Lieu, SalaireBornes, Badge, FiliereBac, SpecialiteFavorisee, MatiereEnseignee, DeboucheMetier, DeboucheSecteur, TsTauxParBac, IntervalsAdmis, CriteresCandidature, SousCritere, Boursiers, ProfilsAdmis, PromoCharacteristics, PostFormationOutcomes, VoieGenerale, VoiePro, VoieTechnologique
 router = APIRouter()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+CHANGES_BATCH_SIZE = 200
+
+@router.get("/autocomplete", response_model=AutocompleteOut)
+def autocomplete(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[str] = Query(None, regex="^(etablissement|ville|formation)$", description="Tous les types si absent"),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_read_db),
+):
+    """Prefix suggestions (établissements, villes, titres de formation), served from memory on every keystroke."""
+    suggestions = autocomplete_engine.suggest(db, q, kind, limit)
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return AutocompleteOut(query=q, suggestions=[
+        {"label": s.label, "kind": s.kind, "weight": s.weight} for s in suggestions
+    ])
+
+def formation_filters(
+    type_formation: Optional[str] = None,
+    type_etablissement: Optional[str] = None,
+    apprentissage: Optional[str] = None,
+    formation_selective: Optional[bool] = None,
+    region: Optional[str] = None,
+    academy: Optional[str] = None,
+    badge: Optional[str] = None,
+    voie: Optional[str] = Query(None, regex="^(generale|technologique|pro)$"),
+    min_taux_insertion: Optional[float] = Query(None, ge=0, le=100),
+    min_taux_reussite: Optional[float] = Query(None, ge=0, le=100),
+    min_taux_passage: Optional[float] = Query(None, ge=0, le=100),
+) -> FormationFilters:
+    """Catalogue filters shared by /formations/ and /formations/facets."""
+    return FormationFilters(
+        type_formation=type_formation, type_etablissement=type_etablissement, apprentissage=apprentissage,
+        formation_selective=formation_selective, region=region, academy=academy, badge=badge, voie=voie,
+        min_taux_insertion=min_taux_insertion, min_taux_reussite=min_taux_reussite,
+        min_taux_passage=min_taux_passage,
+    )
+
+# /formations/search, /formations/facets, /formations/compare, /formations/changes and
+# /formations/voie_technologique are declared before /formations/{formation_id}, which would
+# otherwise capture them
+
+@router.get("/formations/search", response_model=SearchResultsOut)
+def search_formations(
+    q: str = Query(..., min_length=2, max_length=200, description="Mots-clés (titre, programme, matières, métiers, secteurs)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    """French full-text search, best matches first; the page is loaded through the batch loader."""
+    total, page = search_engine.search(db, q, skip, limit)
+    formations, _ = load_formations_by_ids(db, [fid for fid, _ in page])
+    serialized = {f.id: f for f in with_admission(db, current_student(db, Authorize), formations)}
+    return SearchResultsOut(
+        query=q, total=total, skip=skip, limit=limit,
+        results=[{"score": score, "formation": serialized[fid]} for fid, score in page if fid in serialized],
+    )
+
+@router.get("/formations/facets", response_model=FacetsOut)
+def get_formation_facets(
+    response: Response,
+    filters: FormationFilters = Depends(formation_filters),
+    db: Session = Depends(get_read_db),
+):
+    """Counts per filter value for the formations /formations/ lists with the same filters."""
+    if filters.is_empty():
+        version, counts = facet_cache.get(db)
+        response.headers["Cache-Control"] = "public, max-age=60"
+    else:
+        version, counts = catalogue_version(db), facet_counts(db, filters)
+    return FacetsOut(
+        catalogue_version=version, total=counts.total,
+        facets={name: [{"value": v, "count": n} for v, n in values] for name, values in counts.facets.items()},
+    )
+
+# Fields shown side by side, read from the serialized formations (admission included)
+COMPARISON_FIELDS = (
+    ("titre", lambda f: f.titre),
+    ("etablissement", lambda f: f.etablissement),
+    ("type_formation", lambda f: f.type_formation),
+    ("ville", lambda f: f.lieu.ville if f.lieu else None),
+    ("duree", lambda f: f.duree),
+    ("apprentissage", lambda f: f.apprentissage),
+    ("formation_selective", lambda f: f.formation_selective),
+    ("prix_annuel", lambda f: f.prix_annuel),
+    ("salaire_moyen", lambda f: f.salaire_moyen),
+    ("taux_insertion", lambda f: f.taux_insertion),
+    ("taux_reussite_3_4_ans", lambda f: f.taux_reussite_3_4_ans),
+    ("taux_passage_2e_annee", lambda f: f.taux_passage_2e_annee),
+    ("poursuite_etudes", lambda f: f.poursuite_etudes),
+    ("admission", lambda f: f.admission.niveau if f.admission else None),
+)
+MAX_COMPARED = 10
+
+@router.get("/formations/compare", response_model=FormationComparisonOut)
+def compare_formations(
+    ids: str = Query(..., description="2 à 10 identifiants séparés par des virgules, dans l'ordre d'affichage"),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    """Side-by-side comparison: full formations plus one row per field, aligned with them."""
+    requested = parse_formation_ids(ids, max_ids=MAX_COMPARED)
+    if len(requested) < 2:
+        raise HTTPException(status_code=400, detail="Indiquez au moins deux formations à comparer.")
+    formations, missing = load_formations_by_ids(db, requested)
+    serialized = with_admission(db, current_student(db, Authorize), formations)
+    return FormationComparisonOut(
+        formations=serialized,
+        lignes=[{"champ": name, "valeurs": [read(f) for f in serialized]} for name, read in COMPARISON_FIELDS],
+        missing=missing,
+    )
+
+@router.get(
+    "/formations/changes",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "Flux NDJSON, gzip si accepté"}},
+)
+def get_formation_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Dernière catalogue_version reçue (0 = synchronisation complète)"),
+    limit: int = Query(5000, ge=1, le=50000),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Formations added, updated or deleted after catalogue version `since`, one JSON document per line.
+    The first line is {"catalogue_version", "since", "next", "complete", "count"}, followed by
+    {"v", "op": "upsert", "formation"} or {"v", "op": "delete", "id"}. Clients keep `next` and
+    call again while `complete` is false.
+    """
+    version = catalogue_version(db)
+    entries = changes_since(db, since, limit)
+    complete = len(entries) < limit
+    # Entries committed after `version` was read may already be in this page
+    last_seen = entries[-1][0] if entries else since
+    next_since = max(version, last_seen) if complete else last_seen
+
+    def lines():
+        yield {"catalogue_version": version, "since": since, "next": next_since,
+               "complete": complete, "count": len(entries)}
+        for start in range(0, len(entries), CHANGES_BATCH_SIZE):
+            chunk = entries[start:start + CHANGES_BATCH_SIZE]
+            ids = [fid for _, fid, deleted in chunk if not deleted]
+            formations = {
+                f.id: f for f in
+                db.query(Formation).options(*formation_detail_options()).filter(Formation.id.in_(ids))
+            } if ids else {}
+            for v, fid, deleted in chunk:
+                formation = formations.get(fid)
+                if deleted or formation is None:  # also covers rows removed outside the ORM
+                    yield {"v": v, "op": "delete", "id": fid}
+                else:
+                    try:
+                        document = formation_document(formation)
+                    except ValidationError as exc:  # like the export: one bad row must not cut the stream
+                        logger.warning("Formation %s skipped in changes feed: %s", fid, exc)
+                        continue
+                    yield {"v": v, "op": "upsert", "formation": document}
+            db.expunge_all()  # keep the identity map flat on long syncs
+
+    return ndjson_response(lines(), request, headers={"X-Catalogue-Version": str(version)})
+
+
+@router.get(
+    "/admin/formations/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "Flux NDJSON, gzip si accepté"}},
+)
+def export_formations(
+    request: Request,
+    batch_size: int = Query(500, ge=10, le=5000),
+    db: Session = Depends(get_read_db),
+    admin: str = Depends(require_admin),
+):
+    """Every formation with its full detail, one JSON document per line, streamed in constant memory."""
+    version = catalogue_version(db)
+    logger.info("Catalogue export (v%d) requested by %s", version, admin)
+    return ndjson_response(
+        iter_formation_documents(db, batch_size), request,
+        headers={"X-Catalogue-Version": str(version),
+                 "Content-Disposition": f'attachment; filename="formations-v{version}.ndjson"'},
+    )
+
+
+SNAPSHOT_MEDIA_TYPES = {".gz": "application/gzip", ".zip": "application/zip"}
+
+@router.get("/catalogue/snapshot", response_model=SnapshotManifestOut)
+def get_catalogue_snapshot(request: Request):
+    """Latest catalogue snapshot: version, row counts and the immutable download URL of each format."""
+    manifest = read_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Aucun instantané du catalogue n'est disponible.")
+    return SnapshotManifestOut(
+        catalogue_version=manifest.catalogue_version,
+        generated_at=manifest.generated_at,
+        tables=manifest.tables,
+        files=[
+            {**vars(f), "url": str(request.url_for("download_catalogue_snapshot", name=f.name))}
+            for f in manifest.files
+        ],
+    )
+
+@router.api_route("/catalogue/snapshot/{name}", methods=["GET", "HEAD"], name="download_catalogue_snapshot")
+def download_catalogue_snapshot(name: str, request: Request):
+    """Snapshot file download; supports Range / If-Range for resumable and parallel downloads."""
+    found = snapshot_file(name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Instantané introuvable.")
+    path, content_hash = found
+    return ranged_file_response(
+        request, path, SNAPSHOT_MEDIA_TYPES.get(os.path.splitext(name)[1], "application/octet-stream"),
+        etag=content_hash, filename=name,
+        cache_control="public, max-age=31536000, immutable",  # the name changes with the content
+    )
+
+@router.get("/formations/voie_technologique", response_model=List[FormationSchema])
+def get_formations_voie_technologique(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
+    formations = db.query(Formation).filter(Formation.voie_technologique != None).offset(skip).limit(limit).all()
+
+    if not formations:
+        raise HTTPException(status_code=404, detail="Aucune formation voie technologique trouvée.")
+
+    return formations
 
-# Get a specific formation with all details
 @router.get("/formations/{formation_id}", response_model=FormationSchema)
-def get_formation(formation_id: int, db: Session = Depends(get_db)):
-    formation = db.query(Formation).filter(Formation.id == formation_id).first()
+def get_formation(formation_id: int, db: Session = Depends(get_read_db), Authorize: AuthJWT = Depends()):
+    # Use lazyload('*') to defer all relationship loading
+    formation = db.query(Formation).options(
+        lazyload('*')  # Defer loading of all relationships
+    ).filter(Formation.id == formation_id).first()
+
     if not formation:
         raise HTTPException(status_code=404, detail="Formation not found")
 
-    result = {
-        "id": formation.id,
-        "timestamp": formation.timestamp,
-        "url": formation.url,
-        "titre": formation.titre,
-        "etablissement": formation.etablissement,
-        "type_formation": formation.type_formation,
-        "type_etablissement": formation.type_etablissement,
-        "formation_controlee_par_etat": formation.formation_controlee_par_etat,
-        "apprentissage": formation.apprentissage,
-        "prix_annuel": formation.prix_annuel,
-        "salaire_moyen": formation.salaire_moyen,
-        "poursuite_etudes": formation.poursuite_etudes,
-        "taux_insertion": formation.taux_insertion,
-        "lien_onisep": formation.lien_onisep,
-        "resume_programme": formation.resume_programme,
-        "duree": formation.duree,
-        "formation_selective": formation.formation_selective,
-        "taux_passage_2e_annee": formation.taux_passage_2e_annee,
-        "acces_formation": formation.acces_formation,
-        "pre_bac_admission_percentage": formation.pre_bac_admission_percentage,
-        "female_percentage": formation.female_percentage,
-        "new_bac_students_count": formation.new_bac_students_count,
-        "total_admitted_count": formation.total_admitted_count,
-        "complementary_phase_acceptance_percentage": formation.complementary_phase_acceptance_percentage,
-        "taux_reussite_3_4_ans": formation.taux_reussite_3_4_ans,
-        "lieu": db.query(Lieu).filter(Lieu.formation_id == formation_id).first(),
-        "salaire_bornes": db.query(SalaireBornes).filter(SalaireBornes.formation_id == formation_id).first(),
-        "badges": db.query(Badge).filter(Badge.formation_id == formation_id).all(),
-        "filieres_bac": db.query(FiliereBac).filter(FiliereBac.formation_id == formation_id).all(),
-        "specialites_favorisees": db.query(SpecialiteFavorisee).filter(SpecialiteFavorisee.formation_id == formation_id).all(),
-        "matieres_enseignees": db.query(MatiereEnseignee).filter(MatiereEnseignee.formation_id == formation_id).all(),
-        "debouches_metiers": db.query(DeboucheMetier).filter(DeboucheMetier.formation_id == formation_id).all(),
-        "debouches_secteurs": db.query(DeboucheSecteur).filter(DeboucheSecteur.formation_id == formation_id).all(),
-        "ts_taux_par_bac": db.query(TsTauxParBac).filter(TsTauxParBac.formation_id == formation_id).all(),
-        "intervalles_admis": db.query(IntervalsAdmis).filter(IntervalsAdmis.formation_id == formation_id).all(),
-        "criteres_candidature": db.query(CriteresCandidature).filter(CriteresCandidature.formation_id == formation_id).all(),
-        "boursiers": db.query(Boursiers).filter(Boursiers.formation_id == formation_id).first(),
-        "profils_admis": db.query(ProfilsAdmis).filter(ProfilsAdmis.formation_id == formation_id).all(),
-        "promo_characteristics": db.query(PromoCharacteristics).filter(PromoCharacteristics.formation_id == formation_id).first(),
-        "post_formation_outcomes": db.query(PostFormationOutcomes).filter(PostFormationOutcomes.formation_id == formation_id).first(),
-        "voie_generale": db.query(VoieGenerale).filter(VoieGenerale.formation_id == formation_id).first(),
-        "voie_pro": db.query(VoiePro).filter(VoiePro.formation_id == formation_id).first(),
-        "voie_technologique": db.query(VoieTechnologique).filter(VoieTechnologique.formation_id == formation_id).first()
-    }
-    return result
+    # Force loading of relationships to ensure all data is available for serialization
+    formation.lieu  # Accessing triggers lazy load
+    formation.salaire_bornes
+    formation.badges  # Accessing collections triggers lazy load
+    formation.filieres_bac
+    formation.specialites_favorisees
+    formation.matieres_enseignees
+    formation.debouches_metiers
+    formation.debouches_secteurs
+    formation.ts_taux_par_bac
+    formation.intervalles_admis
+    formation.profils_admis
+    formation.criteres_candidature  # Includes sous_criteres due to relationship
+    formation.boursiers
+    formation.promo_characteristics
+    formation.post_formation_outcomes
+    formation.voie_generale
+    formation.voie_pro
+    formation.voie_technologique
+
+    return with_admission(db, current_student(db, Authorize), [formation])[0]
+
+@router.get("/formations/{formation_id}/similar", response_model=List[SimilarFormationOut])
+def get_similar_formations(
+    formation_id: int,
+    limit: int = Query(5, ge=1, le=20),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    """Precomputed neighbours (app.jobs.build_neighbors): one primary-key range scan, then the batch loader."""
+    neighbors = db.query(FormationNeighbor.neighbor_id, FormationNeighbor.score) \
+        .filter(FormationNeighbor.formation_id == formation_id) \
+        .order_by(FormationNeighbor.rank).limit(limit).all()
+    if not neighbors and not db.query(Formation.id).filter(Formation.id == formation_id).first():
+        raise HTTPException(status_code=404, detail="Formation not found")
+    formations, _ = load_formations_by_ids(db, [n.neighbor_id for n in neighbors])
+    serialized = {f.id: f for f in with_admission(db, current_student(db, Authorize), formations)}
+    return [
+        {"score": n.score, "formation": serialized[n.neighbor_id]}
+        for n in neighbors if n.neighbor_id in serialized  # deleted since the last build
+    ]
+
+
+# Sortable columns of the formation list (numeric copies for the percentage strings)
+FORMATION_SORTS = {
+    "taux_insertion": Formation.taux_insertion_pct,
+    "taux_reussite": Formation.taux_reussite_3_4_ans_pct,
+    "taux_passage": Formation.taux_passage_2e_annee_pct,
+    "poursuite_etudes": Formation.poursuite_etudes_pct,
+    "prix": Formation.prix_annuel,
+    "salaire": Formation.salaire_moyen,
+}
 
 # Get 10 formations
 @router.get("/formations/", response_model=List[FormationSchema])
-def get_formations(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    formations = db.query(Formation).offset(skip).limit(limit).all()
-    return formations
\ No newline at end of file
+def get_formations(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    sort: Optional[str] = Query(None, description="taux_insertion, taux_reussite, taux_passage, poursuite_etudes, prix ou salaire; préfixe '-' pour l'ordre décroissant"),
+    filters: FormationFilters = Depends(formation_filters),
+    ids: Optional[str] = Query(None, description="Liste d'identifiants (1,2,3): renvoyés dans cet ordre, sans pagination; les absents sont listés dans l'en-tête X-Missing-Ids"),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    limit = min(limit, 10)
+    student = current_student(db, Authorize)
+    if ids is not None:
+        formations, missing = load_formations_by_ids(db, parse_formation_ids(ids))
+        if missing:
+            response.headers["X-Missing-Ids"] = ",".join(map(str, missing))
+        return with_admission(db, student, formations)
+
+    query = filters.apply(db.query(Formation).options(*formation_detail_options()))
+    if sort:
+        column = FORMATION_SORTS.get(sort.lstrip("-"))
+        if column is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tri invalide: {sort}. Valeurs autorisées: {', '.join(FORMATION_SORTS)}.",
+            )
+        order = column.desc() if sort.startswith("-") else column.asc()
+        query = query.order_by(order.nullslast(), Formation.id)
+    else:
+        query = query.order_by(Formation.id)
+
+    try:
+        formations = query.offset(skip).limit(limit).all()
+
+        return with_admission(db, student, formations)
+
+    except Exception as e:
+        logger.exception("Failed to load formations")
+        raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des formations: {str(e)}")
+
+
+# Updated route to get etablissements
+@router.get("/etablissements/", response_model=List[EtablissementSchema])
+def get_etablissements(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
+    limit = min(limit, 10)  # Cap limit to prevent overload
+
+    # Fetch establishments from Formation.lieu and Location
+    etab_from_formation = db.query(Formation.etablissement).distinct().filter(
+        Formation.etablissement.isnot(None)
+    ).subquery()
+
+    etab_from_location = db.query(Formation.etablissement).distinct().filter(
+        Formation.etablissement.isnot(None)
+    ).subquery()
+
+    all_etablissements = db.query(
+        func.coalesce(etab_from_formation.c.etablissement, etab_from_location.c.etablissement)).distinct().all()
+
+    # Paginate the results
+    start = skip
+    end = min(skip + limit, len(all_etablissements))
+    paginated_etablissements = all_etablissements[start:end]
+
+    # Create EtablissementSchema objects with a default description
+    result = [
+        EtablissementSchema(name=etab[0], description=f"Établissement à {etab[0]}")
+        for etab in paginated_etablissements
+    ]
+    return result
+
+
+# Academies that have at least one formation (lieu.academie_id, set by app.jobs.link_references)
+@router.get("/lieu/academies/", response_model=List[AcademieSchema])
+def get_academies(skip: int = 0, limit: int = 10, db: Session = Depends(get_read_db)):
+    limit = min(limit, 10)  # Cap limit to prevent overload
+    rows = (
+        db.query(Academie.name)
+        .filter(db.query(Lieu.id).filter(Lieu.academie_id == Academie.id).exists())
+        .order_by(asc(Academie.name))
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [AcademieSchema(name=name) for name, in rows]
+
+def linked_formations(db: Session, Authorize: AuthJWT, query, skip: int, limit: int) -> List[FormationSchema]:
+    """One page of the formation ids selected by `query` (an indexed link column), then the batch loader."""
+    ids = [fid for fid, in query.order_by(Formation.id).offset(skip).limit(limit).all()]
+    formations, _ = load_formations_by_ids(db, ids)
+    return with_admission(db, current_student(db, Authorize), formations)
+
+@router.get("/academies", response_model=List[AcademieOut])
+def list_academies(
+    q: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    query = db.query(Academie)
+    if q:
+        query = query.filter(Academie.name.ilike(f"%{q}%"))
+    rows = query.order_by(asc(Academie.name)).all()
+    return [AcademieOut(id=a.id, name=a.name) for a in rows]
+
+@router.get("/academies/{academie_id}", response_model=AcademieOut)
+def get_academie(
+    academie_id: int,
+    with_etablissements: bool = True,
+    db: Session = Depends(get_read_db),
+):
+    query = db.query(Academie)
+    if with_etablissements:
+        query = query.options(selectinload(Academie.etablissements))
+    a = query.filter(Academie.id == academie_id).first()
+    if not a:
+        raise HTTPException(status_code=404, detail="Académie non trouvée")
+
+    return AcademieOut(
+        id=a.id,
+        name=a.name,
+        etablissements=[
+            EtablissementOut(
+                id=e.id,
+                academie_id=e.academie_id,
+                etablissement=e.etablissement,
+                city=e.city,
+                sector=e.sector,
+                track=e.track,
+            ) for e in (a.etablissements or [])
+        ] if with_etablissements else None
+    )
+
+@router.get("/academies/{academie_id}/etablissements", response_model=List[EtablissementOut])
+def list_etablissements_in_academie(
+    academie_id: int,
+    q: Optional[str] = None,
+    city: Optional[str] = None,
+    track: Optional[str] = None,
+    sector: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    exists = db.query(Academie.id).filter(Academie.id == academie_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Académie non trouvée")
+
+    base = db.query(Etablissement).filter(Etablissement.academie_id == academie_id)
+    if q:
+        base = base.filter(Etablissement.etablissement.ilike(f"%{q}%"))
+    if city:
+        base = base.filter(Etablissement.city.ilike(f"%{city}%"))
+    if track:
+        base = base.filter(Etablissement.track.ilike(f"%{track}%"))
+    if sector:
+        base = base.filter(Etablissement.sector.ilike(f"%{sector}%"))
+
+    rows = base.order_by(asc(Etablissement.etablissement), asc(Etablissement.city)).all()
+    return [
+        EtablissementOut(
+            id=e.id,
+            academie_id=e.academie_id,
+            etablissement=e.etablissement,
+            city=e.city,
+            sector=e.sector,
+            track=e.track,
+        ) for e in rows
+    ]
+
+@router.get("/academies/{academie_id}/formations", response_model=List[FormationSchema])
+def list_formations_in_academie(
+    academie_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    if not db.query(Academie.id).filter(Academie.id == academie_id).first():
+        raise HTTPException(status_code=404, detail="Académie non trouvée")
+    query = db.query(Formation.id).join(Lieu, Lieu.formation_id == Formation.id) \
+        .filter(Lieu.academie_id == academie_id).distinct()
+    return linked_formations(db, Authorize, query, skip, limit)
+
+@router.get("/etablissements", response_model=List[EtablissementOut])
+def list_etablissements(
+    q: Optional[str] = None,
+    academie_id: Optional[int] = None,
+    city: Optional[str] = None,
+    track: Optional[str] = None,
+    sector: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    base = db.query(Etablissement)
+
+    if academie_id is not None:
+        base = base.filter(Etablissement.academie_id == academie_id)
+    if q:
+        base = base.filter(Etablissement.etablissement.ilike(f"%{q}%"))
+    if city:
+        base = base.filter(Etablissement.city.ilike(f"%{city}%"))
+    if track:
+        base = base.filter(Etablissement.track.ilike(f"%{track}%"))
+    if sector:
+        base = base.filter(Etablissement.sector.ilike(f"%{sector}%"))
+
+    rows = base.order_by(asc(Etablissement.etablissement), asc(Etablissement.city)).all()
+    return [
+        EtablissementOut(
+            id=e.id,
+            academie_id=e.academie_id,
+            etablissement=e.etablissement,
+            city=e.city,
+            sector=e.sector,
+            track=e.track,
+        ) for e in rows
+    ]
+
+@router.get("/etablissements/{etablissement_id}/formations", response_model=List[FormationSchema])
+def list_formations_in_etablissement(
+    etablissement_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
+    if not db.query(Etablissement.id).filter(Etablissement.id == etablissement_id).first():
+        raise HTTPException(status_code=404, detail="Établissement non trouvé")
+    query = db.query(Formation.id).filter(Formation.etablissement_id == etablissement_id)
+    return linked_formations(db, Authorize, query, skip, limit)
+
+@router.get("/etablissements/{etablissement_id}", response_model=EtablissementOut)
+def get_etablissement(
+    etablissement_id: int,
+    db: Session = Depends(get_read_db),
+):
+    e = (
+        db.query(Etablissement)
+        .options(selectinload(Etablissement.academie))
+        .filter(Etablissement.id == etablissement_id)
+        .first()
+    )
+    if not e:
+        raise HTTPException(status_code=404, detail="Établissement non trouvé")
+
+    return EtablissementOut(
+        id=e.id,
+        academie_id=e.academie_id,
+        etablissement=e.etablissement,
+        city=e.city,
+        sector=e.sector,
+        track=e.track,
+    )
@@ -2,8 +2,8 @@
 import json
 from pydantic import BaseModel, validator
 
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, StrictBool
+from typing import Any, Dict, List, Optional, Union
 # Pydantic schemas
 class EtablissementSchema(BaseModel):
     name: str
@@ -171,6 +171,14 @@ class VoieSchema(BaseModel):
     class Config:
         orm_mode = True
 
+class AdmissionEstimateOut(BaseModel):
+    # Estimated for the authenticated student from their notes and voie; None when the data is missing
+    probabilite: Optional[float] = None
+    niveau: str  # "élevé", "moyen", "faible", "très faible" or "inconnu"
+
+    class Config:
+        orm_mode = True
+
 class FormationSchema(BaseModel):
     id: int
     timestamp: str
@@ -221,6 +229,7 @@ class FormationSchema(BaseModel):
     voie_generale: Optional[VoieSchema] = None
     voie_pro: Optional[VoieSchema] = None
     voie_technologique: Optional[VoieSchema] = None
+    admission: Optional[AdmissionEstimateOut] = None  # only for authenticated requests
     class Config:
         orm_mode = True
 
@@ -276,4 +285,100 @@ class AcademieOut(AcademieBase):
     etablissements: Optional[List[EtablissementOut]] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# ----- Recommendations -----
+
+class RecommendationScores(BaseModel):
+    # Each component is in [0, 1]; components the profile cannot inform are omitted
+    specialites: Optional[float] = None
+    voie: Optional[float] = None
+    interets: Optional[float] = None
+    type_formation: Optional[float] = None
+    budget: Optional[float] = None
+    distance: Optional[float] = None
+    boursiers: Optional[float] = None
+
+class FormationRecommendationOut(BaseModel):
+    formation_id: int
+    titre: str
+    etablissement: str
+    type_formation: str
+    ville: Optional[str] = None
+    prix_annuel: Optional[float] = None
+    distance_km: Optional[float] = None
+    score: float
+    details: RecommendationScores
+    admission: Optional[AdmissionEstimateOut] = None
+
+# ----- Catalogue snapshot -----
+
+class SnapshotFileOut(BaseModel):
+    name: str
+    format: str
+    size: int
+    sha256: str
+    url: str
+
+class SnapshotManifestOut(BaseModel):
+    catalogue_version: int
+    generated_at: str
+    tables: Dict[str, int]
+    files: List[SnapshotFileOut]
+
+# ----- Batch loads: ?ids=, comparison, favourites -----
+
+class ComparisonRow(BaseModel):
+    champ: str
+    valeurs: List[Any]  # aligned with FormationComparisonOut.formations
+
+class FormationComparisonOut(BaseModel):
+    formations: List[FormationSchema]
+    lignes: List[ComparisonRow]
+    missing: List[int] = []
+
+class FavoritesOut(BaseModel):
+    formations: List[FormationSchema]
+    missing: List[int] = []
+
+class FavoritesUpdate(BaseModel):
+    formation_ids: List[int]
+
+# ----- Search -----
+
+class SearchHitOut(BaseModel):
+    score: float
+    formation: FormationSchema
+
+class SearchResultsOut(BaseModel):
+    query: str
+    total: int
+    skip: int
+    limit: int
+    results: List[SearchHitOut]
+
+class SimilarFormationOut(BaseModel):
+    score: float  # cosine similarity, see app.services.similarity
+    formation: FormationSchema
+
+# ----- Facets -----
+
+class FacetValueOut(BaseModel):
+    value: Union[StrictBool, str]
+    count: int
+
+class FacetsOut(BaseModel):
+    catalogue_version: int
+    total: int  # formations matching the filters, as listed by /formations/
+    facets: Dict[str, List[FacetValueOut]]
+
+# ----- Autocomplete -----
+
+class AutocompleteSuggestionOut(BaseModel):
+    label: str
+    kind: str  # etablissement, ville or formation
+    weight: int  # popularity: formations, établissements, students (and favourites) with this value
+
+class AutocompleteOut(BaseModel):
+    query: str
+    suggestions: List[AutocompleteSuggestionOut]
@@ -0,0 +1,188 @@
+# app/api/plan_action/route.py
+# Plans d'action, their steps and the students' progress.
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import and_, exists, func
+from sqlalchemy.orm import Session, selectinload
+
+from app.api.auth.schemas import (
+    UserResponse,
+    PlanActionCreate, PlanActionResponse,
+    PlanStepCreate, PlanStepResponse,
+    UserStepProgressCreate, UserStepProgressUpdate, UserStepProgressResponse,
+)
+from app.core.database import get_db
+from app.core.unit_of_work import insert_returning, update_returning, upsert_returning
+from app.models.PlanAction import PlanAction, PlanStep, UserStepProgress
+from app.models.user import User
+
+router = APIRouter()
+
+# =========================
+# Plan Actions & Steps
+# =========================
+
+@router.post("/plans", response_model=PlanActionResponse, status_code=201)
+def create_plan(
+    payload: PlanActionCreate,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    plan = PlanAction(
+        nom=payload.nom,
+        start_date=payload.start_date,
+        end_date=payload.end_date,
+        is_active=payload.is_active if payload.is_active is not None else True,
+        steps=[],  # a new plan has none: serialising it must not query them
+    )
+    db.add(plan)
+    db.commit()
+    return plan
+
+@router.get("/plans/{plan_id}", response_model=PlanActionResponse)
+def get_plan(
+    plan_id: int,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    plan = (
+        db.query(PlanAction)
+        .options(selectinload(PlanAction.steps))
+        .filter(PlanAction.id == plan_id)
+        .first()
+    )
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
+    return plan
+
+@router.post("/plans/{plan_id}/steps", response_model=PlanStepResponse, status_code=201)
+def create_plan_step(
+    plan_id: int,
+    payload: PlanStepCreate,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    # INSERT ... SELECT ... WHERE EXISTS (plan) RETURNING: no row when the plan does not exist
+    step = insert_returning(db, PlanStep, {
+        "plan_action_id": plan_id,
+        "titre": payload.titre,
+        "description": payload.description,
+        "ordre": payload.ordre,
+        "start_date": payload.start_date,
+        "end_date": payload.end_date,
+    }, where=exists().where(PlanAction.id == plan_id))
+    if step is None:
+        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
+    db.commit()
+    return step
+
+@router.post("/users/{user_id}/assign-plan/{plan_id}", response_model=UserResponse)
+def assign_plan_to_user(
+    user_id: int,
+    plan_id: int,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    plan_exists = exists().where(PlanAction.id == plan_id)
+    user = update_returning(db, User, {"plan_action_id": plan_id}, User.id == user_id, plan_exists)
+    if user is None:
+        # Nothing updated: tell which one is missing (error path only)
+        if db.query(User.id).filter(User.id == user_id).first() is None:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
+    db.commit()
+    return user
+
+@router.get("/me/plan-action", response_model=PlanActionResponse)
+def get_user_plan_action(
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    """Return my assigned plan with ordered steps."""
+    Authorize.jwt_required()
+    email = Authorize.get_jwt_subject()
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    if not user.plan_action_id:
+        raise HTTPException(status_code=404, detail="Plan d’action non assigné")
+
+    plan = (
+        db.query(PlanAction)
+        .options(selectinload(PlanAction.steps))
+        .filter(PlanAction.id == user.plan_action_id)
+        .first()
+    )
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan d’action non trouvé")
+    return plan
+
+# =========================
+# User Step Progress
+# =========================
+
+@router.post("/users/{user_id}/steps/{step_id}/done", response_model=UserStepProgressResponse, status_code=201)
+def mark_step_done(
+    user_id: int,
+    step_id: int,
+    payload: UserStepProgressCreate,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    # One INSERT ... SELECT ... WHERE EXISTS (user) AND EXISTS (step) ON CONFLICT DO UPDATE RETURNING
+    progress = upsert_returning(
+        db, UserStepProgress,
+        {"user_id": user_id, "step_id": step_id, "is_done": True, "done_at": func.now()},
+        key=("user_id", "step_id"),
+        update={"is_done": True, "done_at": func.now()},
+        where=and_(
+            exists().where(User.id == user_id),
+            exists().where(PlanStep.id == step_id),
+        ),
+    )
+    if progress is None:
+        if db.query(User.id).filter(User.id == user_id).first() is None:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        raise HTTPException(status_code=404, detail="Étape non trouvée")
+    db.commit()
+    return progress
+
+@router.patch("/users/{user_id}/steps/{step_id}", response_model=UserStepProgressResponse)
+def update_step_progress(
+    user_id: int,
+    step_id: int,
+    payload: UserStepProgressUpdate,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    progress = update_returning(
+        db, UserStepProgress,
+        {"is_done": payload.is_done, "done_at": func.now() if payload.is_done else None},
+        UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id,
+    )
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Progression introuvable")
+    db.commit()
+    return progress
+
+@router.get("/users/{user_id}/progress", response_model=List[UserStepProgressResponse])
+def list_user_progress(
+    user_id: int,
+    db: Session = Depends(get_db),
+    Authorize: AuthJWT = Depends(),
+):
+    Authorize.jwt_required()
+    progress = (
+        db.query(UserStepProgress)
+        .filter(UserStepProgress.user_id == user_id)
+        .all()
+    )
+    return progress
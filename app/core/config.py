@@ -1,11 +1,41 @@
-from pydantic import BaseSettings
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseSettings, root_validator
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+API_ROUTER_NAMES = ("auth", "plans", "catalogue", "async")
+# Only the auth router sends e-mails and talks to Google
+AUTH_SETTINGS = ("EMAIL_SENDER", "EMAIL_PASSWORD", "EMAIL_HOST", "EMAIL_PORT", "EMAIL_USE_SSL", "EMAIL_DEFAULT_SENDER",
+                 "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET")
+# "<scope>:<ip|email>" -> "<requests>/<second|minute|hour|day>" token buckets (see app.core.rate_limit).
+# IP limits stay generous: a whole lycée can sit behind one address.
+DEFAULT_RATE_LIMITS = {
+    "login:ip": "60/minute",
+    "login:email": "10/minute",
+    "register:ip": "30/minute",
+    "register:email": "3/hour",
+    "forgot_password:ip": "30/minute",
+    "forgot_password:email": "3/hour",
+    "verify_code:ip": "60/minute",  # 6-digit codes: bounds guessing
+    "verify_code:email": "10/hour",
+}
+
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Optional explicit URL for the async engine; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Optional read replica; read-only catalogue/reference sessions are routed to it when set
+    DATABASE_REPLICA_URL: Optional[str] = None
+    ASYNC_DATABASE_REPLICA_URL: Optional[str] = None
+    # Connection pool (applies to every engine: primary, replica, sync and async)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: int = 1800  # seconds; recycle before server/proxy idle timeouts
+    DB_POOL_PRE_PING: bool = True  # one extra round trip per checkout; can be disabled when recycle is tuned
     authjwt_secret_key: str
     authjwt_algorithm: str = "HS256"
     authjwt_token_location: set = {"headers"}
@@ -14,16 +44,67 @@ class Settings(BaseSettings):
     authjwt_access_token_expires: int = 3600
     authjwt_refresh_token_expires: int = 604800  # 7 days
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
-    EMAIL_SENDER: str
-    EMAIL_PASSWORD: str
-    EMAIL_HOST: str
-    EMAIL_PORT: int
-    EMAIL_USE_SSL: bool
-    EMAIL_DEFAULT_SENDER: str
+    METRICS_ENABLED: bool = True  # /metrics endpoint + latency middleware
+    # Per-request SQL instrumentation: "off", "on" (counts/timings, slow-request log) or "dev" (also flags N+1)
+    SQL_INSTRUMENTATION: str = "on"
+    # Server-Timing (query count, DB time) on responses; internal/debug use only, always on in "dev"
+    SQL_SERVER_TIMING: bool = False
+    SLOW_QUERY_MS: float = 200.0  # single statement slower than this is logged
+    SLOW_REQUEST_DB_MS: float = 500.0  # total DB time per request above this is logged
+    N_PLUS_ONE_THRESHOLD: int = 5  # same statement shape repeated this many times in one request
+    RECOMMENDATION_REFRESH_SECONDS: float = 60.0  # how often the feature matrix checks for external catalogue changes
+    CATALOGUE_INDEX_REFRESH_SECONDS: float = 60.0  # same, for the in-memory search/autocomplete indexes
+    AUTOCOMPLETE_MAX_AGE_SECONDS: float = 900.0  # full rebuild interval, for users'/établissements' names
+    ANALYTICS_REFRESH_SECONDS: float = 900.0  # max age of the cohort_stats summary served to counselors
+    # Accounts allowed on the admin endpoints (export, ...); JSON list in the environment: '["a@b.fr"]'
+    ADMIN_EMAILS: Set[str] = set()
+    SNAPSHOT_DIR: str = "snapshots"  # catalogue snapshots written by app.jobs.build_snapshot, served by the API
+    SNAPSHOT_KEEP: int = 3  # generations kept on disk; clients may still be downloading an older one
+    # Routers mounted by app.main, among API_ROUTER_NAMES; '["catalogue"]' for read-only catalogue pods
+    API_ROUTERS: List[str] = list(API_ROUTER_NAMES)
+    # EMAIL_* and GOOGLE_* are required when the auth router is mounted
+    EMAIL_SENDER: Optional[str] = None
+    EMAIL_PASSWORD: Optional[str] = None
+    EMAIL_HOST: Optional[str] = None
+    EMAIL_PORT: Optional[int] = None
+    EMAIL_USE_SSL: Optional[bool] = None
+    EMAIL_DEFAULT_SENDER: Optional[str] = None
+    EMAIL_USE_STARTTLS: bool = True  # only used when EMAIL_USE_SSL is false; disable for a local SMTP stand-in
+    EMAIL_VERIFY_RECIPIENT: bool = True  # DNS MX + SMTP RCPT probe before sending
     RESET_CODE_EXPIRES: int = 1800  # 30 minutes
     REGISTRATION_CODE_EXPIRES: int = 1800  # 30 minutes
-    GOOGLE_CLIENT_ID: str
-    GOOGLE_CLIENT_SECRET: str
+    GOOGLE_CLIENT_ID: Optional[str] = None
+    GOOGLE_CLIENT_SECRET: Optional[str] = None
+    # Throttling of login / register / forgot-password / code checks (429 + Retry-After)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker process) or "redis" (shared by every worker)
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # redis://host:6379/0, required by the redis backend
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0  # reverse proxies in front of the API; the client IP is read from X-Forwarded-For
+    RATE_LIMITS: Dict[str, str] = DEFAULT_RATE_LIMITS  # JSON in the environment; replaces the whole table
+    # Expensive calls in flight per process ("email": SMTP probe + send, "password": bcrypt,
+    # "google": ID token verification against Google's certificates); 0 = unlimited.
+    # Past the limit a request waits CONCURRENCY_WAIT_SECONDS for a slot, then gets a 503 + Retry-After.
+    CONCURRENCY_LIMITS: Dict[str, int] = {"email": 4, "password": 8, "google": 8}
+    CONCURRENCY_WAIT_SECONDS: float = 0.5
+
+    @root_validator(skip_on_failure=True)
+    def _check_routers(cls, values):
+        unknown = set(values["API_ROUTERS"]) - set(API_ROUTER_NAMES)
+        if unknown:
+            raise ValueError(f"unknown API_ROUTERS {sorted(unknown)}; expected some of {list(API_ROUTER_NAMES)}")
+        missing = [name for name in AUTH_SETTINGS if values.get(name) is None]
+        if "auth" in values["API_ROUTERS"] and missing:
+            raise ValueError(f"{', '.join(missing)} required when the auth router is mounted")
+        if values["RATE_LIMIT_BACKEND"] not in ("memory", "redis"):
+            raise ValueError("RATE_LIMIT_BACKEND must be 'memory' or 'redis'")
+        if values["RATE_LIMIT_BACKEND"] == "redis" and not values.get("RATE_LIMIT_REDIS_URL"):
+            raise ValueError("RATE_LIMIT_REDIS_URL required by the redis rate limit backend")
+        from app.core.rate_limit import parse_rate
+
+        for rate in values["RATE_LIMITS"].values():
+            parse_rate(rate)
+        return values
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,12 +1,159 @@
 # app/core/database.py
+from typing import Optional, Sequence
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.core.config import settings
-# Use psycopg dialect
-engine = create_engine(settings.DATABASE_URL.replace("psycopg2", "psycopg"), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.core.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, pool_snapshot
+
+
+def _engine_kwargs(url: str, poolclass) -> dict:
+    kwargs = dict(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if make_url(url).get_backend_name() == "sqlite":
+        # Local/test runs: pooled SQLite connections are handed across worker threads
+        kwargs["connect_args"] = {"check_same_thread": False}
+    return kwargs
+
+
+def _sync_database_url(url: str) -> str:
+    # Use psycopg dialect
+    return url.replace("psycopg2", "psycopg")
+
+
+def _async_database_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        return str(parsed.set(drivername="postgresql+asyncpg"))
+    if backend == "sqlite":
+        return str(parsed.set(drivername="sqlite+aiosqlite"))
+    return url
+
+
+_database_url = _sync_database_url(settings.DATABASE_URL)
+engine = create_engine(_database_url, **_engine_kwargs(_database_url, InstrumentedQueuePool))
+_replica_url = _sync_database_url(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+replica_engine = (
+    create_engine(_replica_url, **_engine_kwargs(_replica_url, InstrumentedQueuePool))
+    if _replica_url else None
+)
+
+# Async stack, used by the async endpoint variants while both stacks coexist
+_async_url = settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **_engine_kwargs(_async_url, InstrumentedAsyncQueuePool))
+_async_replica_url = settings.ASYNC_DATABASE_REPLICA_URL or (
+    _async_database_url(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+)
+async_replica_engine = (
+    create_async_engine(_async_replica_url, **_engine_kwargs(_async_replica_url, InstrumentedAsyncQueuePool))
+    if _async_replica_url else None
+)
+
+
+class RoutingSession(Session):
+    """
+    Route sessions opened with info={"read_only": True} to the replica (when configured).
+    Anything that flushes, and every other session, goes to the primary.
+    """
+    primary_bind = engine
+    replica_bind = replica_engine
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.replica_bind is not None and self.info.get("read_only") and not self._flushing:
+            return self.replica_bind
+        return self.primary_bind
+
+
+class AsyncRoutingSession(RoutingSession):
+    primary_bind = async_engine.sync_engine
+    replica_bind = async_replica_engine.sync_engine if async_replica_engine is not None else None
+
+
+# expire_on_commit=False: what a write endpoint committed is serialised as is, without a reload per object;
+# server-generated columns come back from the flush itself (eager_defaults, see app.core.unit_of_work)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False)
+# expire_on_commit=False: attributes must stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = sessionmaker(
+    class_=AsyncSession, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Create and migrate the schema; a database already at the latest version costs one query."""
+    from app.core.migrations import LATEST_VERSION, run_migrations, stored_version
+
+    if stored_version(engine) >= LATEST_VERSION:
+        return
+    from app.models import import_all_models
+
+    import_all_models()  # every table, not only those of the models the caller imported
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def get_db():
+    """Session on the primary, for endpoints that write."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Session for read-only catalogue/reference queries; served by the replica when one is configured."""
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+IN_BATCH_SIZE = 500
+
+
+def in_batches(query, column, ids: Optional[Sequence[int]]):
+    """Run `query` over all rows, or once per IN_BATCH_SIZE slice of `ids`."""
+    if ids is None:
+        yield from query
+        return
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        yield from query.filter(column.in_(ids[start:start + IN_BATCH_SIZE]))
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        yield db
+
+
+async def dispose_async_engines():
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+
+
+def pool_status() -> dict:
+    """Occupancy and checkout-wait statistics of every configured pool."""
+    engines = {
+        "primary": engine,
+        "replica": replica_engine,
+        "async_primary": async_engine.sync_engine,
+        "async_replica": async_replica_engine.sync_engine if async_replica_engine is not None else None,
+    }
+    return {name: pool_snapshot(e.pool) for name, e in engines.items() if e is not None}
@@ -3,6 +3,9 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from app.core.config import settings
+from app.core.metrics import (
+    EMAIL_SEND_DURATION, EMAIL_SEND_FAILURES, EMAIL_VERIFY_DURATION, EMAIL_VERIFY_FAILURES,
+)
 import logging
 import dns.resolver
 
@@ -16,6 +19,16 @@ class EmailNotExistError(Exception):
 
 def verify_email_existence(to_email: str) -> bool:
     """Verify if the email address exists by checking DNS MX records and SMTP response."""
+    if not settings.EMAIL_VERIFY_RECIPIENT:
+        return True
+    with EMAIL_VERIFY_DURATION.time():
+        exists = _probe_mailbox(to_email)
+    if not exists:
+        EMAIL_VERIFY_FAILURES.inc()
+    return exists
+
+
+def _probe_mailbox(to_email: str) -> bool:
     try:
         # Extract domain from email
         domain = to_email.split('@')[1]
@@ -51,6 +64,32 @@ def verify_email_existence(to_email: str) -> bool:
         return False
 
 
+def _send_html_email(msg: MIMEMultipart, to_email: str, template: str) -> bool:
+    try:
+        with EMAIL_SEND_DURATION.labels(template).time():
+            if settings.EMAIL_USE_SSL:
+                server = smtplib.SMTP_SSL(settings.EMAIL_HOST, settings.EMAIL_PORT)
+            else:
+                server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
+                if settings.EMAIL_USE_STARTTLS:
+                    server.starttls()
+
+            server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
+            server.sendmail(settings.EMAIL_DEFAULT_SENDER, to_email, msg.as_string())
+            server.quit()
+        return True
+    except smtplib.SMTPAuthenticationError as e:
+        EMAIL_SEND_FAILURES.labels(template).inc()
+        raise Exception(
+            f"SMTP authentication failed: Invalid username or password. Please check EMAIL_SENDER and EMAIL_PASSWORD.")
+    except smtplib.SMTPException as e:
+        EMAIL_SEND_FAILURES.labels(template).inc()
+        raise Exception(f"SMTP error: {str(e)}")
+    except Exception as e:
+        EMAIL_SEND_FAILURES.labels(template).inc()
+        raise Exception(f"Failed to send email: {str(e)}")
+
+
 def send_registration_code_email(to_email: str, code: str, verification_token: str):
     # Verify email existence before proceeding
     if not verify_email_existence(to_email):
@@ -74,24 +113,7 @@ def send_registration_code_email(to_email: str, code: str, verification_token: s
     msg['Subject'] = "Code de vérification d'inscription"
     msg.attach(MIMEText(html_content, 'html'))
 
-    try:
-        if settings.EMAIL_USE_SSL:
-            server = smtplib.SMTP_SSL(settings.EMAIL_HOST, settings.EMAIL_PORT)
-        else:
-            server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
-            server.starttls()
-
-        server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
-        server.sendmail(settings.EMAIL_DEFAULT_SENDER, to_email, msg.as_string())
-        server.quit()
-        return True
-    except smtplib.SMTPAuthenticationError as e:
-        raise Exception(
-            f"SMTP authentication failed: Invalid username or password. Please check EMAIL_SENDER and EMAIL_PASSWORD.")
-    except smtplib.SMTPException as e:
-        raise Exception(f"SMTP error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Failed to send email: {str(e)}")
+    return _send_html_email(msg, to_email, template="registration")
 
 
 def send_reset_code_email(to_email: str, code: str, reset_token: str):
@@ -117,21 +139,4 @@ def send_reset_code_email(to_email: str, code: str, reset_token: str):
     msg['Subject'] = "Code de réinitialisation de mot de passe"
     msg.attach(MIMEText(html_content, 'html'))
 
-    try:
-        if settings.EMAIL_USE_SSL:
-            server = smtplib.SMTP_SSL(settings.EMAIL_HOST, settings.EMAIL_PORT)
-        else:
-            server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
-            server.starttls()
-
-        server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
-        server.sendmail(settings.EMAIL_DEFAULT_SENDER, to_email, msg.as_string())
-        server.quit()
-        return True
-    except smtplib.SMTPAuthenticationError as e:
-        raise Exception(
-            f"SMTP authentication failed: Invalid username or password. Please check EMAIL_SENDER and EMAIL_PASSWORD.")
-    except smtplib.SMTPException as e:
-        raise Exception(f"SMTP error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Failed to send email: {str(e)}")
\ No newline at end of file
+    return _send_html_email(msg, to_email, template="reset")
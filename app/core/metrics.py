@@ -0,0 +1,394 @@
+# app/core/metrics.py
+# Minimal Prometheus text-format metrics. Label sets are bound once (labels(...) is cached)
+# so the hot path is a dict lookup plus a lock-protected add.
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, n in zip(self.upper_bounds + (float("inf"),), child.counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class CallbackGauge:
+    """Gauge family whose samples are computed at scrape time: callback() -> [(label values, value)]."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        REGISTRY.register(self)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for values, value in self.callback():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def register(self, metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ["method", "route"]
+)
+HTTP_RESPONSES = Counter(
+    "http_responses_total", "Responses by route template and status class.", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.")
+
+# ---------------------------------------------------------------------------
+# Subsystems
+# ---------------------------------------------------------------------------
+EMAIL_VERIFY_DURATION = Histogram(
+    "email_verify_duration_seconds", "DNS MX lookup + SMTP RCPT probe latency."
+)
+EMAIL_VERIFY_FAILURES = Counter(
+    "email_verify_failures_total", "Addresses rejected or not verifiable."
+)
+EMAIL_SEND_DURATION = Histogram(
+    "email_send_duration_seconds", "SMTP send latency by template.", ["template"]
+)
+EMAIL_SEND_FAILURES = Counter(
+    "email_send_failures_total", "SMTP send failures by template.", ["template"]
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time.", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+RECOMMENDATION_DURATION = Histogram(
+    "recommendation_rank_duration_seconds", "Full-catalogue scoring + top-k for one profile.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+SEARCH_DURATION = Histogram(
+    "search_query_duration_seconds", "Full-text search over the catalogue, by backend.", ["backend"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+AUTOCOMPLETE_DURATION = Histogram(
+    "autocomplete_query_duration_seconds", "Prefix lookup + top-k in the in-memory autocomplete indexes.",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "In-process cache lookups by result.", ["cache", "result"])
+THROTTLED_REQUESTS = Counter(
+    "throttled_requests_total", "Requests refused by a rate limit (429) or a concurrency limit (503).",
+    ["scope", "reason"],
+)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def _cache_hit_ratios():
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_LOOKUPS._children.items()):
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        hits_total[1] += child.value
+        if result == "hit":
+            hits_total[0] += child.value
+    return [((cache,), hits / total if total else None) for cache, (hits, total) in totals.items()]
+
+
+CallbackGauge("cache_hit_ratio", "Hit ratio of in-process caches since start.", ["cache"], _cache_hit_ratios)
+
+
+def _threadpool_samples():
+    from anyio import to_thread
+
+    try:
+        limiter = to_thread.current_default_thread_limiter()
+        stats = limiter.statistics()
+    except RuntimeError:  # no running event loop (e.g. rendered from a script)
+        return []
+    return [
+        (("total",), limiter.total_tokens),
+        (("busy",), stats.borrowed_tokens),
+        (("queued",), stats.tasks_waiting),
+    ]
+
+
+CallbackGauge(
+    "threadpool_workers", "Starlette/anyio default thread pool: capacity, busy workers and queued tasks.",
+    ["state"], _threadpool_samples,
+)
+
+
+def _db_pool_samples(field: str):
+    def samples():
+        from app.core.database import pool_status
+
+        return [((name,), snapshot.get(field)) for name, snapshot in pool_status().items()]
+    return samples
+
+
+for _field, _doc in (
+    ("checked_out", "Connections currently checked out."),
+    ("checked_in", "Idle connections in the pool."),
+    ("overflow", "Overflow connections currently open."),
+    ("saturation", "checked_out / (pool_size + max_overflow)."),
+    ("checkouts", "Successful checkouts since start."),
+    ("checkout_timeouts", "Checkouts that timed out waiting for a connection."),
+    ("checkout_wait_seconds_total", "Cumulative time spent waiting for a connection."),
+    ("checkout_wait_seconds_max", "Longest single checkout wait."),
+):
+    CallbackGauge(f"db_pool_{_field}", _doc, ["pool"], _db_pool_samples(_field))
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+_in_flight = HTTP_IN_FLIGHT.labels()
+
+
+class _RouteMetrics:
+    __slots__ = ("duration", "responses")
+
+    def __init__(self, method: str, route: str):
+        self.duration = HTTP_REQUEST_DURATION.labels(method, route)
+        self.responses = {cls: HTTP_RESPONSES.labels(method, route, f"{cls}xx") for cls in range(1, 6)}
+
+    def observe(self, seconds: float, status: int) -> None:
+        self.duration.observe(seconds)
+        child = self.responses.get(status // 100)
+        if child is not None:
+            child.inc()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency per route template. Label children for every
+    (method, route) are bound on the first request, so a request costs two lookups and two adds.
+    """
+
+    UNMATCHED = "__unmatched__"
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Tuple[object, str], _RouteMetrics]] = None
+        self._unmatched: Dict[str, _RouteMetrics] = {}
+
+    def _bind_routes(self, application) -> Dict[Tuple[object, str], _RouteMetrics]:
+        bound = {}
+        for route in getattr(application, "routes", []):
+            endpoint = getattr(route, "endpoint", None)
+            methods = getattr(route, "methods", None) or ()
+            if endpoint is None:
+                continue
+            for method in methods:
+                bound[(endpoint, method)] = _RouteMetrics(method, route.path)
+        return bound
+
+    def _metrics_for(self, scope) -> _RouteMetrics:
+        method = scope["method"]
+        route_metrics = self._routes.get((scope.get("endpoint"), method))
+        if route_metrics is None:
+            route_metrics = self._unmatched.get(method)
+            if route_metrics is None:
+                route_metrics = self._unmatched[method] = _RouteMetrics(method, self.UNMATCHED)
+        return route_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._routes is None:
+            self._routes = self._bind_routes(scope.get("app"))
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        _in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _in_flight.dec()
+            self._metrics_for(scope).observe(time.perf_counter() - start, status_code)
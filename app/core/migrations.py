@@ -0,0 +1,221 @@
+# app/core/migrations.py
+"""
+Additive schema migrations.
+
+create_all() creates missing tables but never alters existing ones. Each migration below brings a
+database created by an older release up to the current models (new columns, new indexes), is
+idempotent, and is recorded in schema_version once applied. A table a migration touches but the
+database does not have is created from its current model (ensure_table), never ALTERed.
+
+init_db() skips create_all() when schema_version is already at LATEST_VERSION, so a release that
+only adds a table still appends a migration (it can be a no-op: create_all() runs before it).
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, bindparam, false, func, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.core.database import Base
+
+logger = logging.getLogger(__name__)
+
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def ensure_table(conn: Connection, table: Table) -> bool:
+    """Create `table` from its current model when the database does not have it; True when created."""
+    if inspect(conn).has_table(table.name):
+        return False
+    table.create(conn)
+    logger.info("Created missing table %s", table.name)
+    return True
+
+
+def add_missing_columns(conn: Connection, table: Table, names: List[str]) -> None:
+    """ALTER TABLE ... ADD COLUMN for each of `names` the live table does not have yet."""
+    if ensure_table(conn, table):
+        return  # created with every column
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    quote = conn.dialect.identifier_preparer.quote
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        conn.exec_driver_sql(
+            f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(name)} {column.type.compile(dialect=conn.dialect)}"
+        )
+        logger.info("Added column %s.%s", table.name, name)
+
+
+def create_missing_indexes(conn: Connection, table: Table, names: List[str]) -> None:
+    """Create the model-declared indexes covering any of `names` that are not there yet."""
+    for index in table.indexes:
+        if any(c.name in names for c in index.columns):
+            index.create(conn, checkfirst=True)
+
+
+def _numeric_statistics(conn: Connection) -> None:
+    from app.models.Formation import NORMALIZED_COLUMNS
+
+    targets = {}
+    for model, name, kind in NORMALIZED_COLUMNS:
+        suffixes = ("_pct",) if kind == "percentage" else ("_min", "_max")
+        targets.setdefault(model.__table__, []).extend(name + s for s in suffixes)
+    for table, names in targets.items():
+        add_missing_columns(conn, table, names)
+        create_missing_indexes(conn, table, names)
+
+
+def _content_hashes(conn: Connection) -> None:
+    from app.models.Academies import Etablissement
+    from app.models.Formation import Formation
+
+    for model in (Formation, Etablissement):
+        add_missing_columns(conn, model.__table__, ["content_hash"])
+
+
+def _catalogue_change_log(conn: Connection) -> None:
+    from app.models.Formation import Formation
+    from app.models.catalogue import CatalogueChange
+
+    # Seed one entry per existing formation so that ?since=0 is a full sync
+    log = CatalogueChange.__table__
+    ensure_table(conn, Formation.__table__)
+    ensure_table(conn, log)
+    if conn.execute(select(func.count()).select_from(log)).scalar() == 0:
+        conn.execute(log.insert().from_select(
+            ["formation_id", "deleted"],
+            select(Formation.id, false()).order_by(Formation.id),
+        ))
+
+
+def _full_text_search(conn: Connection) -> None:
+    from app.models.Formation import Formation
+    from app.services.search import KEYWORD_COLUMNS, ensure_search_schema, refresh_search_keywords
+
+    add_missing_columns(conn, Formation.__table__, ["search_keywords"])
+    for column in KEYWORD_COLUMNS:  # the child tables the keywords are read from
+        ensure_table(conn, column.class_.__table__)
+    refresh_search_keywords(conn)
+    if conn.dialect.name == "postgresql":
+        ensure_search_schema(conn)
+
+
+def _jsonb_user_blobs(conn: Connection) -> None:
+    from app.models.user import User
+
+    if conn.dialect.name != "postgresql":
+        return  # JSON stays JSON elsewhere
+    ensure_table(conn, User.__table__)
+    for column in ("specialites", "orientation_choices", "riasec_differentiation", "preferences", "notes"):
+        data_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'user' AND column_name = :column"
+        ), {"column": column}).scalar()
+        if data_type == "json":
+            conn.exec_driver_sql(f'ALTER TABLE "user" ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb')
+    # Containment lookups (specialites @> '["NSI"]', orientation_choices @> '{"domaines": [...]}')
+    for column in ("specialites", "orientation_choices"):
+        conn.exec_driver_sql(
+            f'CREATE INDEX IF NOT EXISTS ix_user_{column}_gin ON "user" USING GIN ({column} jsonb_path_ops)'
+        )
+
+
+def _user_grouping_columns(conn: Connection) -> None:
+    from app.models.user import User, derived_user_columns
+
+    users = User.__table__
+    names = ["etablissement_key", "academie_key", "riasec_top"]
+    add_missing_columns(conn, users, names)
+    create_missing_indexes(conn, users, names)
+    rows = conn.execute(select(users.c.id, users.c.etablissement, users.c.academie, users.c.riasec_differentiation)).all()
+    updates = []
+    for row in rows:
+        values = {"user_id": row.id}
+        for key in ("etablissement", "academie", "riasec_differentiation"):
+            values.update(derived_user_columns(key, getattr(row, key)))
+        updates.append(values)
+    if updates:
+        conn.execute(
+            users.update().where(users.c.id == bindparam("user_id")).values(
+                {name: bindparam(name) for name in names}
+            ),
+            updates,
+        )
+
+
+def _reference_links(conn: Connection) -> None:
+    from app.models.Formation import Formation, Lieu
+    from app.models.user import User
+
+    links = [
+        (Formation.__table__, "etablissement_id", "etablissements"),
+        (Lieu.__table__, "academie_id", "academies"),
+        (User.__table__, "etablissement_id", "etablissements"),
+        (User.__table__, "academie_id", "academies"),
+    ]
+    for table, name, _ in links:
+        add_missing_columns(conn, table, [name])
+        create_missing_indexes(conn, table, [name])
+    if conn.dialect.name != "postgresql":
+        return  # SQLite cannot add a constraint to an existing table; the columns still work as plain ids
+    quote = conn.dialect.identifier_preparer.quote
+    for table, name, referenced in links:
+        constrained = [fk["constrained_columns"] for fk in inspect(conn).get_foreign_keys(table.name)]
+        if [name] not in constrained:  # fresh databases got it from create_all()
+            constraint = f"fk_{table.name}_{name}"
+            conn.exec_driver_sql(
+                f"ALTER TABLE {quote(table.name)} ADD CONSTRAINT {quote(constraint)} FOREIGN KEY ({quote(name)}) "
+                f"REFERENCES {quote(referenced)} (id) ON DELETE SET NULL"
+            )
+
+
+# (version, description, upgrade); append only, never renumber
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "numeric copies of the statistics strings (*_pct, tle_*_min/max)", _numeric_statistics),
+    (2, "content_hash on formations and etablissements for incremental ingestion", _content_hashes),
+    (3, "catalogue_changes log seeded with the existing formations", _catalogue_change_log),
+    (4, "search_keywords, and on PostgreSQL the french_unaccent search_vector + GIN index", _full_text_search),
+    (5, "user profile blobs as JSONB with GIN indexes on specialites and orientation_choices (PostgreSQL)",
+     _jsonb_user_blobs),
+    (6, "indexed grouping columns on user (etablissement_key, academie_key, riasec_top) for cohort analytics",
+     _user_grouping_columns),
+    (7, "indexed etablissement_id / academie_id links on formations, lieu and user (see app.jobs.link_references)",
+     _reference_links),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(select(func.coalesce(func.max(schema_version.c.version), 0))).scalar()
+
+
+def stored_version(engine) -> int:
+    """Version recorded in the database, 0 when it has never been migrated."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(schema_version.name):
+            return 0
+        return current_version(conn)
+
+
+def run_migrations(engine) -> int:
+    """Apply pending migrations in order, each in its own transaction; returns the resulting version."""
+    schema_version.create(engine, checkfirst=True)
+    version = 0
+    for number, description, upgrade in MIGRATIONS:
+        with engine.begin() as conn:
+            version = current_version(conn)
+            if number <= version:
+                continue
+            logger.info("Applying schema migration %d: %s", number, description)
+            upgrade(conn)
+            conn.execute(schema_version.insert().values(version=number, description=description))
+            version = number
+    return version
@@ -0,0 +1,46 @@
+# app/core/ndjson.py
+# Streaming NDJSON responses: one compact JSON document per line, written in ~64 KiB chunks and
+# gzip-compressed on the fly when the client sends Accept-Encoding: gzip.
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CHUNK_SIZE = 64 * 1024
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def encode_lines(items: Iterable) -> Iterator[bytes]:
+    buffer = bytearray()
+    for item in items:
+        buffer += json.dumps(item, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def ndjson_response(items: Iterable, request: Request, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    body = encode_lines(items)
+    if accepts_gzip(request):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=NDJSON_MEDIA_TYPE, headers=headers)
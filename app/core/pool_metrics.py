@@ -0,0 +1,83 @@
+# app/core/pool_metrics.py
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolWaitStats:
+    """Checkout wait-time counters for one pool (thread-safe, O(1) per checkout)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_peak = 0
+
+    def record(self, elapsed: float, overflow: int, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += elapsed
+            if elapsed > self.wait_seconds_max:
+                self.wait_seconds_max = elapsed
+            if overflow > self.overflow_peak:
+                self.overflow_peak = overflow
+
+
+class _WaitTimingMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, max(self.overflow(), 0), timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start, max(self.overflow(), 0))
+        return conn
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_snapshot(pool) -> dict:
+    """Current occupancy of a QueuePool plus the accumulated wait statistics."""
+    size = pool.size()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    checked_out = pool.checkedout()
+    capacity = size + max(max_overflow, 0)
+    snapshot = {
+        "pool_size": size,
+        "max_overflow": max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        # QueuePool.overflow() starts at -pool_size; only the positive part is overflow in use
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 4) if capacity > 0 else None,
+    }
+    stats = getattr(pool, "wait_stats", None)
+    if stats is not None:
+        attempts = stats.checkouts + stats.timeouts
+        snapshot.update({
+            "checkouts": stats.checkouts,
+            "checkout_timeouts": stats.timeouts,
+            "checkout_wait_seconds_total": round(stats.wait_seconds_total, 6),
+            "checkout_wait_seconds_avg": round(stats.wait_seconds_total / attempts, 6) if attempts else 0.0,
+            "checkout_wait_seconds_max": round(stats.wait_seconds_max, 6),
+            "overflow_peak": stats.overflow_peak,
+        })
+    return snapshot
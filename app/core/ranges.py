@@ -0,0 +1,78 @@
+# app/core/ranges.py
+# File downloads with HTTP Range support (Starlette 0.27's FileResponse always sends the whole file):
+# single byte ranges, If-Range and If-None-Match against a strong ETag, 416 when unsatisfiable.
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single "bytes=" range; None for a full response; ValueError when unsatisfiable."""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:  # multiple or non-byte ranges: serve the whole file, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _read(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request: Request, path: str, media_type: str, etag: str,
+                         filename: Optional[str] = None, cache_control: Optional[str] = None) -> Response:
+    size = os.path.getsize(path)
+    quoted = f'"{etag}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": quoted}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if quoted in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != quoted:
+        range_header = None  # the client's partial copy is of another version
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    body = _read(path, start, end) if request.method != "HEAD" and size else iter(())
+    return StreamingResponse(body, status_code=status_code, media_type=media_type, headers=headers)
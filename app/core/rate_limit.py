@@ -0,0 +1,231 @@
+# app/core/rate_limit.py
+"""
+Throttling of the expensive auth endpoints: SMTP probes and sends, bcrypt, Google token verification.
+
+Rate limits are token buckets, one per (scope, client IP) and per (scope, e-mail): a bucket holds up
+to N tokens and refills at N per period, so "5/hour" allows a burst of 5 then one every 12 minutes.
+A request without a token gets RateLimited (429, Retry-After = when the next token is due).
+Buckets live in this process (MemoryBackend) or in Redis (RedisBackend, one atomic script per
+check), shared by every worker; RedisBackend takes any redis-py compatible client, so tests can
+hand it fakeredis.FakeRedis(). When Redis cannot be reached the check falls back to the process
+buckets rather than refusing logins.
+
+Concurrency limits bound the expensive calls in flight per process: beyond the limit a request
+waits at most CONCURRENCY_WAIT_SECONDS for a slot, then gets Overloaded (503, Retry-After), instead
+of queueing on the thread pool until every endpoint is starved.
+"""
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.core.metrics import THROTTLED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+MAX_MEMORY_BUCKETS = 100_000  # least recently used buckets are dropped beyond this
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Trop de tentatives. Réessayez dans {retry_after_header(retry_after)} secondes.")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__("Service momentanément surchargé. Réessayez dans quelques instants.")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float
+    refill_per_second: float
+
+
+def parse_rate(rate: str) -> Limit:
+    """"10/minute" -> a bucket of 10 tokens refilled at 10 per minute."""
+    match = RATE_PATTERN.match(rate)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"invalid rate {rate!r}; expected '<requests>/<{'|'.join(PERIODS)}>'")
+    count = int(match.group(1))
+    return Limit(capacity=count, refill_per_second=count / PERIODS[match.group(2)])
+
+
+def _refill(tokens: float, updated: float, limit: Limit, now: float) -> float:
+    return min(limit.capacity, tokens + max(0.0, now - updated) * limit.refill_per_second)
+
+
+# ---------------------------------------------------------------------------
+# Backends: consume() returns (allowed, seconds until the next token when refused)
+# ---------------------------------------------------------------------------
+class MemoryBackend:
+    """Buckets in this process: exact for one worker, N x the limit across N workers."""
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+            tokens = _refill(tokens, updated, limit, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / limit.refill_per_second
+
+
+# KEYS[1] bucket; ARGV capacity, refill per second, now. The bucket expires once it would be full again.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker, one EVALSHA per check; Redis errors fall back to `fallback`."""
+
+    def __init__(self, client, prefix: str = "ratelimit:", fallback: Optional[MemoryBackend] = None,
+                 clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self.fallback = fallback or MemoryBackend()
+        self.clock = clock
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        try:
+            allowed, tokens = self._script(
+                keys=[self.prefix + key], args=[limit.capacity, limit.refill_per_second, self.clock()]
+            )
+        except Exception as e:
+            logger.warning("Rate limit backend unavailable, using this process' buckets: %s", e)
+            return self.fallback.consume(key, limit)
+        if int(allowed):
+            return True, 0.0
+        return False, (1 - float(tokens)) / limit.refill_per_second
+
+
+# ---------------------------------------------------------------------------
+# Limiters
+# ---------------------------------------------------------------------------
+def _email_key(email: str) -> str:
+    # Addresses are not written to the shared backend in clear
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+class RateLimiter:
+    """Per-IP and per-email buckets for the scopes listed in `limits` ("<scope>:<ip|email>" -> Limit)."""
+
+    def __init__(self, backend, limits: Dict[str, Limit], enabled: bool = True):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+
+    def check(self, scope: str, ip: Optional[str] = None, email: Optional[str] = None) -> None:
+        """Take a token from each bucket of the scope; RateLimited on the first one that is empty."""
+        if not self.enabled:
+            return
+        for kind, value in (("ip", ip), ("email", _email_key(email) if email else None)):
+            limit = self.limits.get(f"{scope}:{kind}")
+            if limit is None or not value:
+                continue
+            allowed, retry_after = self.backend.consume(f"{scope}:{kind}:{value}", limit)
+            if not allowed:
+                THROTTLED_REQUESTS.labels(scope, f"rate_{kind}").inc()
+                raise RateLimited(scope, retry_after)
+
+
+class ConcurrencyLimit:
+    """At most `limit` callers inside slot() at once in this process (0: unlimited)."""
+
+    def __init__(self, name: str, limit: int, wait_seconds: float = 0.0, retry_after: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if self._semaphore is None:
+            yield
+            return
+        if not self._semaphore.acquire(timeout=self.wait_seconds):
+            THROTTLED_REQUESTS.labels(self.name, "concurrency").inc()
+            raise Overloaded(self.name, self.retry_after)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+def client_ip(request, trusted_proxies: int = 0) -> Optional[str]:
+    """The peer address, or the address `trusted_proxies` hops back in X-Forwarded-For."""
+    if trusted_proxies > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= trusted_proxies:
+            return forwarded[-trusted_proxies]
+    return request.client.host if request.client else None
+
+
+# ---------------------------------------------------------------------------
+# Configured instances, built on first use
+# ---------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def rate_limiter() -> RateLimiter:
+    from app.core.config import settings
+
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        import redis  # only deployments sharing buckets across workers need it
+
+        backend = RedisBackend(redis.Redis.from_url(
+            settings.RATE_LIMIT_REDIS_URL, socket_timeout=0.1, socket_connect_timeout=0.1,
+        ))
+    else:
+        backend = MemoryBackend()
+    limits = {name: parse_rate(rate) for name, rate in settings.RATE_LIMITS.items()}
+    return RateLimiter(backend, limits, enabled=settings.RATE_LIMIT_ENABLED)
+
+
+@lru_cache(maxsize=None)
+def concurrency_limit(name: str) -> ConcurrencyLimit:
+    from app.core.config import settings
+
+    return ConcurrencyLimit(name, settings.CONCURRENCY_LIMITS.get(name, 0), settings.CONCURRENCY_WAIT_SECONDS)
@@ -0,0 +1,170 @@
+# app/core/sql_instrumentation.py
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+_WHITESPACE = re.compile(r"\s+")
+# Bound-parameter lists of any paramstyle ("IN (?, ?)", "IN (%(p_1)s, %(p_2)s)", "IN ($1, $2)")
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalise a statement so executions differing only by parameters compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAM_LIST.sub("(?)", shape)
+    return _NUMBER.sub("?", shape)
+
+
+class RequestSQLStats:
+    """Queries issued while serving one request."""
+    __slots__ = ("count", "total_seconds", "slowest_seconds", "slowest_statement", "shapes")
+
+    def __init__(self, track_shapes: bool = False):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Optional[Dict[str, int]] = {} if track_shapes else None
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+        if self.shapes is not None:
+            shape = statement_shape(statement)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        if not self.shapes:
+            return []
+        return sorted(
+            ((shape, n) for shape, n in self.shapes.items() if n >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_seconds * 1000:.2f}'
+        )
+
+
+_current: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestSQLStats]:
+    return _current.get()
+
+
+@contextmanager
+def collect_sql_stats(track_shapes: bool = False) -> Iterator[RequestSQLStats]:
+    """Record the statements executed inside the block (requests, jobs, benchmarks)."""
+    stats = RequestSQLStats(track_shapes=track_shapes)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_query_logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, _WHITESPACE.sub(" ", statement)[:1000])
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute is not called for failed statements: drop their start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+_installed = False
+
+
+def install_sql_instrumentation() -> None:
+    """Hook cursor execution on every Engine (sync, async, primary and replica)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Pure ASGI middleware: collects per-request query count / DB time / slowest statement and logs
+    slow requests and (dev mode) N+1 patterns once the last body chunk is sent. With server_timing,
+    they are also exposed as a Server-Timing header, on non-streaming responses only: the headers of
+    a streamed body go out before most of its queries run.
+    """
+
+    def __init__(self, app, detect_n_plus_one: bool = False, n_plus_one_threshold: int = 5,
+                 server_timing: bool = False):
+        self.app = app
+        self.detect_n_plus_one = detect_n_plus_one
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats(track_shapes=self.detect_n_plus_one)
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "content-length" in headers:  # the whole body is built: every query has run
+                    headers.append("Server-Timing", stats.server_timing())
+                    if self.detect_n_plus_one:
+                        repeated = stats.repeated_shapes(self.n_plus_one_threshold)
+                        if repeated:
+                            headers.append("X-SQL-Repeated", "; ".join(f"{n}x {shape[:80]}" for shape, n in repeated))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing if self.server_timing else send)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats)
+
+    def _report(self, scope, stats: RequestSQLStats) -> None:
+        path = scope.get("path")
+        if stats.total_seconds * 1000 >= settings.SLOW_REQUEST_DB_MS:
+            slow_query_logger.warning(
+                "Slow request %s %s: %d queries, %.1f ms in DB (slowest %.1f ms: %s)",
+                scope.get("method"), path, stats.count, stats.total_seconds * 1000,
+                stats.slowest_seconds * 1000, _WHITESPACE.sub(" ", stats.slowest_statement or "")[:500],
+            )
+        if self.detect_n_plus_one:
+            for shape, n in stats.repeated_shapes(self.n_plus_one_threshold):
+                logger.warning("Possible N+1 on %s %s: %d executions of %s", scope.get("method"), path, n, shape[:500])
@@ -0,0 +1,91 @@
+# app/core/unit_of_work.py
+"""
+Writes that come back with what the database stored, without a reload after commit.
+
+Sessions from get_db keep their objects loaded after commit (expire_on_commit=False), and the models
+with server-generated columns (created_at, updated_at, server defaults) declare eager_defaults, so
+the flush reads those back with INSERT/UPDATE ... RETURNING. An ORM write is then one statement
+plus the COMMIT, and the committed object is serialised as is.
+
+The helpers below go one step further for endpoints that only need the stored row: the existence
+checks, the write and the read-back are a single statement (INSERT ... SELECT ... WHERE EXISTS,
+UPDATE ... WHERE, INSERT ... ON CONFLICT DO UPDATE), each returning the row or None when nothing
+was written. SQLAlchemy 1.4 has no RETURNING for SQLite: there the row is read back with one SELECT
+by key, still one statement fewer than the former SELECT + write + refresh.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import cast, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ClauseElement
+
+INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def supports_returning(db: Session) -> bool:
+    return db.get_bind().dialect.full_returning
+
+
+def _values_select(db: Session, table, values: Dict[str, Any], where):
+    """SELECT `values` WHERE `where`, the source of an INSERT ... SELECT."""
+    typed = db.get_bind().dialect.name == "postgresql"
+    columns = []
+    for name, value in values.items():
+        column = table.c[name]
+        if not isinstance(value, ClauseElement):
+            value = literal(value, column.type)
+            if typed:  # bare parameters of a SELECT list are text for PostgreSQL
+                value = cast(value, column.type)
+        columns.append(value.label(name))
+    return select(*columns).where(where)
+
+
+def _read_back(db: Session, table, result, key: Optional[Dict[str, Any]] = None) -> Optional[Row]:
+    """The row just written (SQLite): by `key`, or by the rowid of the insert."""
+    if not result.rowcount:
+        return None
+    if key is None:
+        key = {table.primary_key.columns[0].name: result.lastrowid}
+    return db.execute(select(*table.c).where(*(table.c[name] == value for name, value in key.items()))).first()
+
+
+def insert_returning(db: Session, model, values: Dict[str, Any], where=None) -> Optional[Row]:
+    """INSERT one row, only when `where` holds; the stored row, or None when nothing was inserted."""
+    table = model.__table__
+    if where is None:
+        statement = table.insert().values(values)
+    else:
+        statement = table.insert().from_select(list(values), _values_select(db, table, values, where))
+    if supports_returning(db):
+        return db.execute(statement.returning(*table.c)).first()
+    return _read_back(db, table, db.execute(statement))
+
+
+def upsert_returning(db: Session, model, values: Dict[str, Any], key: Sequence[str], update: Dict[str, Any],
+                     where=None) -> Optional[Row]:
+    """INSERT, or apply `update` to the row with the same `key` (a unique constraint); None when `where` fails."""
+    table = model.__table__
+    insert = INSERTS[db.get_bind().dialect.name]
+    statement = insert(table)
+    if where is None:
+        statement = statement.values(values)
+    else:
+        statement = statement.from_select(list(values), _values_select(db, table, values, where))
+    statement = statement.on_conflict_do_update(index_elements=[table.c[name] for name in key], set_=update)
+    if supports_returning(db):
+        return db.execute(statement.returning(*table.c)).first()
+    return _read_back(db, table, db.execute(statement), {name: values[name] for name in key})
+
+
+def update_returning(db: Session, model, values: Dict[str, Any], *where) -> Optional[Row]:
+    """UPDATE the row matching `where` (which must not test the updated columns); its new state, or None."""
+    table = model.__table__
+    statement = table.update().where(*where).values(values)
+    if supports_returning(db):
+        return db.execute(statement.returning(*table.c)).first()
+    result = db.execute(statement)
+    if not result.rowcount:
+        return None
+    return db.execute(select(*table.c).where(*where)).first()
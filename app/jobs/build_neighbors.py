@@ -0,0 +1,43 @@
+"""
+Recompute the "formations similaires" table (formation_neighbors) from the whole catalogue.
+
+    python -m app.jobs.build_neighbors
+    python -m app.jobs.build_neighbors --neighbors 20 --block-size 512
+
+Run it after catalogue ingestion (or nightly); the table is replaced in one transaction, so the
+API keeps serving the previous neighbours until the commit.
+"""
+import argparse
+import logging
+import sys
+
+from app.core.database import SessionLocal, init_db
+from app.services.similarity import BLOCK_SIZE, DEFAULT_NEIGHBORS, build_neighbors
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS, help="neighbours kept per formation")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help="formations compared with the catalogue per matrix product (memory vs speed)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.neighbors < 1 or args.block_size < 1:
+        parser.error("--neighbors and --block-size must be positive")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        written = build_neighbors(db, k=args.neighbors, block_size=args.block_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print(f"{written} neighbour rows written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
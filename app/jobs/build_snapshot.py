@@ -0,0 +1,41 @@
+# app/jobs/build_snapshot.py
+"""
+Build the downloadable catalogue snapshot (SQLite + optional Parquet bundle) into SNAPSHOT_DIR.
+
+    python -m app.jobs.build_snapshot
+    python -m app.jobs.build_snapshot --force --no-parquet
+
+The ingestion job calls this after every run that changed the catalogue; nothing is rebuilt when
+the published snapshot already has the current catalogue version, unless --force.
+"""
+import argparse
+import logging
+import sys
+
+from app.core.database import engine, init_db
+from app.services.snapshot import build_snapshot, parquet_available
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", help="defaults to the SNAPSHOT_DIR setting")
+    parser.add_argument("--force", action="store_true", help="rebuild even when the catalogue version is unchanged")
+    parquet = parser.add_mutually_exclusive_group()
+    parquet.add_argument("--parquet", dest="parquet", action="store_true", default=None,
+                         help="require the Parquet bundle (needs pyarrow)")
+    parquet.add_argument("--no-parquet", dest="parquet", action="store_false")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.parquet and not parquet_available():
+        print("--parquet needs pyarrow (pip install pyarrow)", file=sys.stderr)
+        return 2
+    init_db()
+    manifest = build_snapshot(engine, args.directory, parquet=args.parquet, force=args.force)
+    for f in manifest.files:
+        print(f"v{manifest.catalogue_version} {f.name} {f.size} bytes sha256={f.sha256}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
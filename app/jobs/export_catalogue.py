@@ -0,0 +1,59 @@
+# app/jobs/export_catalogue.py
+"""
+Export every formation with its full nested detail as NDJSON, in constant memory.
+
+    python -m app.jobs.export_catalogue formations.ndjson
+    python -m app.jobs.export_catalogue formations.ndjson.gz   # gzip from the extension
+    python -m app.jobs.export_catalogue - | jq .titre
+
+The output has the same shape as GET /api/auth/admin/formations/export and is accepted as input
+by app.jobs.ingest_catalogue.
+"""
+import argparse
+import gzip
+import json
+import logging
+import sys
+import time
+
+from app.api.formation.loaders import EXPORT_BATCH_SIZE, iter_formation_documents
+from app.core.database import SessionLocal, init_db
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="output file, or - for stdout")
+    parser.add_argument("--gzip", action="store_true", help="compress (implied by a .gz path)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+
+    init_db()
+    compress = args.gzip or args.path.endswith(".gz")
+    if args.path == "-":
+        out = gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") if compress else sys.stdout.buffer
+    else:
+        out = gzip.open(args.path, "wb") if compress else open(args.path, "wb")
+    db = SessionLocal()
+    started, count = time.perf_counter(), 0
+    try:
+        for document in iter_formation_documents(db, args.batch_size):
+            out.write(json.dumps(document, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+            out.write(b"\n")
+            count += 1
+            if count % 10000 == 0:
+                logger.info("%d formations exported (%.0f/s)", count, count / (time.perf_counter() - started))
+    finally:
+        db.close()
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+    logger.info("Done: %d formations in %.1f s", count, time.perf_counter() - started)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+# app/jobs/ingest_catalogue.py
+"""
+Bulk catalogue ingestion from scraper output.
+
+    python -m app.jobs.ingest_catalogue formations.jsonl
+    python -m app.jobs.ingest_catalogue formations.csv --batch-size 2000
+    python -m app.jobs.ingest_catalogue etablissements.jsonl --kind etablissements
+
+Formation records look like the API's FormationSchema: scalar columns plus nested objects/lists
+for the child tables (lieu, badges, intervalles_admis, criteres_candidature[].sous_criteres, ...).
+List items of single-value tables may be plain strings ("badges": ["Public"]). In CSV input the
+nested values are JSON-encoded cells. A formation whose coerced values do not validate against
+FormationSchema (a missing required field, a child without its titre...) is counted as invalid and
+not written. Etablissement records carry academie / academie_url and the etablissement columns.
+
+Records are upserted by url / school_url and skipped when their content hash is unchanged. Each
+batch runs in one transaction: on PostgreSQL the parent rows are COPYed into a staging table and
+merged with INSERT ... ON CONFLICT, then the children of every changed formation are deleted with
+one statement per table and COPYed back in. Other databases use the same steps with executemany.
+Every written formation gets a catalogue_changes entry in its batch's transaction, and the
+downloadable snapshot is rebuilt at the end of a run that changed anything (see build_snapshot).
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Float, Integer, delete, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+
+from app.api.formation.schemas import FormationSchema
+from app.core.database import engine, init_db
+from app.models.Academies import Academie, Etablissement
+from app.models.Formation import CriteresCandidature, Formation, NORMALIZED_COLUMNS, SousCritere
+from app.services import catalogue_changes
+from app.services.normalization import parse_grade_interval, parse_percentage
+
+logger = logging.getLogger(__name__)
+
+DERIVED_COLUMNS = {
+    (model.__table__.name, name + suffix)
+    for model, name, kind in NORMALIZED_COLUMNS
+    for suffix in (("_pct",) if kind == "percentage" else ("_min", "_max"))
+}
+_TRUE = {"true", "1", "oui", "yes", "vrai", "t"}
+
+
+def _value_columns(table) -> List[str]:
+    return [c.name for c in table.columns
+            if c.name not in ("id", "formation_id", "criteres_id", "content_hash", "search_keywords",
+                              "etablissement_id", "academie_id")
+            and (table.name, c.name) not in DERIVED_COLUMNS]
+
+
+FORMATION_COLUMNS = _value_columns(Formation.__table__)
+# relationship key -> (table, value columns, uselist); criteres_candidature is handled separately
+CHILDREN = {
+    rel.key: (rel.mapper.local_table, _value_columns(rel.mapper.local_table), rel.uselist)
+    for rel in Formation.__mapper__.relationships
+    if rel.key != "criteres_candidature"
+}
+SOUS_CRITERE_COLUMNS = _value_columns(SousCritere.__table__)
+ETABLISSEMENT_COLUMNS = ["etablissement", "city", "sector", "track", "school_url"]
+
+
+def content_hash(record: dict) -> str:
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _coerce(column, value):
+    if value is None or value == "":
+        return None
+    if isinstance(column.type, Boolean):
+        return value if isinstance(value, bool) else str(value).strip().lower() in _TRUE
+    if isinstance(column.type, Integer):
+        return int(float(str(value).replace(",", ".")))
+    if isinstance(column.type, Float):
+        return float(str(value).replace(",", "."))
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _with_derived(table, row: dict) -> dict:
+    """Fill the typed copies of the statistics strings (the ORM validators do not run on Core inserts)."""
+    for model, name, kind in NORMALIZED_COLUMNS:
+        if model.__table__ is not table or name not in row:
+            continue
+        if kind == "percentage":
+            row[f"{name}_pct"] = parse_percentage(row[name])
+        else:
+            row[f"{name}_min"], row[f"{name}_max"] = parse_grade_interval(row[name])
+    return row
+
+
+def _row(table, columns: List[str], item) -> dict:
+    if not isinstance(item, dict):  # "badges": ["Public"] shorthand for single-value tables
+        item = {columns[0]: item}
+    return _with_derived(table, {name: _coerce(table.c[name], item.get(name)) for name in columns})
+
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Yield (line number, record); record is None for lines that cannot be decoded."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            for number, raw in enumerate(csv.DictReader(stream), start=2):
+                record = {}
+                for key, value in raw.items():
+                    text = (value or "").strip()
+                    if text[:1] in "[{":
+                        try:
+                            value = json.loads(text)
+                        except ValueError:
+                            pass
+                    record[key] = value
+                yield number, record
+        else:
+            for number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield number, record if isinstance(record, dict) else None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batches(records: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------------------------------------------------------------------
+# Prepared formation batch
+# ---------------------------------------------------------------------------
+@dataclass
+class FormationBatch:
+    parents: List[dict] = field(default_factory=list)
+    # table name -> rows keyed by "formation_url" instead of formation_id
+    children: Dict[str, List[dict]] = field(default_factory=dict)
+    # (formation_url, critere row, [sous-critere rows])
+    criteres: List[Tuple[str, dict, List[dict]]] = field(default_factory=list)
+
+
+def prepare_formation(record: dict, batch: FormationBatch, digest: str) -> None:
+    """
+    Coerce one record into `batch`. Nothing is added when a value cannot be coerced or when the
+    stored rows would not serialise as a FormationSchema (the API and the NDJSON feeds could not serve them).
+    """
+    parent = _with_derived(Formation.__table__, {
+        name: _coerce(Formation.__table__.c[name], record.get(name)) for name in FORMATION_COLUMNS
+    })
+    parent["content_hash"] = digest
+    url = parent["url"]
+    document = dict(parent, id=0)
+    children: Dict[str, List[dict]] = {}
+    for key, (table, columns, uselist) in CHILDREN.items():
+        value = record.get(key)
+        if value in (None, "", [], {}):
+            continue
+        items = value if uselist and isinstance(value, list) else [value]
+        rows = [_row(table, columns, item) for item in items]
+        document[key] = rows if uselist else rows[0]
+        children[table.name] = [dict(row, formation_url=url) for row in rows]
+    criteres = []
+    for critere in record.get("criteres_candidature") or []:
+        if not isinstance(critere, dict):
+            continue
+        critere_row = _row(CriteresCandidature.__table__, ["categorie", "poids"], critere)
+        sous = [_row(SousCritere.__table__, SOUS_CRITERE_COLUMNS, s) for s in critere.get("sous_criteres") or []]
+        criteres.append((url, critere_row, sous))
+    document["criteres_candidature"] = [dict(critere, sous_criteres=sous) for _, critere, sous in criteres]
+    FormationSchema.parse_obj(document)  # ValidationError is a ValueError: counted as invalid by the caller
+
+    batch.parents.append(parent)
+    for name, rows in children.items():
+        batch.children.setdefault(name, []).extend(rows)
+    batch.criteres.extend(criteres)
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+class Writer:
+    """Portable writer: dialect upsert where available, executemany for the children."""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    def _insert(self, table):
+        name = self.conn.dialect.name
+        if name == "postgresql":
+            return postgresql_insert(table)
+        if name == "sqlite":
+            return sqlite_insert(table)
+        return None
+
+    def upsert(self, table, key: str, rows: List[dict]) -> Dict[str, int]:
+        """Insert or update `rows` by the unique column `key`; returns key -> id."""
+        if not rows:
+            return {}
+        stmt = self._insert(table)
+        if stmt is not None:
+            columns = [c for c in rows[0] if c != key]
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key], set_={c: getattr(stmt.excluded, c) for c in columns}
+            )
+            self.conn.execute(stmt, rows)
+        else:
+            existing = self._ids(table, key, [r[key] for r in rows])
+            new = [r for r in rows if r[key] not in existing]
+            for r in rows:
+                if r[key] in existing:
+                    self.conn.execute(update(table).where(table.c[key] == r[key]).values(**r))
+            if new:
+                self.conn.execute(table.insert(), new)
+        return self._ids(table, key, [r[key] for r in rows])
+
+    def _ids(self, table, key: str, values: List[str]) -> Dict[str, int]:
+        rows = self.conn.execute(select(table.c[key], table.c.id).where(table.c[key].in_(values)))
+        return {k: i for k, i in rows}
+
+    def upsert_formations(self, rows: List[dict]) -> Dict[str, int]:
+        return self.upsert(Formation.__table__, "url", rows)
+
+    def delete_children(self, formation_ids: List[int]) -> None:
+        criteres = CriteresCandidature.__table__
+        sous = SousCritere.__table__
+        self.conn.execute(delete(sous).where(
+            sous.c.criteres_id.in_(select(criteres.c.id).where(criteres.c.formation_id.in_(formation_ids)))
+        ))
+        self.conn.execute(delete(criteres).where(criteres.c.formation_id.in_(formation_ids)))
+        for table, _, _ in CHILDREN.values():
+            self.conn.execute(delete(table).where(table.c.formation_id.in_(formation_ids)))
+
+    def insert_rows(self, table, rows: List[dict]) -> None:
+        if rows:
+            self.conn.execute(table.insert(), rows)
+
+    def insert_criteres(self, criteres: List[Tuple[int, dict, List[dict]]]) -> None:
+        table = CriteresCandidature.__table__
+        sous_rows = []
+        for formation_id, critere, sous in criteres:
+            critere_id = self.conn.execute(table.insert().values(formation_id=formation_id, **critere)) \
+                .inserted_primary_key[0]
+            sous_rows.extend(dict(s, criteres_id=critere_id) for s in sous)
+        self.insert_rows(SousCritere.__table__, sous_rows)
+
+
+def _copy_text(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class PostgresWriter(Writer):
+    """COPY-based writer: staging table + INSERT ... ON CONFLICT for parents, COPY for children."""
+
+    def copy_rows(self, table_name: str, columns: List[str], rows: Iterable[Tuple]) -> None:
+        quote = self.conn.dialect.identifier_preparer.quote
+        sql = f"COPY {quote(table_name)} ({', '.join(quote(c) for c in columns)}) FROM STDIN"
+        raw = self.conn.connection.dbapi_connection
+        cursor = raw.cursor()
+        try:
+            if hasattr(cursor, "copy"):  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:  # psycopg2
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write("\t".join(_copy_text(v) for v in row) + "\n")
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        finally:
+            cursor.close()
+
+    def upsert_formations(self, rows: List[dict]) -> Dict[str, int]:
+        if not rows:
+            return {}
+        quote = self.conn.dialect.identifier_preparer.quote
+        columns = list(rows[0])
+        column_list = ", ".join(quote(c) for c in columns)
+        self.conn.exec_driver_sql(
+            f"CREATE TEMP TABLE IF NOT EXISTS stage_formations ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM formations WITH NO DATA"
+        )
+        self.copy_rows("stage_formations", columns, ([r[c] for c in columns] for r in rows))
+        assignments = ", ".join(f"{quote(c)} = EXCLUDED.{quote(c)}" for c in columns if c != "url")
+        result = self.conn.exec_driver_sql(
+            f"INSERT INTO formations ({column_list}) SELECT {column_list} FROM stage_formations "
+            f"ON CONFLICT (url) DO UPDATE SET {assignments} RETURNING url, id"
+        )
+        ids = {url: fid for url, fid in result}
+        self.conn.exec_driver_sql("TRUNCATE stage_formations")
+        return ids
+
+    def insert_rows(self, table, rows: List[dict]) -> None:
+        if rows:
+            columns = list(rows[0])
+            self.copy_rows(table.name, columns, ([r[c] for c in columns] for r in rows))
+
+    def insert_criteres(self, criteres: List[Tuple[int, dict, List[dict]]]) -> None:
+        if not criteres:
+            return
+        # Reserve ids up front so criteres and sous-criteres can both be COPYed
+        ids = [i for (i,) in self.conn.exec_driver_sql(
+            "SELECT nextval(pg_get_serial_sequence('criteres_candidature', 'id')) "
+            f"FROM generate_series(1, {len(criteres)})"
+        )]
+        critere_rows, sous_rows = [], []
+        for critere_id, (formation_id, critere, sous) in zip(ids, criteres):
+            critere_rows.append(dict(critere, id=critere_id, formation_id=formation_id))
+            sous_rows.extend(dict(s, criteres_id=critere_id) for s in sous)
+        self.insert_rows(CriteresCandidature.__table__, critere_rows)
+        self.insert_rows(SousCritere.__table__, sous_rows)
+
+
+def writer_for(conn: Connection) -> Writer:
+    return PostgresWriter(conn) if conn.dialect.name == "postgresql" else Writer(conn)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+@dataclass
+class IngestStats:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.read / elapsed if elapsed else 0.0
+        return (f"{self.read} read, {self.inserted} inserted, {self.updated} updated, "
+                f"{self.unchanged} unchanged, {self.invalid} invalid ({rate:.0f} records/s)")
+
+
+def _existing_hashes(conn: Connection, table, key: str, values: List[str]) -> Dict[str, Optional[str]]:
+    rows = conn.execute(select(table.c[key], table.c.content_hash).where(table.c[key].in_(values)))
+    return {k: h for k, h in rows}
+
+
+def _changed_records(conn, table, key, records, stats: IngestStats, force: bool) -> List[Tuple[dict, str, bool]]:
+    """(record, hash, is_new) for the records of a batch that differ from what is stored."""
+    valid = []
+    for number, record in records:
+        stats.read += 1
+        if not record or not record.get(key):
+            stats.invalid += 1
+            logger.warning("Line %d skipped: not a record or missing %s", number, key)
+            continue
+        valid.append(record)
+    # Last occurrence of a key wins within a batch
+    unique = {r[key]: r for r in valid}
+    existing = _existing_hashes(conn, table, key, list(unique))
+    changed = []
+    for value, record in unique.items():
+        digest = content_hash(record)
+        if not force and existing.get(value) == digest:
+            stats.unchanged += 1
+            continue
+        changed.append((record, digest, value not in existing))
+    stats.unchanged += len(valid) - len(unique)
+    return changed
+
+
+def ingest_formations(records: Iterable, batch_size: int = 500, force: bool = False, log=logger.info) -> IngestStats:
+    stats = IngestStats()
+    for number, chunk in enumerate(batches(records, batch_size), start=1):
+        with engine.begin() as conn:
+            changed = _changed_records(conn, Formation.__table__, "url", chunk, stats, force)
+            batch = FormationBatch()
+            for record, digest, _ in changed:
+                try:
+                    prepare_formation(record, batch, digest)
+                except (TypeError, ValueError) as exc:
+                    stats.invalid += 1
+                    logger.warning("Formation %s skipped: %s", record.get("url"), exc)
+            writer = writer_for(conn)
+            ids = writer.upsert_formations(batch.parents)
+            if ids:
+                writer.delete_children(list(ids.values()))
+                for table, _, _ in CHILDREN.values():
+                    rows = batch.children.get(table.name, [])
+                    writer.insert_rows(table, [
+                        {**{k: v for k, v in r.items() if k != "formation_url"}, "formation_id": ids[r["formation_url"]]}
+                        for r in rows
+                    ])
+                writer.insert_criteres([(ids[url], critere, sous) for url, critere, sous in batch.criteres])
+                catalogue_changes.record_changes(conn, ids.values())
+            prepared = {p["url"] for p in batch.parents}
+            new = sum(1 for record, _, is_new in changed if is_new and record["url"] in prepared)
+            stats.inserted += new
+            stats.updated += len(prepared) - new
+        log(f"batch {number}: {stats.line()}")
+    if stats.inserted or stats.updated:
+        with engine.begin() as conn:
+            compacted = catalogue_changes.compact_changes(conn)
+            log(f"catalogue version {catalogue_changes.catalogue_version(conn)} ({compacted} superseded log entries removed)")
+    return stats
+
+
+def ingest_etablissements(records: Iterable, batch_size: int = 1000, force: bool = False,
+                          log=logger.info) -> IngestStats:
+    stats = IngestStats()
+    academies, etablissements = Academie.__table__, Etablissement.__table__
+    for number, chunk in enumerate(batches(records, batch_size), start=1):
+        with engine.begin() as conn:
+            changed = []
+            for record, digest, is_new in _changed_records(conn, etablissements, "school_url", chunk, stats, force):
+                if not record.get("academie"):  # etablissements.academie_id is NOT NULL
+                    stats.invalid += 1
+                    logger.warning("Etablissement %s skipped: no academie", record.get("school_url"))
+                    continue
+                changed.append((record, digest, is_new))
+            writer = writer_for(conn)
+            academie_rows = {r["academie"]: {"name": r["academie"], "url": r.get("academie_url") or ""}
+                             for r, _, _ in changed}
+            academie_ids = writer.upsert(academies, "name", list(academie_rows.values()))
+            rows = [
+                {**{c: _coerce(etablissements.c[c], r.get(c)) for c in ETABLISSEMENT_COLUMNS},
+                 "academie_id": academie_ids[r["academie"]], "content_hash": digest}
+                for r, digest, _ in changed
+            ]
+            writer.upsert(etablissements, "school_url", rows)
+            new = sum(1 for _, _, is_new in changed if is_new)
+            stats.inserted += new
+            stats.updated += len(changed) - new
+        log(f"batch {number}: {stats.line()}")
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL or CSV file, or - for JSONL on stdin")
+    parser.add_argument("--kind", choices=("formations", "etablissements"), default="formations")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--force", action="store_true", help="rewrite records even when their content hash matches")
+    parser.add_argument("--no-snapshot", action="store_true", help="do not rebuild the downloadable catalogue snapshot")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    init_db()
+    ingest = ingest_formations if args.kind == "formations" else ingest_etablissements
+    stats = ingest(read_records(args.path, args.format), batch_size=args.batch_size, force=args.force)
+    print(f"Done: {stats.line()}")
+    if not args.no_snapshot and (stats.inserted or stats.updated):
+        from app.services.snapshot import build_snapshot
+
+        # Etablissements are not versioned in the change log, so their runs always rebuild
+        build_snapshot(engine, force=args.kind == "etablissements")
+    return 0 if stats.invalid == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Resolve the free-text école / académie names (formations.etablissement, lieu.academy,
+user.etablissement, user.academie) to the etablissements / academies reference rows.
+
+    python -m app.jobs.link_references
+    python -m app.jobs.link_references --only formations --threshold 0.92
+    python -m app.jobs.link_references --dry-run
+
+Run it after catalogue or établissement ingestion, and periodically for the users (a profile edit
+clears the user's links until the next run). Only the links that change are written.
+"""
+import argparse
+import logging
+import sys
+
+from app.core.database import SessionLocal, init_db
+from app.services.linking import FUZZY_THRESHOLD, TARGETS, link_references
+
+REPORTED_UNMATCHED = 10
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=TARGETS, action="append", help="restrict to these tables (repeatable)")
+    parser.add_argument("--threshold", type=float, default=FUZZY_THRESHOLD,
+                        help="minimum similarity (0-1) of a fuzzy match")
+    parser.add_argument("--dry-run", action="store_true", help="report the matches without writing them")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be in (0, 1]")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        results = link_references(db, targets=args.only or TARGETS, threshold=args.threshold)
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for stats in results:
+        print(stats.summary())
+        for value, rows in stats.unmatched.most_common(REPORTED_UNMATCHED):
+            print(f"    unmatched: {value!r} ({rows} rows)")
+    if args.dry_run:
+        print("dry run: nothing written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# app/jobs/normalize_stats.py
+"""
+Backfill the numeric statistics columns (*_pct, tle_*_min/max) from their string originals and
+report the values that could not be parsed.
+
+    python -m app.jobs.normalize_stats
+    python -m app.jobs.normalize_stats --dry-run --report unparseable.json
+
+New and updated rows are normalised on write by the model validators; this job is for rows
+loaded before the columns existed, or after a parser change.
+"""
+import argparse
+import json
+import logging
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, init_db
+from app.models.Formation import NORMALIZED_COLUMNS
+from app.services.normalization import is_missing, parse_grade_interval, parse_percentage
+
+logger = logging.getLogger(__name__)
+
+EXAMPLES_PER_VALUE = 5
+
+
+def _targets(name: str, kind: str) -> List[str]:
+    return [f"{name}_pct"] if kind == "percentage" else [f"{name}_min", f"{name}_max"]
+
+
+def _parse(kind: str, value):
+    return (parse_percentage(value),) if kind == "percentage" else parse_grade_interval(value)
+
+
+def backfill(db: Session, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, dict]:
+    """Recompute every typed column, one committed batch (keyset-paginated by id) at a time."""
+    columns_by_model = defaultdict(list)
+    for model, name, kind in NORMALIZED_COLUMNS:
+        columns_by_model[model].append((name, kind))
+
+    report: Dict[str, dict] = {}
+    for model, columns in columns_by_model.items():
+        stats = {
+            name: {"rows": 0, "parsed": 0, "missing": 0, "updated": 0, "unparseable": Counter(), "examples": {}}
+            for name, _ in columns
+        }
+        selected = [model.id]
+        for name, kind in columns:
+            selected += [getattr(model, name)] + [getattr(model, t) for t in _targets(name, kind)]
+
+        last_id = 0
+        while True:
+            rows = db.query(*selected).filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                values = iter(row[1:])
+                changes = {}
+                for name, kind in columns:
+                    raw = next(values)
+                    current = tuple(next(values) for _ in _targets(name, kind))
+                    parsed = _parse(kind, raw)
+                    column_stats = stats[name]
+                    column_stats["rows"] += 1
+                    if is_missing(raw):
+                        column_stats["missing"] += 1
+                    elif parsed[0] is None:
+                        column_stats["unparseable"][raw] += 1
+                        column_stats["examples"].setdefault(raw, [])
+                        if len(column_stats["examples"][raw]) < EXAMPLES_PER_VALUE:
+                            column_stats["examples"][raw].append(row[0])
+                    else:
+                        column_stats["parsed"] += 1
+                    if parsed != current:
+                        column_stats["updated"] += 1
+                        changes.update(zip(_targets(name, kind), parsed))
+                if changes:
+                    updates.append({"id": row[0], **changes})
+            if updates and not dry_run:
+                db.bulk_update_mappings(model, updates)
+                db.commit()
+            last_id = rows[-1][0]
+            logger.info("%s: up to id %d, %d rows updated in this batch", model.__tablename__, last_id, len(updates))
+
+        for name, column_stats in stats.items():
+            column_stats["unparseable"] = [
+                {"value": value, "count": count, "example_ids": column_stats["examples"][value]}
+                for value, count in column_stats["unparseable"].most_common()
+            ]
+            del column_stats["examples"]
+            report[f"{model.__tablename__}.{name}"] = column_stats
+    return report
+
+
+def format_report(report: Dict[str, dict], limit: int = 10) -> str:
+    lines = [f"{'column':<45} {'rows':>8} {'parsed':>8} {'missing':>8} {'bad':>6} {'updated':>8}"]
+    for column, s in report.items():
+        bad = sum(u["count"] for u in s["unparseable"])
+        lines.append(f"{column:<45} {s['rows']:>8} {s['parsed']:>8} {s['missing']:>8} {bad:>6} {s['updated']:>8}")
+    for column, s in report.items():
+        if s["unparseable"]:
+            lines.append(f"\nUnparseable values in {column}:")
+            for u in s["unparseable"][:limit]:
+                lines.append(f"  {u['value']!r:<40} x{u['count']:<6} e.g. ids {u['example_ids']}")
+            if len(s["unparseable"]) > limit:
+                lines.append(f"  ... {len(s['unparseable']) - limit} more distinct values")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="parse and report without writing")
+    parser.add_argument("--report", help="also write the full report as JSON to this path")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    init_db()
+    db = SessionLocal()
+    try:
+        report = backfill(db, batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Recompute the counselor analytics summary (cohort_stats) from the users, their plan progress and
+orientation choices.
+
+    python -m app.jobs.refresh_cohort_stats
+
+Schedule it (cron) every ANALYTICS_REFRESH_SECONDS or so; the API also refreshes a stale summary
+in the background when a dashboard is opened.
+"""
+import argparse
+import logging
+import sys
+
+from app.core.database import engine, init_db
+from app.services.analytics import refresh_cohort_stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    init_db()
+    with engine.begin() as conn:
+        written = refresh_cohort_stats(conn)
+    print(f"{written} cohort_stats rows written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,24 @@
+import importlib
+import logging
+import threading
+
 import app
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi_jwt_auth import AuthJWT
-from app.core.database import init_db
-from app.api.auth.routes import router as auth_router
+from fastapi_jwt_auth.exceptions import AuthJWTException
+from app.core.database import SessionLocal, init_db, dispose_async_engines, pool_status
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, REGISTRY
+from app.core.rate_limit import Overloaded, RateLimited, retry_after_header
+from app.core.sql_instrumentation import SQLInstrumentationMiddleware, install_sql_instrumentation
+from app.services.autocomplete import autocomplete_engine
+from app.services.recommendation import recommendation_engine
 from fastapi.security import HTTPBearer
 from fastapi.openapi.utils import get_openapi
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Student Management API",
     openapi_tags=[{"name": "auth", "description": "Authentication endpoints"}],
@@ -20,12 +32,91 @@ security = HTTPBearer()
 def get_config():
     return settings
 
-app.include_router(auth_router, prefix="/api/auth")
+# Missing/invalid/expired tokens are client errors (401/422), not 500s
+@app.exception_handler(AuthJWTException)
+def authjwt_exception_handler(request, exc: AuthJWTException):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.message})
+
+# Throttled requests are told when to come back rather than queued
+@app.exception_handler(RateLimited)
+def rate_limited_handler(request, exc: RateLimited):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": retry_after_header(exc.retry_after)})
+
+@app.exception_handler(Overloaded)
+def overloaded_handler(request, exc: Overloaded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": retry_after_header(exc.retry_after)})
+
+if settings.SQL_INSTRUMENTATION != "off":
+    install_sql_instrumentation()
+    app.add_middleware(
+        SQLInstrumentationMiddleware,
+        detect_n_plus_one=settings.SQL_INSTRUMENTATION == "dev",
+        n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+        server_timing=settings.SQL_SERVER_TIMING or settings.SQL_INSTRUMENTATION == "dev",
+    )
+
+# Added last so it wraps everything else (including the SQL instrumentation)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# name -> (module, prefix, tags). The three sync routers keep the /api/auth prefix their paths
+# always had; "async" serves variants of the read-heavy endpoints on the AsyncSession stack.
+# Only the routers listed in API_ROUTERS are imported.
+ROUTERS = {
+    "auth": ("app.api.auth.routes", "/api/auth", ["auth"]),
+    "plans": ("app.api.plan_action.route", "/api/auth", ["plans"]),
+    "catalogue": ("app.api.formation.route", "/api/auth", ["catalogue"]),
+    "async": ("app.api.auth.async_routes", "/api/async", ["async"]),
+}
+for name in settings.API_ROUTERS:
+    module, prefix, tags = ROUTERS[name]
+    app.include_router(importlib.import_module(module).router, prefix=prefix, tags=tags)
+
+# router -> in-memory engines its first requests would otherwise build inline
+WARM_UPS = {
+    "catalogue": {"autocomplete": autocomplete_engine.indexes, "recommendations": recommendation_engine.matrix},
+    "auth": {"recommendations": recommendation_engine.matrix},
+}
+
+def warm_engines(warm_ups):
+    db = SessionLocal(info={"read_only": True})
+    try:
+        for name, warm in warm_ups.items():
+            try:
+                warm(db)
+            except Exception:
+                db.rollback()
+                logger.exception("%s warm-up failed; the first request will build it", name)
+    finally:
+        db.close()
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    warm_ups = {name: warm for router in settings.API_ROUTERS for name, warm in WARM_UPS.get(router, {}).items()}
+    if not warm_ups:
+        return
+    # Built before the first request rather than on it, without holding up the worker's boot
+    threading.Thread(target=warm_engines, args=(warm_ups,), name="engine-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await dispose_async_engines()
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Student Management API"}
\ No newline at end of file
+    return {"message": "Welcome to the Student Management API"}
+
+@app.get("/health/db-pool")
+def db_pool_health():
+    """Pool sizing signals: checked-out connections, overflow, saturation and checkout wait times."""
+    return pool_status()
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        # async on purpose: runs on the event loop, so a saturated thread pool cannot block scraping
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -44,6 +44,8 @@ class Etablissement(Base):
     track = Column(String, nullable=True)   # e.g., "Général", "Technologique", ...
     # unique identifier from site
     school_url = Column(String, nullable=False, unique=True)
+    # sha256 of the last ingested source record
+    content_hash = Column(String(64), nullable=True)
 
     # many-to-one: link back to academie
     academie = relationship("Academie", back_populates="etablissements", lazy="joined")
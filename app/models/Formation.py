@@ -1,15 +1,33 @@
 # app/models.py
 from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.core.database import Base
+from app.models import Academies  # noqa: F401  (etablissements / academies, targets of the link columns)
+from app.services.normalization import parse_grade_interval, parse_percentage
 
-class Formation(Base):
+
+class PercentageColumnsMixin:
+    """Keeps `<name>_pct` in sync with every percentage string listed in __percentages__."""
+    __percentages__ = ()
+
+    @validates("taux_insertion", "taux_passage_2e_annee", "taux_reussite_3_4_ans", "poursuite_etudes", "taux",
+               "taux_minimum_boursiers", "poursuivent_etudes", "en_emploi", "autre_situation")
+    def _normalize_percentage(self, key, value):
+        if key in self.__percentages__:
+            setattr(self, f"{key}_pct", parse_percentage(value))
+        return value
+
+
+class Formation(PercentageColumnsMixin, Base):
     __tablename__ = 'formations'
+    __percentages__ = ("taux_insertion", "taux_passage_2e_annee", "taux_reussite_3_4_ans", "poursuite_etudes")
     id = Column(Integer, primary_key=True)
     timestamp = Column(String)
     url = Column(String, unique=True)
     titre = Column(String)
     etablissement = Column(String)
+    # Resolved from `etablissement` by app.jobs.link_references
+    etablissement_id = Column(Integer, ForeignKey("etablissements.id", ondelete="SET NULL"), nullable=True, index=True)
     type_formation = Column(String)
     type_etablissement = Column(String)
     formation_controlee_par_etat = Column(Boolean)
@@ -30,6 +48,16 @@ class Formation(Base):
     total_admitted_count = Column(Integer)
     complementary_phase_acceptance_percentage = Column(Float)
     taux_reussite_3_4_ans = Column(String)
+    # Parsed copies of the percentage strings above (0-100), for SQL sorting/filtering
+    taux_insertion_pct = Column(Float, index=True)
+    taux_passage_2e_annee_pct = Column(Float, index=True)
+    taux_reussite_3_4_ans_pct = Column(Float, index=True)
+    poursuite_etudes_pct = Column(Float, index=True)
+    # sha256 of the last ingested source record, used to skip unchanged records on re-import
+    content_hash = Column(String(64))
+    # Matières, métiers and secteurs of the child tables, kept up to date by catalogue_changes.record_changes
+    # for full-text search (PostgreSQL also has a generated search_vector tsvector, see services/search.py)
+    search_keywords = Column(Text)
     lieu = relationship("Lieu", backref="formation", uselist=False)
     salaire_bornes = relationship("SalaireBornes", backref="formation", uselist=False)
     badges = relationship("Badge", backref="formation")
@@ -56,6 +84,8 @@ class Lieu(Base):
     region = Column(String)
     departement = Column(String)
     academy = Column(String)
+    # Resolved from `academy` by app.jobs.link_references
+    academie_id = Column(Integer, ForeignKey("academies.id", ondelete="SET NULL"), nullable=True, index=True)
     gps_coordinates = Column(String)
 
 class SalaireBornes(Base):
@@ -101,12 +131,14 @@ class DeboucheSecteur(Base):
     formation_id = Column(Integer, ForeignKey('formations.id', ondelete="CASCADE"))
     secteur = Column(String)
 
-class TsTauxParBac(Base):
+class TsTauxParBac(PercentageColumnsMixin, Base):
     __tablename__ = 'ts_taux_par_bac'
+    __percentages__ = ("taux",)
     id = Column(Integer, primary_key=True)
     formation_id = Column(Integer, ForeignKey('formations.id', ondelete="CASCADE"))
     bac_type = Column(String)
     taux = Column(String)
+    taux_pct = Column(Float)
 
 class IntervalsAdmis(Base):
     __tablename__ = 'intervalles_admis'
@@ -116,6 +148,20 @@ class IntervalsAdmis(Base):
     tle_generale = Column(String)
     tle_techno = Column(String)
     tle_pro = Column(String)
+    # Parsed bounds of the intervals above (grades /20)
+    tle_generale_min = Column(Float)
+    tle_generale_max = Column(Float)
+    tle_techno_min = Column(Float)
+    tle_techno_max = Column(Float)
+    tle_pro_min = Column(Float)
+    tle_pro_max = Column(Float)
+
+    @validates("tle_generale", "tle_techno", "tle_pro")
+    def _normalize_interval(self, key, value):
+        low, high = parse_grade_interval(value)
+        setattr(self, f"{key}_min", low)
+        setattr(self, f"{key}_max", high)
+        return value
 
 class CriteresCandidature(Base):
     __tablename__ = 'criteres_candidature'
@@ -133,11 +179,13 @@ class SousCritere(Base):
     titre = Column(String)
     description = Column(Text)
 
-class Boursiers(Base):
+class Boursiers(PercentageColumnsMixin, Base):
     __tablename__ = 'boursiers'
+    __percentages__ = ("taux_minimum_boursiers",)
     id = Column(Integer, primary_key=True)
     formation_id = Column(Integer, ForeignKey('formations.id', ondelete="CASCADE"))
     taux_minimum_boursiers = Column(String)
+    taux_minimum_boursiers_pct = Column(Float)
     pourcentage_boursiers_neo_bacheliers = Column(Float)
 
 class ProfilsAdmis(Base):
@@ -155,13 +203,17 @@ class PromoCharacteristics(Base):
     female_percentage = Column(Float)
     total_admitted_count = Column(Integer)
 
-class PostFormationOutcomes(Base):
+class PostFormationOutcomes(PercentageColumnsMixin, Base):
     __tablename__ = 'post_formation_outcomes'
+    __percentages__ = ("poursuivent_etudes", "en_emploi", "autre_situation")
     id = Column(Integer, primary_key=True)
     formation_id = Column(Integer, ForeignKey('formations.id', ondelete="CASCADE"))
     poursuivent_etudes = Column(String)
     en_emploi = Column(String)
     autre_situation = Column(String)
+    poursuivent_etudes_pct = Column(Float)
+    en_emploi_pct = Column(Float)
+    autre_situation_pct = Column(Float)
 
 class VoieGenerale(Base):
     __tablename__ = 'voie_generale'
@@ -182,4 +234,16 @@ class VoieTechnologique(Base):
     id = Column(Integer, primary_key=True)
     formation_id = Column(Integer, ForeignKey('formations.id', ondelete="CASCADE"))
     filieres = Column(String)
-    specialities = Column(String)
\ No newline at end of file
+    specialities = Column(String)
+
+# IntervalsAdmis columns in bac générale / techno / pro order
+INTERVAL_COLUMNS = ("tle_generale", "tle_techno", "tle_pro")
+# (model, string column, parser) for every statistics column with typed copies; used by the backfill job
+NORMALIZED_COLUMNS = [
+    *((model, name, "percentage") for model in (Formation, TsTauxParBac, Boursiers, PostFormationOutcomes)
+      for name in model.__percentages__),
+    *((IntervalsAdmis, name, "interval") for name in INTERVAL_COLUMNS),
+]
+
+# Installs the session listeners that log every ORM write of these tables (after the models it uses)
+from app.services import catalogue_changes  # noqa: E402,F401
@@ -22,6 +22,7 @@ class PlanAction(Base):
         ),
         Index("ix_plan_actions_period", "start_date", "end_date"),
     )
+    __mapper_args__ = {"eager_defaults": True}
 
     steps = relationship(
         "PlanStep",
@@ -83,6 +84,7 @@ class UserStepProgress(Base):
         UniqueConstraint("user_id", "step_id", name="uq_user_step_once"),
         Index("ix_user_step_progress_user_step", "user_id", "step_id"),
     )
+    __mapper_args__ = {"eager_defaults": True}
 
     user = relationship("User", back_populates="step_progress")
     step = relationship("PlanStep", back_populates="user_progress")
\ No newline at end of file
@@ -0,0 +1,14 @@
+# app/models/__init__.py
+"""
+The ORM models, one module per domain. Importing one module registers only its own tables (and
+the ones it references); import_all_models() registers every table in Base.metadata, which
+create_all() and the migrations need whichever entry point (API worker or job) creates the schema.
+"""
+import importlib
+
+MODEL_MODULES = ("Academies", "Formation", "PlanAction", "user", "catalogue", "analytics")
+
+
+def import_all_models() -> None:
+    for name in MODEL_MODULES:
+        importlib.import_module(f"{__name__}.{name}")
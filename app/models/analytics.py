@@ -0,0 +1,28 @@
+# app/models/analytics.py
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.core.database import Base
+
+
+class CohortStat(Base):
+    """
+    Pre-aggregated counselor dashboard figures, one row per (dimension, value): academie,
+    etablissement, riasec, orientation domaines / metiers / types_formation, and "all" for the
+    totals. Replaced as a whole by app.services.analytics.refresh_cohort_stats.
+    """
+    __tablename__ = "cohort_stats"
+    __table_args__ = (Index("ix_cohort_stats_dimension_users", "dimension", "users"),)
+
+    dimension = Column(String(32), primary_key=True)
+    value = Column(String(255), primary_key=True)  # grouping key (accent-folded); "" for the totals
+    label = Column(String(255), nullable=True)  # a spelling as entered by the students
+    users = Column(Integer, nullable=False)
+    boursiers = Column(Integer, nullable=False)
+    with_plan = Column(Integer, nullable=False)  # students with at least one plan step
+    plans_completed = Column(Integer, nullable=False)  # ... all of them done
+    steps_total = Column(Integer, nullable=False)
+    steps_done = Column(Integer, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CohortStat {self.dimension}={self.value!r} users={self.users}>"
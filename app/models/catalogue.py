@@ -0,0 +1,39 @@
+# app/models/catalogue.py
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, func
+
+from app.core.database import Base
+
+
+class CatalogueChange(Base):
+    """
+    Append-only change log of the formation catalogue. `version` is the catalogue version: it only
+    grows, is allocated in commit order (see catalogue_changes.record_changes), and clients sync
+    with /formations/changes?since=<last version they saw>.
+    """
+    __tablename__ = "catalogue_changes"
+    # AUTOINCREMENT so SQLite never reuses the version of a compacted row
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    formation_id = Column(Integer, nullable=False, index=True)  # no FK: deletions are logged too
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<CatalogueChange version={self.version} formation_id={self.formation_id} deleted={self.deleted}>"
+
+
+class FormationNeighbor(Base):
+    """
+    Precomputed "formations similaires": the top-k most similar formations of each formation, by
+    rank. Written as a whole by app.jobs.build_neighbors; read with one primary-key range scan.
+    """
+    __tablename__ = "formation_neighbors"
+
+    formation_id = Column(Integer, ForeignKey("formations.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 1 = most similar
+    neighbor_id = Column(Integer, ForeignKey("formations.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)  # cosine similarity in (0, 1]
+
+    def __repr__(self) -> str:
+        return f"<FormationNeighbor formation_id={self.formation_id} rank={self.rank} neighbor_id={self.neighbor_id}>"
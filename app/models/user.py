@@ -1,16 +1,45 @@
+from functools import lru_cache
+
 from sqlalchemy import (
     Column, Integer, String, Date, Boolean, DateTime, func, ForeignKey, JSON, Float, text
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, validates
 from app.core.database import Base
-from passlib.context import CryptContext
+from app.core.metrics import PASSWORD_HASH_DURATION
+from app.models import Academies  # noqa: F401  (etablissements / academies, targets of the link columns)
+from app.models import Formation  # noqa: F401  (formations, target of the favourites' foreign key)
+from app.models import PlanAction  # noqa: F401  (PlanAction / UserStepProgress, targets of the relationships below)
+from app.services.normalization import dominant_riasec
+from app.services.text import normalize
+
+
+@lru_cache(maxsize=None)
+def password_context():
+    """The bcrypt CryptContext; passlib is imported by the first password hashed or checked."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Profile blobs: JSONB on PostgreSQL (GIN-indexable, patched in place with jsonb_set), JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def derived_user_columns(key: str, value) -> dict:
+    """Indexed grouping columns computed from a profile field (see User._sync_derived_columns)."""
+    if key in ("academie", "etablissement"):
+        return {f"{key}_key": normalize(value) or None}
+    if key == "riasec_differentiation":
+        return {"riasec_top": dominant_riasec(value)}
+    return {}
 
 
 class User(Base):
     __tablename__ = "user"
     __table_args__ = {"comment": "Comptes et profil des étudiants"}
+    # created_at / updated_at / server defaults come back with the INSERT or UPDATE (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(254), unique=True, nullable=False, index=True)
@@ -24,7 +53,7 @@ class User(Base):
     objectif = Column(String(255), nullable=True)
     niveau_scolaire = Column(String(250), nullable=True)
     voie = Column(String(250), nullable=True)
-    specialites = Column(JSON, nullable=True)
+    specialites = Column(JSONDocument, nullable=True)
     filiere = Column(String(255), nullable=True)
     telephone = Column(String(20), nullable=True)
     budget = Column(String(255), nullable=True)
@@ -35,17 +64,17 @@ class User(Base):
 
     # Menu 1/2/3 selections
     orientation_choices = Column(
-        JSON,
+        JSONDocument,
         nullable=True,
         comment="Sélections des menus d'orientation (domaines formations, métiers, types de formation)"
     )
 
     riasec_differentiation = Column(
-        JSON, nullable=True,
+        JSONDocument, nullable=True,
         comment="Résultats RIASEC et valeur de différenciation"
     )
     preferences = Column(
-        JSON, nullable=True,
+        JSONDocument, nullable=True,
         comment="Questions, types de préférences et réponses des utilisateurs"
     )
 
@@ -58,6 +87,14 @@ class User(Base):
     longitude = Column(Float, nullable=True)
     etablissement = Column(String(255), nullable=True)
     academie = Column(String(255), nullable=True)
+    # Accent-folded copies of the free-text fields and the dominant RIASEC letter, kept in sync by
+    # _sync_derived_columns, so cohort analytics group on indexed columns
+    etablissement_key = Column(String(255), nullable=True, index=True)
+    academie_key = Column(String(255), nullable=True, index=True)
+    riasec_top = Column(String(1), nullable=True, index=True)
+    # Reference rows matched by app.jobs.link_references; reset when the text changes
+    etablissement_id = Column(Integer, ForeignKey("etablissements.id", ondelete="SET NULL"), nullable=True, index=True)
+    academie_id = Column(Integer, ForeignKey("academies.id", ondelete="SET NULL"), nullable=True, index=True)
 
     # If a plan is deleted, keep the user but null this field
     plan_action_id = Column(
@@ -68,7 +105,7 @@ class User(Base):
     )
 
     # Optional: user notes (e.g., [{"subject": "Math", "score": 15.5}, ...])
-    notes = Column(JSON, nullable=True)
+    notes = Column(JSONDocument, nullable=True)
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -94,10 +131,29 @@ class User(Base):
     # ------------------------
     # Methods
     # ------------------------
+    @validates("academie", "etablissement", "riasec_differentiation")
+    def _sync_derived_columns(self, key, value):
+        for column, derived in derived_user_columns(key, value).items():
+            setattr(self, column, derived)
+        if key in ("academie", "etablissement") and value != self.__dict__.get(key):
+            setattr(self, f"{key}_id", None)  # relinked by the next link_references run
+        return value
+
     def set_password(self, password: str) -> None:
         if len(password) < 8:
             raise ValueError("Le mot de passe doit contenir au moins 8 caractères.")
-        self.password_hash = pwd_context.hash(password)
+        with PASSWORD_HASH_DURATION.labels("hash").time():
+            self.password_hash = password_context().hash(password)
 
     def check_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.password_hash)
\ No newline at end of file
+        with PASSWORD_HASH_DURATION.labels("verify").time():
+            return password_context().verify(password, self.password_hash)
+
+class UserFavoriteFormation(Base):
+    __tablename__ = "user_favorite_formations"
+    __table_args__ = {"comment": "Formations favorites des étudiants, dans l'ordre choisi"}
+
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    formation_id = Column(Integer, ForeignKey("formations.id", ondelete="CASCADE"), primary_key=True, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,169 @@
+# app/services/admission.py
+"""
+Admission-likelihood estimates.
+
+Admitted grade intervals per bac type (IntervalsAdmis.tle_*_min/max), access rates per bac
+(TsTauxParBac.taux_pct), admitted profile shares and the complementary-phase acceptance rate are
+read from their numeric columns into AdmissionData, compiled into (n, 3) arrays alongside the
+recommendation matrix, and estimate() scores one student against any subset of rows in a single
+vectorised call.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.database import in_batches
+from app.models.Formation import INTERVAL_COLUMNS, Formation, IntervalsAdmis, ProfilsAdmis, TsTauxParBac
+from app.services.text import fold
+
+BAC_TYPES = ("generale", "technologique", "professionnelle")
+BANDS = ("inconnu", "très faible", "faible", "moyen", "élevé")
+# Lower probability bound of each band after "inconnu"
+BAND_THRESHOLDS = np.array([0.0, 0.15, 0.4, 0.7])
+NON_SELECTIVE_FLOOR = 0.85
+
+_NOTE_KEYS = ("score", "note", "moyenne", "valeur", "value")
+
+
+def bac_index(value: Optional[str]) -> Optional[int]:
+    """Map a voie / bac label ("Générale", "Bac technologique", "Bac pro", ...) to a BAC_TYPES index."""
+    for word in fold(value or "").replace("-", " ").split():
+        if word.startswith("gen"):
+            return 0
+        if word.startswith("tech"):
+            return 1
+        if word.startswith("pro"):
+            return 2
+    return None
+
+
+def average_grade(notes) -> Optional[float]:
+    """Mean of the grades in User.notes ([{"subject": ..., "score": 14.5}, ...] or {"maths": 14.5})."""
+    if isinstance(notes, dict):
+        candidates = list(notes.values())
+    elif isinstance(notes, list):
+        candidates = [next((n[k] for k in _NOTE_KEYS if k in n), None) if isinstance(n, dict) else n for n in notes]
+    else:
+        return None
+    grades = []
+    for value in candidates:
+        try:
+            grade = float(str(value).replace(",", "."))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= grade <= 20:
+            grades.append(grade)
+    return sum(grades) / len(grades) if grades else None
+
+
+@dataclass
+class AdmissionEstimate:
+    probabilite: Optional[float]
+    niveau: str
+
+
+@dataclass
+class AdmissionData:
+    low: List[float] = field(default_factory=lambda: [math.nan] * 3)
+    high: List[float] = field(default_factory=lambda: [math.nan] * 3)
+    share: List[float] = field(default_factory=lambda: [math.nan] * 3)  # share of admitted per bac type
+    access: List[float] = field(default_factory=lambda: [math.nan] * 3)  # access rate per bac type
+    complementary: float = math.nan
+    selective: bool = True
+
+
+def load_admission_data(db: Session, ids: Optional[Iterable[int]] = None) -> Dict[int, AdmissionData]:
+    ids = sorted(ids) if ids is not None else None
+    data: Dict[int, AdmissionData] = {}
+    base = db.query(Formation.id, Formation.formation_selective, Formation.complementary_phase_acceptance_percentage)
+    for fid, selective, complementary in in_batches(base, Formation.id, ids):
+        data[fid] = AdmissionData(
+            complementary=math.nan if complementary is None else min(float(complementary), 100.0) / 100.0,
+            selective=selective is not False,
+        )
+
+    # Several interval types (notes des admis, notes en spécialités, ...) are averaged per bac type
+    sums: Dict[int, np.ndarray] = {}
+    bounds = [getattr(IntervalsAdmis, f"{c}_{b}") for c in INTERVAL_COLUMNS for b in ("min", "max")]
+    interval_query = db.query(IntervalsAdmis.formation_id, *bounds)
+    for fid, *values in in_batches(interval_query, IntervalsAdmis.formation_id, ids):
+        if fid not in data:
+            continue
+        acc = sums.setdefault(fid, np.zeros((3, 3)))  # per bac: low sum, high sum, count
+        for position in range(3):
+            low, high = values[2 * position], values[2 * position + 1]
+            if low is not None and high is not None:
+                acc[position] += (low, high, 1)
+    for fid, acc in sums.items():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            data[fid].low = list(acc[:, 0] / acc[:, 2])
+            data[fid].high = list(acc[:, 1] / acc[:, 2])
+
+    profils = db.query(ProfilsAdmis.formation_id, ProfilsAdmis.bac_type, ProfilsAdmis.percentage)
+    for fid, bac_type, percentage in in_batches(profils, ProfilsAdmis.formation_id, ids):
+        position = bac_index(bac_type)
+        if fid in data and position is not None and percentage is not None:
+            data[fid].share[position] = min(float(percentage), 100.0) / 100.0
+
+    taux = db.query(TsTauxParBac.formation_id, TsTauxParBac.bac_type, TsTauxParBac.taux_pct)
+    for fid, bac_type, value in in_batches(taux, TsTauxParBac.formation_id, ids):
+        position = bac_index(bac_type)
+        if fid in data and position is not None and value is not None:
+            data[fid].access[position] = value / 100.0
+    return data
+
+
+class AdmissionArrays:
+    """(n, 3) float arrays per bac type plus per-formation vectors, aligned with the catalogue matrix rows."""
+
+    def __init__(self, rows: Sequence[AdmissionData]):
+        n = len(rows)
+        self.low = np.array([r.low for r in rows], dtype=np.float64).reshape(n, 3)
+        self.high = np.array([r.high for r in rows], dtype=np.float64).reshape(n, 3)
+        self.share = np.array([r.share for r in rows], dtype=np.float64).reshape(n, 3)
+        self.access = np.array([r.access for r in rows], dtype=np.float64).reshape(n, 3)
+        self.complementary = np.fromiter((r.complementary for r in rows), dtype=np.float64, count=n)
+        self.selective = np.fromiter((r.selective for r in rows), dtype=bool, count=n)
+
+    def estimate(self, positions: np.ndarray, grade: Optional[float], bac: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probability (nan when unknown) and band index into BANDS for the rows at `positions`.
+        Without a known bac type the student is compared against the best-documented column (générale).
+        """
+        column = 0 if bac is None else bac
+        low, high = self.low[positions, column], self.high[positions, column]
+        access = self.access[positions, column]
+        share = self.share[positions, column]
+        complementary = self.complementary[positions]
+
+        # Grade position relative to the admitted interval: ~0.27 at the lower bound, ~0.95 at the upper
+        if grade is None:
+            from_grade = np.full(len(positions), np.nan)
+        else:
+            width = np.maximum(high - low, 0.5)
+            from_grade = 1.0 / (1.0 + np.exp(-(4.0 * (grade - low) / width - 1.0)))
+        # Blend with the published access rate when both are known, otherwise use whichever exists
+        probability = np.where(
+            np.isnan(from_grade), access,
+            np.where(np.isnan(access), from_grade, 0.7 * from_grade + 0.3 * access),
+        )
+        # Bac types that are (almost) absent among admitted students are penalised
+        probability = probability * np.where(np.isnan(share), 1.0, np.sqrt(np.clip(share / 0.1, 0.05, 1.0)))
+        # Places still offered in the complementary phase add a little headroom
+        probability = probability + (1.0 - probability) * 0.2 * np.nan_to_num(complementary)
+        probability = np.where(self.selective[positions], probability,
+                               np.fmax(probability, NON_SELECTIVE_FLOOR))
+        probability = np.clip(probability, 0.0, 1.0)
+        bands = np.where(np.isnan(probability), 0,
+                         np.searchsorted(BAND_THRESHOLDS, np.nan_to_num(probability), side="right"))
+        return probability, bands
+
+    def estimates(self, positions: np.ndarray, grade: Optional[float], bac: Optional[int]) -> List[AdmissionEstimate]:
+        probability, bands = self.estimate(positions, grade, bac)
+        return [
+            AdmissionEstimate(None if math.isnan(p) else round(float(p), 3), BANDS[b])
+            for p, b in zip(probability.tolist(), bands.tolist())
+        ]
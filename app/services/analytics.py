@@ -0,0 +1,180 @@
+# app/services/analytics.py
+"""
+Counselor cohort analytics.
+
+refresh_cohort_stats() recomputes the cohort_stats summary table with set-based INSERT ... SELECT
+aggregates, one per dimension, over the indexed grouping columns of "user" (academie_key,
+etablissement_key, riasec_top) and the orientation_choices lists, expanded in SQL with
+jsonb_array_elements_text (PostgreSQL) or json_each (SQLite). Plan completion comes from one
+GROUP BY over user_step_progress.
+
+Dashboards only read the summary (one indexed query, whatever the number of students). It is
+refreshed by app.jobs.refresh_cohort_stats, and in the background by the API when older than
+ANALYTICS_REFRESH_SECONDS.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import DateTime, and_, case, func, literal, select, true
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.analytics import CohortStat
+from app.models.PlanAction import UserStepProgress
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+ORIENTATION_KEYS = ("domaines", "metiers", "types_formation")
+DIMENSIONS = ("academie", "etablissement", "riasec") + ORIENTATION_KEYS
+METRICS = ("users", "boursiers", "with_plan", "plans_completed", "steps_total", "steps_done")
+
+
+def _progress():
+    progress = UserStepProgress.__table__
+    return select(
+        progress.c.user_id,
+        func.count().label("steps_total"),
+        func.sum(case((progress.c.is_done, 1), else_=0)).label("steps_done"),
+    ).group_by(progress.c.user_id).subquery("progress")
+
+
+def _metrics(users, progress) -> list:
+    total = func.coalesce(progress.c.steps_total, 0)
+    done = func.coalesce(progress.c.steps_done, 0)
+    return [
+        func.count(users.c.id),
+        func.coalesce(func.sum(case((users.c.est_boursier, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((total > 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(total > 0, done == total), 1), else_=0)), 0),
+        func.coalesce(func.sum(total), 0),
+        func.coalesce(func.sum(done), 0),
+    ]
+
+
+def _orientation_values(conn: Connection, users, key: str):
+    """(user_id, value) for every distinct entry of orientation_choices[key]."""
+    if conn.dialect.name == "postgresql":
+        document = users.c.orientation_choices[key]
+        array = case((func.jsonb_typeof(document) == "array", document), else_=literal([], JSONB))
+        values = func.jsonb_array_elements_text(array).table_valued("value")
+        condition = true()
+    else:
+        values = func.json_each(users.c.orientation_choices, f"$.{key}").table_valued("value")
+        condition = func.json_type(users.c.orientation_choices, f"$.{key}") == "array"
+    return select(users.c.id.label("user_id"), values.c.value.label("value")) \
+        .select_from(users.join(values, true())).where(condition).distinct().subquery(f"choices_{key}")
+
+
+def refresh_cohort_stats(conn: Connection) -> int:
+    """Replace cohort_stats in the caller's transaction; returns the number of rows written."""
+    started = time.perf_counter()
+    users, progress, stats = User.__table__, _progress(), CohortStat.__table__
+    refreshed_at = literal(datetime.now(timezone.utc), DateTime(timezone=True))
+    columns = ["dimension", "value", "label", *METRICS, "refreshed_at"]
+
+    def aggregate(dimension: str, key, label, source, *where):
+        query = select(literal(dimension), key.label("value"), label.label("label"), *_metrics(users, progress),
+                       refreshed_at) \
+            .select_from(source.outerjoin(progress, progress.c.user_id == users.c.id)).where(*where)
+        return query.group_by(key) if dimension != "all" else query
+
+    def spelling(column):
+        # One of the spellings grouped under a key; max() favours "Île-de-France" over "ile de france"
+        return func.max(func.trim(column))
+
+    queries = [
+        aggregate("all", literal(""), literal(None), users),
+        aggregate("academie", users.c.academie_key, spelling(users.c.academie), users, users.c.academie_key.isnot(None)),
+        aggregate("etablissement", users.c.etablissement_key, spelling(users.c.etablissement), users,
+                  users.c.etablissement_key.isnot(None)),
+        aggregate("riasec", users.c.riasec_top, users.c.riasec_top, users, users.c.riasec_top.isnot(None)),
+    ]
+    for key in ORIENTATION_KEYS:
+        choices = _orientation_values(conn, users, key)
+        value = func.lower(func.trim(choices.c.value))
+        queries.append(aggregate(key, value, spelling(choices.c.value),
+                                 choices.join(users, users.c.id == choices.c.user_id), choices.c.value.isnot(None)))
+
+    conn.execute(stats.delete())
+    for query in queries:
+        conn.execute(stats.insert().from_select(columns, query))
+    written = conn.execute(select(func.count()).select_from(stats)).scalar()
+    logger.info("cohort_stats refreshed: %d rows in %.1f ms", written, (time.perf_counter() - started) * 1000)
+    return written
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+@dataclass
+class CohortStats:
+    refreshed_at: Optional[datetime]
+    totals: Optional[CohortStat]
+    dimensions: Dict[str, List[CohortStat]]
+
+
+def read_cohort_stats(db: Session, dimensions=DIMENSIONS, limit: int = 20) -> CohortStats:
+    """The `limit` largest groups of each dimension, in one query on the summary table."""
+    ranked = select(
+        CohortStat,
+        func.row_number().over(
+            partition_by=CohortStat.dimension, order_by=(CohortStat.users.desc(), CohortStat.value)
+        ).label("position"),
+    ).where(CohortStat.dimension.in_(["all", *dimensions])).subquery()
+    rows = db.query(CohortStat).select_entity_from(ranked) \
+        .filter(ranked.c.position <= limit).order_by(ranked.c.dimension, ranked.c.position).all()
+    result = CohortStats(refreshed_at=None, totals=None, dimensions={d: [] for d in dimensions})
+    for row in rows:
+        if row.dimension == "all":
+            result.totals, result.refreshed_at = row, row.refreshed_at
+        else:
+            result.dimensions[row.dimension].append(row)
+    return result
+
+
+class CohortStatsRefresher:
+    """Refreshes the summary off the request path; one refresh at a time."""
+
+    def __init__(self, engine, max_age_seconds: float):
+        self.engine = engine
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        with self.engine.begin() as conn:
+            refresh_cohort_stats(conn)
+
+    def refresh_if_stale(self, refreshed_at: Optional[datetime]) -> bool:
+        """Start a background refresh when the summary is too old; returns whether one was started."""
+        if refreshed_at is not None:
+            if refreshed_at.tzinfo is None:  # SQLite returns naive datetimes
+                refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+            if (datetime.now(timezone.utc) - refreshed_at).total_seconds() < self.max_age_seconds:
+                return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._run, name="cohort-stats-refresh", daemon=True).start()
+        return True
+
+    def _run(self) -> None:
+        try:
+            self._refresh()
+        except Exception:
+            logger.exception("cohort_stats refresh failed")
+        finally:
+            self._lock.release()
+
+
+cohort_stats_refresher = CohortStatsRefresher(engine, settings.ANALYTICS_REFRESH_SECONDS)
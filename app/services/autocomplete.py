@@ -0,0 +1,203 @@
+# app/services/autocomplete.py
+"""
+Search-as-you-type suggestions for school names, cities and formation titles.
+
+Every distinct value is accent-folded and indexed once per word start ("Lycée Édouard Herriot"
+is found from "lyc", "edou" and "herr") in a sorted array; a keystroke is two bisects and a top-k
+over the matching slice, so the database is never queried per request. Suggestions are ranked
+by whether the query matches the start of the label, then by popularity:
+
+    etablissement  Etablissement.etablissement + Formation.etablissement + User.etablissement
+    ville          Etablissement.city + Lieu.ville
+    formation      Formation.titre (+ favourites of the formations with that title)
+
+The indexes are rebuilt as a whole (a few GROUP BY queries) when the catalogue version changes,
+and at least every AUTOCOMPLETE_MAX_AGE_SECONDS for the sources outside the change log (users,
+établissements).
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import AUTOCOMPLETE_DURATION, record_cache_lookup
+from app.models.Academies import Etablissement
+from app.models.Formation import Formation, Lieu
+from app.models.user import User, UserFavoriteFormation
+from app.services import catalogue_changes
+from app.services.text import normalize
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("etablissement", "ville", "formation")
+MAX_SUGGESTIONS = 20
+# Prefixes matching more keys than this ("l", "lyc") get their top suggestions cached per build
+SCAN_LIMIT = 2000
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    label: str
+    kind: str
+    weight: int
+    at_start: bool  # the query matched the beginning of the label, not a later word
+
+
+class PrefixIndex:
+    """Immutable sorted array of word-start suffixes of the labels, with their popularity."""
+
+    def __init__(self, kind: str, entries: Iterable[Tuple[str, int]]):
+        self.kind = kind
+        self.labels: List[str] = []
+        self.weights: List[int] = []
+        keyed = []
+        for label, weight in entries:
+            normalized = normalize(label)
+            if not normalized:
+                continue
+            entry = len(self.labels)
+            self.labels.append(label)
+            self.weights.append(weight)
+            start = 0
+            while start >= 0:
+                keyed.append((normalized[start:], entry, start == 0))
+                start = normalized.find(" ", start)
+                start = start + 1 if start >= 0 else -1
+        keyed.sort()
+        self.keys = [k for k, _, _ in keyed]
+        self.entries = [e for _, e, _ in keyed]
+        self.starts = [s for _, _, s in keyed]
+        self._top: Dict[str, List[Suggestion]] = {}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def complete(self, prefix: str, limit: int) -> List[Suggestion]:
+        """Best `limit` labels having a word that starts with the normalized `prefix`."""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        if hi - lo <= SCAN_LIMIT:
+            return self._rank(lo, hi, limit)
+        top = self._top.get(prefix)
+        if top is None:  # racing threads compute the same list; the last assignment wins
+            top = self._top[prefix] = self._rank(lo, hi, MAX_SUGGESTIONS)
+        return top[:limit]
+
+    def _rank(self, lo: int, hi: int, limit: int) -> List[Suggestion]:
+        at_start: Dict[int, bool] = {}
+        for position in range(lo, hi):
+            entry = self.entries[position]
+            at_start[entry] = at_start.get(entry, False) or self.starts[position]
+        best = heapq.nlargest(limit, at_start, key=lambda e: (at_start[e], self.weights[e], -len(self.labels[e])))
+        return [Suggestion(self.labels[e], self.kind, self.weights[e], at_start[e]) for e in best]
+
+
+def _merge(rows: Iterable[Tuple[Optional[str], int]], into: Dict[str, Counter]) -> None:
+    """Add (value, count) rows to `into`, grouping spellings by normalized form."""
+    for value, count in rows:
+        key = normalize(value)
+        if key:
+            into.setdefault(key, Counter())[value.strip()] += count
+
+
+def _entries(spellings: Dict[str, Counter]) -> List[Tuple[str, int]]:
+    """(most frequent spelling, total count) per normalized value."""
+    return [(counter.most_common(1)[0][0], sum(counter.values())) for counter in spellings.values()]
+
+
+def build_indexes(db: Session) -> Dict[str, PrefixIndex]:
+    def counts(column):
+        return db.query(column, func.count()).filter(column.isnot(None)).group_by(column).all()
+
+    schools: Dict[str, Counter] = {}
+    for column in (Etablissement.etablissement, Formation.etablissement, User.etablissement):
+        _merge(counts(column), schools)
+    cities: Dict[str, Counter] = {}
+    for column in (Etablissement.city, Lieu.ville):
+        _merge(counts(column), cities)
+    titles: Dict[str, Counter] = {}
+    _merge(counts(Formation.titre), titles)
+    _merge(db.query(Formation.titre, func.count())
+           .join(UserFavoriteFormation, UserFavoriteFormation.formation_id == Formation.id)
+           .filter(Formation.titre.isnot(None)).group_by(Formation.titre).all(), titles)
+    return {
+        "etablissement": PrefixIndex("etablissement", _entries(schools)),
+        "ville": PrefixIndex("ville", _entries(cities)),
+        "formation": PrefixIndex("formation", _entries(titles)),
+    }
+
+
+class AutocompleteEngine:
+    def __init__(self, refresh_seconds: float, max_age_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._indexes: Optional[Dict[str, PrefixIndex]] = None
+        self._version = 0
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        catalogue_changes.subscribe(self.notify)
+
+    def notify(self, changed, deleted) -> None:
+        self._dirty = True
+
+    def _stale(self) -> bool:
+        return (self._indexes is None or self._dirty
+                or time.monotonic() - self._checked_at >= self.refresh_seconds)
+
+    def indexes(self, db: Session) -> Dict[str, PrefixIndex]:
+        indexes = self._indexes
+        if not self._stale():
+            record_cache_lookup("autocomplete", True)
+            return indexes
+        # Only one thread rebuilds; the others keep answering from the current indexes
+        if not self._lock.acquire(blocking=indexes is None):
+            record_cache_lookup("autocomplete", True)
+            return indexes
+        try:
+            if self._stale():
+                self._refresh(db)
+            # A miss when this request waited for a build
+            record_cache_lookup("autocomplete", self._indexes is indexes)
+            return self._indexes
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session) -> None:
+        now = time.monotonic()
+        version = catalogue_changes.catalogue_version(db)
+        self._checked_at = now
+        if (self._indexes is not None and not self._dirty and version == self._version
+                and now - self._built_at < self.max_age_seconds):
+            return
+        self._dirty = False  # notifications arriving during the build trigger another one
+        start = time.perf_counter()
+        self._indexes = build_indexes(db)
+        self._version, self._built_at = version, now
+        logger.info("Autocomplete indexes built in %.1f ms: %s", (time.perf_counter() - start) * 1000,
+                    ", ".join(f"{kind} {len(index)}" for kind, index in self._indexes.items()))
+
+    def suggest(self, db: Session, query: str, kind: Optional[str] = None, limit: int = 10) -> List[Suggestion]:
+        """Top `limit` suggestions for `query` in one kind, or across all kinds."""
+        indexes = self.indexes(db)
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with AUTOCOMPLETE_DURATION.time():
+            if kind is not None:
+                return indexes[kind].complete(prefix, limit)
+            merged = [s for index in indexes.values() for s in index.complete(prefix, limit)]
+            return heapq.nlargest(limit, merged, key=lambda s: (s.at_start, s.weight))
+
+
+autocomplete_engine = AutocompleteEngine(settings.CATALOGUE_INDEX_REFRESH_SECONDS,
+                                         settings.AUTOCOMPLETE_MAX_AGE_SECONDS)
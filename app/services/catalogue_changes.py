@@ -0,0 +1,154 @@
+# app/services/catalogue_changes.py
+"""
+Catalogue change tracking.
+
+Formation rows and their child rows (lieu, spécialités, débouchés, voies, ...) flushed through any
+Session are appended to the catalogue_changes log in the same transaction, and published to
+in-process listeners once it commits, so in-memory engines (recommendations, ...) can refresh only
+the formations that actually changed. The session listeners are installed when this module is
+imported, which app.models.Formation does: no process writes formations through the ORM (API,
+jobs, seed scripts) without feeding the log. Bulk writers (the ingestion job) call record_changes()
+themselves. Other processes follow the log through catalogue_version() / changes_since().
+
+Versions must become visible in increasing order, or a client that synced to ?since=11 would never
+see a version 10 committed after 11. PostgreSQL draws a SERIAL value at INSERT time, not at commit,
+so record_changes() first takes a transaction-scoped advisory lock: catalogue writers append to the
+log one transaction at a time, from their log insert to their commit. SQLite already serialises
+writers on the database lock.
+"""
+import logging
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Formation as formation_models
+from app.models.catalogue import CatalogueChange
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[Set[int], Set[int]], None]  # (changed ids, deleted ids)
+CHANGE_LOG_LOCK = 0x63617461  # pg_advisory_xact_lock key of the catalogue_changes writers ("cata")
+
+_listeners: List[Listener] = []
+_installed = False
+
+
+def subscribe(listener: Listener) -> None:
+    _listeners.append(listener)
+
+
+def record_changes(conn, changed: Iterable[int], deleted: Iterable[int] = ()) -> None:
+    """
+    Append one log entry per formation id and refresh the columns derived from child rows
+    (search_keywords) of the changed formations. `conn` is a Connection.
+    """
+    from app.services.search import refresh_search_keywords
+
+    changed = sorted(set(changed) - set(deleted))
+    rows = [{"formation_id": fid, "deleted": False} for fid in changed]
+    rows += [{"formation_id": fid, "deleted": True} for fid in sorted(set(deleted))]
+    if rows:
+        if conn.dialect.name == "postgresql":
+            # Held until commit/rollback, so versions are allocated in commit order
+            conn.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK)))
+        conn.execute(CatalogueChange.__table__.insert(), rows)
+    if changed:
+        refresh_search_keywords(conn, changed)
+
+
+def catalogue_version(conn) -> int:
+    return conn.execute(select(func.coalesce(func.max(CatalogueChange.version), 0))).scalar()
+
+
+def changes_since(conn, since: int, limit: Optional[int] = None) -> List[Tuple[int, int, bool]]:
+    """(version, formation id, deleted) of the latest entry per formation after `since`, oldest first."""
+    latest = (
+        select(CatalogueChange.formation_id, func.max(CatalogueChange.version).label("version"))
+        .where(CatalogueChange.version > since)
+        .group_by(CatalogueChange.formation_id)
+        .subquery()
+    )
+    entry = aliased(CatalogueChange)
+    query = (
+        select(entry.version, entry.formation_id, entry.deleted)
+        .join(latest, entry.version == latest.c.version)
+        .order_by(entry.version)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return [(version, fid, bool(deleted)) for version, fid, deleted in conn.execute(query)]
+
+
+def compact_changes(conn) -> int:
+    """Delete entries superseded by a newer one for the same formation; the feed is unchanged."""
+    table = CatalogueChange.__table__
+    newer = aliased(table)
+    result = conn.execute(table.delete().where(
+        select(newer.c.version)
+        .where(newer.c.formation_id == table.c.formation_id, newer.c.version > table.c.version)
+        .exists()
+    ))
+    return result.rowcount
+
+
+def _formation_id_of(obj):
+    if isinstance(obj, formation_models.Formation):
+        return obj.id
+    if getattr(type(obj), "__module__", None) == formation_models.__name__:
+        return getattr(obj, "formation_id", None)
+    return None
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed, deleted = set(), set()
+    for obj in list(session.new) + list(session.dirty):
+        formation_id = _formation_id_of(obj)
+        if formation_id is not None:
+            changed.add(formation_id)
+    for obj in session.deleted:
+        formation_id = _formation_id_of(obj)
+        if formation_id is None:
+            continue
+        if isinstance(obj, formation_models.Formation):
+            deleted.add(formation_id)
+        else:
+            changed.add(formation_id)
+    if not changed and not deleted:
+        return
+    # Same connection, same transaction: the log entry commits or rolls back with the change
+    record_changes(session.connection(), changed, deleted)
+    session.info.setdefault("catalogue_changed", set()).update(changed)
+    session.info.setdefault("catalogue_deleted", set()).update(deleted)
+
+
+def _after_commit(session: Session) -> None:
+    changed = session.info.pop("catalogue_changed", None)
+    deleted = session.info.pop("catalogue_deleted", None)
+    if not changed and not deleted:
+        return
+    deleted = deleted or set()
+    changed = (changed or set()) - deleted
+    for listener in _listeners:
+        try:
+            listener(changed, deleted)
+        except Exception:  # a cache must never break the write path
+            logger.exception("Catalogue change listener failed")
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop("catalogue_changed", None)
+    session.info.pop("catalogue_deleted", None)
+
+
+def install_catalogue_change_tracking() -> None:
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _installed = True
+
+
+install_catalogue_change_tracking()
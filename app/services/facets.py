@@ -0,0 +1,180 @@
+# app/services/facets.py
+"""
+Catalogue filters and their facet counts.
+
+FormationFilters is shared by the /formations/ listing and /formations/facets, so the counts always
+describe the rows the listing returns. On PostgreSQL every facet is counted in one statement with
+GROUP BY GROUPING SETS over the filtered formations joined to lieu, badges and the voie tables
+(count(DISTINCT id) absorbs the fan-out of the joins); GROUPING() tells which set a row belongs to.
+Other databases get the same counts from one UNION ALL of per-facet GROUP BYs.
+
+Unfiltered facets, what every filter sidebar shows first, are computed once per catalogue version.
+"""
+import threading
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import String, cast, func, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.core.metrics import record_cache_lookup
+from app.models.Formation import Badge, Formation, Lieu, VoieGenerale, VoiePro, VoieTechnologique
+from app.services import catalogue_changes
+
+VOIES = {"generale": VoieGenerale, "technologique": VoieTechnologique, "pro": VoiePro}
+FacetValue = Union[str, bool]
+
+
+@dataclass(frozen=True)
+class FormationFilters:
+    type_formation: Optional[str] = None
+    type_etablissement: Optional[str] = None
+    apprentissage: Optional[str] = None
+    formation_selective: Optional[bool] = None
+    region: Optional[str] = None
+    academy: Optional[str] = None
+    badge: Optional[str] = None
+    voie: Optional[str] = None  # generale, technologique or pro
+    min_taux_insertion: Optional[float] = None
+    min_taux_reussite: Optional[float] = None
+    min_taux_passage: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, f.name) is None for f in fields(self))
+
+    def conditions(self) -> list:
+        """WHERE clauses on formations; child tables are tested with EXISTS, so rows are never multiplied."""
+        conditions = []
+        for column in (Formation.type_formation, Formation.type_etablissement, Formation.apprentissage,
+                       Formation.formation_selective):
+            value = getattr(self, column.key)
+            if value is not None:
+                conditions.append(column == value)
+        if self.region is not None:
+            conditions.append(Formation.lieu.has(Lieu.region == self.region))
+        if self.academy is not None:
+            conditions.append(Formation.lieu.has(Lieu.academy == self.academy))
+        if self.badge is not None:
+            conditions.append(Formation.badges.any(Badge.badge == self.badge))
+        if self.voie is not None:
+            conditions.append(getattr(Formation, f"voie_{self.voie}").has())
+        for column, minimum in (
+            (Formation.taux_insertion_pct, self.min_taux_insertion),
+            (Formation.taux_reussite_3_4_ans_pct, self.min_taux_reussite),
+            (Formation.taux_passage_2e_annee_pct, self.min_taux_passage),
+        ):
+            if minimum is not None:
+                conditions.append(column >= minimum)
+        return conditions
+
+    def apply(self, query):
+        return query.filter(*self.conditions())
+
+
+@dataclass
+class FacetCounts:
+    total: int
+    facets: Dict[str, List[Tuple[FacetValue, int]]]  # facet -> [(value, count)], most frequent first
+
+
+def _facet_sources(filters: FormationFilters):
+    """(filtered formations CTE, {facet name: column}, FROM clause joining the facet tables)."""
+    filtered = select(Formation.id, Formation.type_formation, Formation.type_etablissement,
+                      Formation.apprentissage, Formation.formation_selective) \
+        .where(*filters.conditions()).cte("filtered")
+    voies = union_all(*(
+        select(model.formation_id.label("formation_id"), literal(name).label("voie"))
+        for name, model in VOIES.items()
+    )).subquery("voies")
+    lieu, badges = Lieu.__table__, Badge.__table__
+    columns = {
+        "type_formation": filtered.c.type_formation,
+        "type_etablissement": filtered.c.type_etablissement,
+        "apprentissage": filtered.c.apprentissage,
+        "formation_selective": filtered.c.formation_selective,
+        "region": lieu.c.region,
+        "academy": lieu.c.academy,
+        "badge": badges.c.badge,
+        "voie": voies.c.voie,
+    }
+    source = filtered \
+        .outerjoin(lieu, lieu.c.formation_id == filtered.c.id) \
+        .outerjoin(badges, badges.c.formation_id == filtered.c.id) \
+        .outerjoin(voies, voies.c.formation_id == filtered.c.id)
+    return filtered, columns, source
+
+
+def _grouping_sets(db: Session, filters: FormationFilters) -> FacetCounts:
+    filtered, columns, source = _facet_sources(filters)
+    names, cols = list(columns), list(columns.values())
+    rows = db.execute(
+        select(*cols, func.grouping(*cols).label("grouping"), func.count(filtered.c.id.distinct()).label("n"))
+        .select_from(source)
+        .group_by(func.grouping_sets(*(tuple_(c) for c in cols), tuple_()))
+    ).all()
+    # GROUPING(a, b, ...) has a 1 bit for every column aggregated away: all of them but the grouped one
+    everything = (1 << len(cols)) - 1
+    by_mask = {everything ^ (1 << (len(cols) - 1 - i)): i for i in range(len(cols))}
+    counts = FacetCounts(total=0, facets={name: [] for name in names})
+    for row in rows:
+        if row.grouping == everything:
+            counts.total = row.n
+            continue
+        i = by_mask[row.grouping]
+        if row[i] is not None:
+            counts.facets[names[i]].append((row[i], row.n))
+    return counts
+
+
+def _union(db: Session, filters: FormationFilters) -> FacetCounts:
+    filtered, columns, source = _facet_sources(filters)
+    rows = db.execute(union_all(
+        select(literal("").label("facet"), cast(None, String).label("value"), func.count().label("n"))
+        .select_from(filtered),
+        *(
+            select(literal(name), cast(column, String), func.count(filtered.c.id.distinct()))
+            .select_from(source).where(column.isnot(None)).group_by(column)
+            for name, column in columns.items()
+        ),
+    )).all()
+    counts = FacetCounts(total=0, facets={name: [] for name in columns})
+    for facet, value, n in rows:
+        if not facet:
+            counts.total = n
+        elif facet == "formation_selective":  # cast to text: "1"/"0" on SQLite, "true"/"false" elsewhere
+            counts.facets[facet].append((value.lower() in ("1", "true"), n))
+        else:
+            counts.facets[facet].append((value, n))
+    return counts
+
+
+def facet_counts(db: Session, filters: FormationFilters) -> FacetCounts:
+    counts = _grouping_sets(db, filters) if db.get_bind().dialect.name == "postgresql" else _union(db, filters)
+    for values in counts.facets.values():
+        values.sort(key=lambda item: (-item[1], str(item[0])))
+    return counts
+
+
+class FacetCache:
+    """Unfiltered facet counts of the latest catalogue version (one cheap version query per hit)."""
+
+    def __init__(self):
+        self._entry: Optional[Tuple[int, FacetCounts]] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Tuple[int, FacetCounts]:
+        version = catalogue_changes.catalogue_version(db)
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            record_cache_lookup("facets", True)
+            return entry
+        with self._lock:  # a new version is computed by one request, the others wait for it
+            entry = self._entry
+            hit = entry is not None and entry[0] == version  # another request computed it while this one waited
+            if not hit:
+                entry = self._entry = (version, facet_counts(db, FormationFilters()))
+            record_cache_lookup("facets", hit)
+            return entry
+
+
+facet_cache = FacetCache()
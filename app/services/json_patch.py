@@ -0,0 +1,235 @@
+# app/services/json_patch.py
+"""
+Partial updates of JSON documents: JSON Merge Patch (RFC 7396) and JSON Patch (RFC 6902).
+
+apply_merge_patch() and apply_json_patch() return the patched document together with the minimal
+list of Changes: "set" / "insert" / "remove" at a path. On PostgreSQL jsonb_expression() turns
+those changes into nested jsonb_set / jsonb_insert / #- calls, so an UPDATE sends only the
+changed fragments instead of the whole document; Change.as_operation() gives the same changes
+back to the client as a JSON Patch.
+"""
+import copy
+from dataclasses import dataclass
+from typing import Any, List, Sequence, Tuple, Union
+
+from sqlalchemy import Text, func, literal
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+Token = Union[str, int]
+MAX_OPERATIONS = 100
+_MISSING = object()
+
+
+class PatchError(ValueError):
+    """Malformed patch, or a path that does not exist in the document."""
+
+
+class PatchConflict(PatchError):
+    """A JSON Patch "test" operation failed."""
+
+
+@dataclass
+class Change:
+    kind: str  # set, insert (array element before `path`) or remove
+    path: Tuple[Token, ...]
+    value: Any = None
+    existed: bool = False  # for "set": the path was already there
+
+    def as_operation(self) -> dict:
+        pointer = "".join("/" + str(t).replace("~", "~0").replace("/", "~1") for t in self.path)
+        if self.kind == "remove":
+            return {"op": "remove", "path": pointer}
+        op = "replace" if self.kind == "set" and self.existed else "add"
+        return {"op": op, "path": pointer, "value": self.value}
+
+
+# ---------------------------------------------------------------------------
+# Merge patch
+# ---------------------------------------------------------------------------
+def _merged(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merged(result.get(key), value)
+    return result
+
+
+def _merge_changes(target: Any, patch: Any, path: Tuple[Token, ...]) -> List[Change]:
+    if not isinstance(patch, dict) or not isinstance(target, dict):
+        merged = _merged(target, patch)
+        return [] if merged == target else [Change("set", path, merged, existed=True)]
+    changes = []
+    for key, value in patch.items():
+        current = target.get(key, _MISSING)
+        if value is None:
+            if current is not _MISSING:
+                changes.append(Change("remove", path + (key,)))
+        elif isinstance(value, dict) and isinstance(current, dict):
+            changes.extend(_merge_changes(current, value, path + (key,)))
+        else:
+            merged = _merged(None, value)
+            if merged != current:
+                changes.append(Change("set", path + (key,), merged, existed=current is not _MISSING))
+    return changes
+
+
+def apply_merge_patch(document: Any, patch: Any) -> Tuple[Any, List[Change]]:
+    return _merged(document, patch), _merge_changes(document, patch, ())
+
+
+# ---------------------------------------------------------------------------
+# JSON Patch
+# ---------------------------------------------------------------------------
+def parse_pointer(pointer: Any) -> List[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Chemin JSON Pointer invalide: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer.split("/")[1:]]
+
+
+def _index(container: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Index de tableau invalide: {pointer}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Index hors limites: {pointer}")
+    return index
+
+
+def _parent(document: Any, tokens: Sequence[str], pointer: str) -> Tuple[Any, List[Token]]:
+    """The container holding the last token, and the concrete path to it."""
+    node, path = document, []
+    for token in tokens[:-1]:
+        if isinstance(node, dict) and token in node:
+            node = node[token]
+            path.append(token)
+        elif isinstance(node, list):
+            index = _index(node, token, pointer)
+            node = node[index]
+            path.append(index)
+        else:
+            raise PatchError(f"Chemin introuvable: {pointer}")
+    if not isinstance(node, (dict, list)):
+        raise PatchError(f"Chemin introuvable: {pointer}")
+    return node, path
+
+
+def _get(document: Any, pointer: str) -> Any:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        return document
+    parent, _ = _parent(document, tokens, pointer)
+    if isinstance(parent, list):
+        return parent[_index(parent, tokens[-1], pointer)]
+    if tokens[-1] not in parent:
+        raise PatchError(f"Chemin introuvable: {pointer}")
+    return parent[tokens[-1]]
+
+
+def _add(document: Any, pointer: str, value: Any, changes: List[Change]) -> Any:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        changes.append(Change("set", (), value, existed=True))
+        return value
+    parent, path = _parent(document, tokens, pointer)
+    if isinstance(parent, list):
+        index = _index(parent, tokens[-1], pointer, allow_end=True)
+        kind = "set" if index == len(parent) else "insert"  # appending: jsonb_set past the end
+        parent.insert(index, value)
+        changes.append(Change(kind, tuple(path) + (index,), value))
+    else:
+        changes.append(Change("set", tuple(path) + (tokens[-1],), value, existed=tokens[-1] in parent))
+        parent[tokens[-1]] = value
+    return document
+
+
+def _remove(document: Any, pointer: str, changes: List[Change]) -> Any:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise PatchError("Impossible de supprimer la racine du document")
+    parent, path = _parent(document, tokens, pointer)
+    if isinstance(parent, list):
+        key = _index(parent, tokens[-1], pointer)
+    elif tokens[-1] in parent:
+        key = tokens[-1]
+    else:
+        raise PatchError(f"Chemin introuvable: {pointer}")
+    del parent[key]
+    changes.append(Change("remove", tuple(path) + (key,)))
+    return document
+
+
+def _replace(document: Any, pointer: str, value: Any, changes: List[Change]) -> Any:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        changes.append(Change("set", (), value, existed=True))
+        return value
+    parent, path = _parent(document, tokens, pointer)
+    if isinstance(parent, list):
+        key = _index(parent, tokens[-1], pointer)
+    elif tokens[-1] in parent:
+        key = tokens[-1]
+    else:
+        raise PatchError(f"Chemin introuvable: {pointer}")
+    parent[key] = value
+    changes.append(Change("set", tuple(path) + (key,), value, existed=True))
+    return document
+
+
+def apply_json_patch(document: Any, operations: Any) -> Tuple[Any, List[Change]]:
+    if not isinstance(operations, list):
+        raise PatchError("Un JSON Patch est une liste d'opérations")
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f"Au plus {MAX_OPERATIONS} opérations par requête.")
+    document = copy.deepcopy(document)
+    changes: List[Change] = []
+    for operation in operations:
+        if not isinstance(operation, dict) or not isinstance(operation.get("op"), str):
+            raise PatchError(f"Opération invalide: {operation!r}")
+        op, pointer = operation["op"], operation.get("path")
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"Opération {op} sans valeur")
+        if op == "add":
+            document = _add(document, pointer, copy.deepcopy(operation["value"]), changes)
+        elif op == "remove":
+            document = _remove(document, pointer, changes)
+        elif op == "replace":
+            document = _replace(document, pointer, copy.deepcopy(operation["value"]), changes)
+        elif op in ("move", "copy"):
+            source = operation.get("from")
+            value = copy.deepcopy(_get(document, source))
+            if op == "move":
+                if pointer != source and pointer.startswith(source + "/"):
+                    raise PatchError(f"Impossible de déplacer {source} dans l'un de ses descendants")
+                document = _remove(document, source, changes)
+            document = _add(document, pointer, value, changes)
+        elif op == "test":
+            if _get(document, pointer) != operation["value"]:
+                raise PatchConflict(f"Test échoué pour {pointer}")
+        else:
+            raise PatchError(f"Opération inconnue: {op}")
+    return document, changes
+
+
+# ---------------------------------------------------------------------------
+# SQL (PostgreSQL jsonb)
+# ---------------------------------------------------------------------------
+def jsonb_expression(column, changes: Sequence[Change], default: Any):
+    """`column` with `changes` applied in SQL, starting from `default` when the column is NULL."""
+    expression = func.coalesce(column, literal(default, JSONB))
+    for change in changes:
+        path = literal([str(t) for t in change.path], ARRAY(Text))
+        if change.kind == "remove":
+            expression = expression.op("#-", return_type=JSONB)(path)
+        elif not change.path:
+            expression = literal(change.value, JSONB)
+        elif change.kind == "insert":
+            expression = func.jsonb_insert(expression, path, literal(change.value, JSONB), False)
+        else:
+            expression = func.jsonb_set(expression, path, literal(change.value, JSONB), True)
+    return expression
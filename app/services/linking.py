@@ -0,0 +1,253 @@
+# app/services/linking.py
+"""
+Links the free-text école / académie names to the reference tables.
+
+formations.etablissement, lieu.academy, user.etablissement and user.academie are typed by hand or
+scraped from different sources ("Académie de Versailles", "versailles", "Lycée St-Exupéry" ...).
+link_references() resolves them to academies.id / etablissements.id so the API joins on indexed
+foreign keys instead of comparing strings:
+
+    exact   the normalised name (accents, case, punctuation folded) of exactly one reference
+    fuzzy   the best difflib similarity >= threshold, clearly ahead of the runner-up
+
+Candidates are narrowed to the same city (formations) or académie (users) whenever the reference
+table has one there, so homonyms ("Lycée Victor Hugo") resolve to the right school. Each distinct
+(value, scope) is matched once, and only rows whose link changes are updated.
+"""
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from app.models.Academies import Academie, Etablissement
+from app.models.Formation import Formation, Lieu
+from app.models.user import User
+from app.services.text import normalize, tokens
+
+logger = logging.getLogger(__name__)
+
+FUZZY_THRESHOLD = 0.88
+FUZZY_MARGIN = 0.04  # the best candidate must beat the runner-up by this much
+MAX_TOKEN_FREQUENCY = 200  # words shared by more references ("lycee") do not narrow anything
+ACADEMIE_PREFIXES = ("region academique ", "academie de ", "academie d ", "academie du ", "academie des ",
+                     "academie ")
+UPDATE_BATCH_SIZE = 5000
+TARGETS = ("lieux", "formations", "users")
+
+
+def academie_key(value: Optional[str]) -> str:
+    """normalize() without the "Académie de" prefix: "Académie d'Aix-Marseille" -> "aix marseille"."""
+    key = normalize(value)
+    for prefix in ACADEMIE_PREFIXES:
+        if key.startswith(prefix):
+            return key[len(prefix):]
+    return key
+
+
+def similarity(a: str, b: str) -> float:
+    """difflib ratio of the names, or of their sorted words when that is higher (word order ignored)."""
+    score = SequenceMatcher(None, a, b).ratio()
+    a_sorted, b_sorted = " ".join(sorted(a.split())), " ".join(sorted(b.split()))
+    if a_sorted != a or b_sorted != b:
+        score = max(score, SequenceMatcher(None, a_sorted, b_sorted).ratio())
+    return score
+
+
+@dataclass(frozen=True)
+class Reference:
+    id: int
+    key: str
+    city: Optional[str] = None  # normalised
+    academie_id: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Match:
+    id: Optional[int]
+    method: str  # exact, fuzzy, ambiguous or unmatched
+    score: float = 0.0
+
+
+UNMATCHED = Match(None, "unmatched")
+
+
+class Matcher:
+    def __init__(self, references: Iterable[Reference], key: Callable[[Optional[str]], str] = normalize,
+                 threshold: float = FUZZY_THRESHOLD):
+        self.key = key
+        self.threshold = threshold
+        self._by_key: Dict[str, List[Reference]] = {}
+        self._by_token: Dict[str, List[Reference]] = {}
+        self._by_city: Dict[str, List[Reference]] = {}
+        self._by_academie: Dict[int, List[Reference]] = {}
+        for reference in references:
+            if not reference.key:
+                continue
+            self._by_key.setdefault(reference.key, []).append(reference)
+            for token in set(tokens(reference.key)):
+                self._by_token.setdefault(token, []).append(reference)
+            if reference.city:
+                self._by_city.setdefault(reference.city, []).append(reference)
+            if reference.academie_id is not None:
+                self._by_academie.setdefault(reference.academie_id, []).append(reference)
+
+    @staticmethod
+    def _scoped(references: List[Reference], city: Optional[str], academie_id: Optional[int]) -> List[Reference]:
+        """Only the references in the same city / académie, when there are any."""
+        if city:
+            same = [r for r in references if r.city == city]
+            references = same or references
+        if academie_id is not None:
+            same = [r for r in references if r.academie_id == academie_id]
+            references = same or references
+        return references
+
+    def _candidates(self, key: str, city: Optional[str], academie_id: Optional[int]) -> List[Reference]:
+        if city and city in self._by_city:
+            pool = self._by_city[city]
+        elif academie_id is not None and academie_id in self._by_academie:
+            pool = self._by_academie[academie_id]
+        else:
+            # Without a scope, the references sharing a discriminating word with the value
+            seen: Dict[int, Reference] = {}
+            for token in set(tokens(key)):
+                references = self._by_token.get(token, ())
+                if len(references) <= MAX_TOKEN_FREQUENCY:
+                    seen.update((r.id, r) for r in references)
+            pool = list(seen.values())
+        return self._scoped(pool, city, academie_id)
+
+    def match(self, value: Optional[str], city: Optional[str] = None, academie_id: Optional[int] = None) -> Match:
+        key = self.key(value)
+        if not key:
+            return UNMATCHED
+        exact = self._scoped(self._by_key.get(key, []), city, academie_id)
+        if exact:
+            ids = {r.id for r in exact}
+            return Match(exact[0].id, "exact", 1.0) if len(ids) == 1 else Match(None, "ambiguous", 1.0)
+
+        best: Dict[int, float] = {}
+        for reference in self._candidates(key, city, academie_id):
+            matcher = SequenceMatcher(None, key, reference.key)
+            if matcher.real_quick_ratio() < self.threshold - 0.1:
+                continue
+            score = similarity(key, reference.key)
+            if score > best.get(reference.id, 0.0):
+                best[reference.id] = score
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        if not ranked or ranked[0][1] < self.threshold:
+            return UNMATCHED
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < FUZZY_MARGIN:
+            return Match(None, "ambiguous", ranked[0][1])
+        return Match(ranked[0][0], "fuzzy", ranked[0][1])
+
+
+@dataclass
+class LinkStats:
+    target: str
+    rows: int = 0
+    methods: Counter = field(default_factory=Counter)  # rows per Match.method ("" for empty values)
+    updated: int = 0
+    unmatched: Counter = field(default_factory=Counter)  # value -> rows, for the report
+
+    def summary(self) -> str:
+        linked = self.methods["exact"] + self.methods["fuzzy"]
+        return (f"{self.target}: {self.rows} rows, {linked} linked ({self.methods['exact']} exact, "
+                f"{self.methods['fuzzy']} fuzzy), {self.methods['ambiguous']} ambiguous, "
+                f"{self.methods['unmatched']} unmatched, {self.updated} updated")
+
+
+def _link(db: Session, target: str, column, rows: Iterable[Tuple[int, Optional[int], Optional[str], dict]],
+          resolve: Callable[..., Match]) -> LinkStats:
+    """Resolve (row id, current link, value, scope) rows and rewrite the links that changed."""
+    table = column.table
+    stats = LinkStats(target)
+    cache: Dict[tuple, Match] = {}
+    updates: List[dict] = []
+    for row_id, current, value, scope in rows:
+        stats.rows += 1
+        if value is None or not value.strip():
+            match, method = UNMATCHED, ""
+        else:
+            cache_key = (value, *sorted(scope.items()))
+            match = cache.get(cache_key)
+            if match is None:
+                match = cache[cache_key] = resolve(value, **scope)
+            method = match.method
+            if method == "unmatched":
+                stats.unmatched[value.strip()] += 1
+        stats.methods[method] += 1
+        if match.id != current:
+            updates.append({"row_id": row_id, "target_id": match.id})
+
+    statement = table.update().where(table.c.id == bindparam("row_id")).values({column.key: bindparam("target_id")})
+    for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+        db.execute(statement, updates[start:start + UPDATE_BATCH_SIZE])
+    stats.updated = len(updates)
+    logger.info("%s (%d distinct values)", stats.summary(), len(cache))
+    return stats
+
+
+def academie_matcher(db: Session, threshold: float = FUZZY_THRESHOLD) -> Matcher:
+    return Matcher(
+        (Reference(row_id, academie_key(name)) for row_id, name in db.execute(select(Academie.id, Academie.name))),
+        key=academie_key, threshold=threshold,
+    )
+
+
+def etablissement_matcher(db: Session, threshold: float = FUZZY_THRESHOLD) -> Matcher:
+    rows = db.execute(select(Etablissement.id, Etablissement.etablissement, Etablissement.city,
+                             Etablissement.academie_id))
+    return Matcher(
+        (Reference(row_id, normalize(name), normalize(city) or None, academie_id)
+         for row_id, name, city, academie_id in rows),
+        threshold=threshold,
+    )
+
+
+def link_references(db: Session, targets: Iterable[str] = TARGETS,
+                    threshold: float = FUZZY_THRESHOLD) -> List[LinkStats]:
+    """Relink the requested targets in the caller's transaction (académies before the schools they scope)."""
+    started = time.perf_counter()
+    targets = set(targets)
+    academies = academie_matcher(db, threshold)
+    etablissements = etablissement_matcher(db, threshold)
+    results = []
+
+    if "lieux" in targets:
+        rows = db.execute(select(Lieu.id, Lieu.academie_id, Lieu.academy))
+        results.append(_link(db, "lieu.academie_id", Lieu.__table__.c.academie_id,
+                             ((row_id, current, value, {}) for row_id, current, value in rows), academies.match))
+
+    if "formations" in targets:
+        rows = db.execute(
+            select(Formation.id, Formation.etablissement_id, Formation.etablissement, Lieu.ville, Lieu.academie_id)
+            .outerjoin(Lieu, Lieu.formation_id == Formation.id).order_by(Formation.id)
+        ).all()
+        seen = set()
+        scoped = []
+        for row_id, current, value, ville, academie_id in rows:
+            if row_id not in seen:  # one lieu per formation; keep the first if there are several
+                seen.add(row_id)
+                scoped.append((row_id, current, value, {"city": normalize(ville) or None, "academie_id": academie_id}))
+        results.append(_link(db, "formations.etablissement_id", Formation.__table__.c.etablissement_id,
+                             scoped, etablissements.match))
+
+    if "users" in targets:
+        users = User.__table__
+        rows = db.execute(select(users.c.id, users.c.academie_id, users.c.academie)).all()
+        results.append(_link(db, "user.academie_id", users.c.academie_id,
+                             ((row_id, current, value, {}) for row_id, current, value in rows), academies.match))
+        rows = db.execute(select(users.c.id, users.c.etablissement_id, users.c.etablissement,
+                                 users.c.academie_id)).all()
+        results.append(_link(db, "user.etablissement_id", users.c.etablissement_id,
+                             ((row_id, current, value, {"academie_id": academie_id})
+                              for row_id, current, value, academie_id in rows), etablissements.match))
+
+    logger.info("References linked in %.1f s", time.perf_counter() - started)
+    return results
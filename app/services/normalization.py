@@ -0,0 +1,66 @@
+# app/services/normalization.py
+"""
+Parsers for the scraped statistics strings ("85 %", "12.5 - 15.2", "Non communiqué", ...).
+The models keep the original strings and store the parsed values in typed *_pct / *_min / *_max
+columns, so sorting and filtering on them is plain indexed SQL.
+"""
+import re
+from typing import Optional, Tuple
+
+from app.services.text import fold
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+# Placeholders the scraper emits for "no data": these are missing values, not parse failures
+MISSING_MARKERS = frozenset({
+    "", "-", "--", "—", "/", "?", "n/a", "na", "nc", "nd", "none", "null", "inconnu", "aucun", "aucune",
+    "non communique", "non communiquee", "non disponible", "non renseigne", "donnee non disponible",
+})
+
+
+def _numbers(text: str):
+    return [float(n.replace(",", ".")) for n in _NUMBER.findall(text)]
+
+
+def is_missing(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, (int, float)):
+        return False
+    return fold(str(value)).strip(" .") in MISSING_MARKERS
+
+
+def parse_percentage(value) -> Optional[float]:
+    """"85 %" -> 85.0, "entre 60 et 70 %" -> 65.0; None when missing or not a 0-100 percentage."""
+    if is_missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        numbers = [float(value)]
+    else:
+        numbers = _numbers(str(value))
+    if not 1 <= len(numbers) <= 2:
+        return None
+    percentage = sum(numbers) / len(numbers)
+    return round(percentage, 2) if 0 <= percentage <= 100 else None
+
+
+def parse_grade_interval(value) -> Tuple[Optional[float], Optional[float]]:
+    """"12.5 - 15.2" -> (12.5, 15.2), "14" -> (14.0, 14.0); (None, None) when missing or not /20 grades."""
+    if is_missing(value):
+        return None, None
+    numbers = _numbers(str(value))
+    if not 1 <= len(numbers) <= 2 or not all(0 <= n <= 20 for n in numbers):
+        return None, None
+    return min(numbers), max(numbers)
+
+
+def dominant_riasec(value) -> Optional[str]:
+    """Highest-scoring letter of a riasec_differentiation blob ({"scores": {"R": 40, "I": 85, ...}})."""
+    scores = value.get("scores") if isinstance(value, dict) else None
+    if not isinstance(scores, dict):
+        return None
+    best = None
+    for letter, score in scores.items():
+        if isinstance(letter, str) and len(letter) == 1 and letter.upper() in "RIASEC" \
+                and isinstance(score, (int, float)) and (best is None or score > best[1]):
+            best = (letter.upper(), score)
+    return best[0] if best else None
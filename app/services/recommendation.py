@@ -0,0 +1,447 @@
+# app/services/recommendation.py
+"""
+Profile -> formation recommendations.
+
+The catalogue is compiled into NumPy arrays with one row per formation: spécialités and
+keywords (titre, débouchés métiers/secteurs) as sparse (row, column) index arrays, voie flags,
+type, price, coordinates and boursier share. Ranking one profile is a single vectorised pass
+over every formation followed by an argpartition top-k; there is no per-formation Python.
+
+Formations committed through this process are re-read individually (see catalogue_changes);
+changes made elsewhere are read from the catalogue change log, polled together with a
+count/max(id) signature every RECOMMENDATION_REFRESH_SECONDS.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import in_batches
+from app.core.metrics import RECOMMENDATION_DURATION, record_cache_lookup
+from app.models.Formation import (
+    Boursiers, DeboucheMetier, DeboucheSecteur, Formation, Lieu, SpecialiteFavorisee, VoieGenerale, VoiePro,
+    VoieTechnologique,
+)
+from app.services import catalogue_changes
+from app.services.admission import (
+    AdmissionArrays, AdmissionData, AdmissionEstimate, average_grade, bac_index, load_admission_data,
+)
+from app.services.text import fold, tokens
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each component in the final score (components are all in [0, 1])
+WEIGHTS = {
+    "specialites": 3.0,
+    "voie": 2.0,
+    "interets": 3.0,
+    "type_formation": 1.5,
+    "budget": 1.0,
+    "distance": 1.5,
+    "boursiers": 0.5,
+}
+VOIES = (VoieGenerale, VoieTechnologique, VoiePro)
+DEFAULT_RADIUS_KM = 50.0
+EARTH_RADIUS_KM = 6371.0
+
+
+def parse_json_list(value) -> List[str]:
+    """Voie specialities are JSON strings: a list, or a dict of lists keyed by filière."""
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    if not isinstance(value, str) or not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return []
+    if isinstance(parsed, dict):
+        return [str(v) for values in parsed.values() if isinstance(values, list) for v in values]
+    if isinstance(parsed, list):
+        return [str(v) for v in parsed]
+    return []
+
+
+def parse_coordinates(value: Optional[str]) -> Tuple[float, float]:
+    """"45.75, 4.85" -> (45.75, 4.85); (nan, nan) when missing or malformed."""
+    try:
+        lat, lon = (float(part) for part in (value or "").split(","))
+    except ValueError:
+        return math.nan, math.nan
+    return lat, lon
+
+
+def parse_budget(value: Optional[str]) -> float:
+    """User budget brackets ("0-1000", "1000-5000", "5000+") -> upper bound in euros."""
+    if not value:
+        return math.inf
+    text = value.replace(" ", "").replace("€", "")
+    if text.endswith("+"):
+        return math.inf
+    bounds = [float(part) for part in text.split("-") if part.replace(".", "", 1).isdigit()]
+    return max(bounds) if bounds else math.inf
+
+
+class Vocabulary:
+    """Append-only term -> column index map, shared by every compiled snapshot."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, term: str) -> int:
+        index = self._ids.get(term)
+        if index is None:
+            index = self._ids[term] = len(self._ids)
+        return index
+
+    def lookup(self, terms: Iterable[str], size: int) -> np.ndarray:
+        """Known column indices for `terms`, restricted to a snapshot compiled with `size` columns."""
+        found = {self._ids.get(t) for t in terms}
+        return np.fromiter((i for i in found if i is not None and i < size), dtype=np.int64)
+
+
+@dataclass
+class FormationFeatures:
+    id: int
+    titre: str = ""
+    etablissement: str = ""
+    type_formation: str = ""
+    ville: Optional[str] = None
+    prix_annuel: Optional[float] = None
+    latitude: float = math.nan
+    longitude: float = math.nan
+    boursiers: float = math.nan  # share of boursiers among admitted néo-bacheliers, 0..1
+    voies: List[bool] = field(default_factory=lambda: [False, False, False])
+    specialites: Set[str] = field(default_factory=set)
+    keywords: Set[str] = field(default_factory=set)
+    admission: AdmissionData = field(default_factory=AdmissionData)
+    # Vocabulary column indices, assigned once when the row is (re)loaded
+    specialite_ids: Tuple[int, ...] = ()
+    keyword_ids: Tuple[int, ...] = ()
+    type_id: int = -1
+
+
+def load_features(db: Session, ids: Optional[Iterable[int]] = None) -> Dict[int, FormationFeatures]:
+    """Read the scoring features with plain column queries (one per child table, IN-batched)."""
+    ids = sorted(ids) if ids is not None else None
+    rows: Dict[int, FormationFeatures] = {}
+    base = db.query(Formation.id, Formation.titre, Formation.etablissement, Formation.type_formation,
+                    Formation.prix_annuel)
+    for fid, titre, etablissement, type_formation, prix in in_batches(base, Formation.id, ids):
+        rows[fid] = FormationFeatures(
+            id=fid, titre=titre or "", etablissement=etablissement or "", type_formation=type_formation or "",
+            prix_annuel=prix, keywords=set(tokens(titre or "")),
+        )
+
+    for fid, ville, gps in in_batches(db.query(Lieu.formation_id, Lieu.ville, Lieu.gps_coordinates),
+                                    Lieu.formation_id, ids):
+        if fid in rows:
+            rows[fid].ville = ville
+            rows[fid].latitude, rows[fid].longitude = parse_coordinates(gps)
+
+    for fid, share in in_batches(db.query(Boursiers.formation_id, Boursiers.pourcentage_boursiers_neo_bacheliers),
+                               Boursiers.formation_id, ids):
+        if fid in rows and share is not None:
+            rows[fid].boursiers = float(share) / 100.0
+
+    for fid, specialite in in_batches(db.query(SpecialiteFavorisee.formation_id, SpecialiteFavorisee.specialite),
+                                    SpecialiteFavorisee.formation_id, ids):
+        if fid in rows and specialite:
+            rows[fid].specialites.add(fold(specialite))
+
+    for position, model in enumerate(VOIES):
+        for fid, specialities in in_batches(db.query(model.formation_id, model.specialities), model.formation_id, ids):
+            if fid in rows:
+                rows[fid].voies[position] = True
+                rows[fid].specialites.update(fold(s) for s in parse_json_list(specialities))
+
+    for model, column in ((DeboucheMetier, DeboucheMetier.metier), (DeboucheSecteur, DeboucheSecteur.secteur)):
+        for fid, text in in_batches(db.query(model.formation_id, column), model.formation_id, ids):
+            if fid in rows and text:
+                rows[fid].keywords.update(tokens(text))
+
+    for fid, admission in load_admission_data(db, ids).items():
+        if fid in rows:
+            rows[fid].admission = admission
+    return rows
+
+
+class _SparseRows:
+    """Binary (row, column) incidence matrix; hits(columns) counts the selected columns present in each row."""
+
+    def __init__(self, row_terms: Sequence[Sequence[int]], n_rows: int):
+        self.counts = np.fromiter((len(terms) for terms in row_terms), dtype=np.int64, count=n_rows)
+        self.columns = np.fromiter((c for terms in row_terms for c in terms), dtype=np.int64,
+                                   count=int(self.counts.sum()))
+        self.rows = np.repeat(np.arange(n_rows), self.counts)
+        self.n_rows = n_rows
+
+    def hits(self, columns: np.ndarray, n_columns: int) -> np.ndarray:
+        mask = np.zeros(n_columns, dtype=bool)
+        mask[columns] = True
+        selected = mask[self.columns]
+        return np.bincount(self.rows[selected], minlength=self.n_rows).astype(np.float64)
+
+
+class CatalogueMatrix:
+    """Immutable compiled snapshot of the catalogue features."""
+
+    def __init__(self, features: List[FormationFeatures], n_specialites: int, n_keywords: int, n_types: int):
+        n = len(features)
+        self.features = features
+        self.ids = np.fromiter((f.id for f in features), dtype=np.int64, count=n)
+        self.position = {f.id: i for i, f in enumerate(features)}
+        self.price = np.fromiter((math.nan if f.prix_annuel is None else f.prix_annuel for f in features), dtype=np.float64, count=n)
+        self.lat = np.radians(np.fromiter((f.latitude for f in features), dtype=np.float64, count=n))
+        self.lon = np.radians(np.fromiter((f.longitude for f in features), dtype=np.float64, count=n))
+        self.boursiers = np.fromiter((f.boursiers for f in features), dtype=np.float64, count=n)
+        self.voies = np.array([f.voies for f in features], dtype=bool).reshape(n, len(VOIES))
+        self.types = np.fromiter((f.type_id for f in features), dtype=np.int64, count=n)
+        self.specialites = _SparseRows([f.specialite_ids for f in features], n)
+        self.keywords = _SparseRows([f.keyword_ids for f in features], n)
+        self.admission = AdmissionArrays([f.admission for f in features])
+        self.keyword_norm = np.sqrt(np.maximum(self.keywords.counts, 1))
+        self.n_specialites, self.n_keywords, self.n_types = n_specialites, n_keywords, n_types
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+
+@dataclass
+class UserFeatures:
+    specialites: np.ndarray
+    keywords: np.ndarray
+    types: np.ndarray
+    voie: Optional[int]
+    grade: Optional[float]
+    budget: float
+    latitude: float
+    longitude: float
+    radius_km: float
+    est_boursier: bool
+
+
+@dataclass
+class Recommendation:
+    formation: FormationFeatures
+    score: float
+    details: Dict[str, Optional[float]]
+    distance_km: Optional[float] = None
+    admission: Optional[AdmissionEstimate] = None
+
+
+class RecommendationEngine:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.specialites = Vocabulary()
+        self.keywords = Vocabulary()
+        self.types = Vocabulary()
+        self._features: Dict[int, FormationFeatures] = {}
+        self._matrix: Optional[CatalogueMatrix] = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._changed: Set[int] = set()
+        self._deleted: Set[int] = set()
+        self._lock = threading.Lock()  # held by the refreshing thread
+        # Guards _changed/_deleted only: a committing writer never waits for a refresh
+        self._pending_lock = threading.Lock()
+        catalogue_changes.subscribe(self.notify)
+
+    # -- maintenance -------------------------------------------------------------------------
+    def notify(self, changed: Set[int], deleted: Set[int]) -> None:
+        with self._pending_lock:
+            self._changed |= changed
+            self._deleted |= deleted
+            self._changed -= deleted
+
+    def invalidate(self) -> None:
+        """Drop everything; the next request rebuilds from scratch."""
+        with self._lock:
+            self._matrix = None
+            self._features = {}
+
+    def _encode(self, features: Iterable[FormationFeatures]) -> None:
+        for f in features:
+            f.specialite_ids = tuple(self.specialites.add(s) for s in f.specialites)
+            f.keyword_ids = tuple(self.keywords.add(k) for k in f.keywords)
+            f.type_id = self.types.add(fold(f.type_formation))
+
+    @staticmethod
+    def _catalogue_signature(db: Session):
+        count, max_id = db.query(func.count(Formation.id), func.max(Formation.id)).one()
+        return count, max_id, catalogue_changes.catalogue_version(db)
+
+    def _stale(self) -> bool:
+        return (self._matrix is None or bool(self._changed) or bool(self._deleted)
+                or time.monotonic() - self._checked_at >= self.refresh_seconds)
+
+    def matrix(self, db: Session) -> CatalogueMatrix:
+        matrix = self._matrix
+        if not self._stale():
+            record_cache_lookup("recommendations", True)
+            return matrix
+        # Only one thread refreshes; the others keep ranking against the previous snapshot
+        if not self._lock.acquire(blocking=matrix is None):
+            record_cache_lookup("recommendations", True)
+            return matrix
+        try:
+            if self._stale():
+                self._refresh(db)
+            # A miss when this request waited for a rebuild
+            record_cache_lookup("recommendations", self._matrix is matrix)
+            return self._matrix
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session) -> None:
+        # Notifications arriving during the refresh stay pending for the next one
+        with self._pending_lock:
+            changed, deleted = self._changed, self._deleted
+            self._changed, self._deleted = set(), set()
+        try:
+            self._rebuild(db, changed, deleted)
+        except Exception:
+            with self._pending_lock:
+                self._changed |= changed - self._deleted
+                self._deleted |= deleted
+            raise
+
+    def _rebuild(self, db: Session, changed: Set[int], deleted: Set[int]) -> None:
+        start = time.perf_counter()
+        signature = self._catalogue_signature(db)
+        self._checked_at = time.monotonic()
+        if self._matrix is None:
+            self._features = load_features(db)
+            self._encode(self._features.values())
+            reloaded = len(self._features)
+        else:
+            if signature[2] != self._signature[2]:
+                for _, fid, was_deleted in catalogue_changes.changes_since(db, self._signature[2]):
+                    (deleted if was_deleted else changed).add(fid)
+                changed -= deleted
+            if signature[:2] != self._signature[:2]:
+                known = set(self._features)
+                current = {fid for (fid,) in db.query(Formation.id)}
+                changed |= current - known
+                deleted |= known - current
+            if not changed and not deleted:
+                self._signature = signature
+                return
+            for fid in deleted:
+                self._features.pop(fid, None)
+            fresh = load_features(db, changed) if changed else {}
+            self._encode(fresh.values())
+            for fid in changed - set(fresh):  # deleted after the notification
+                self._features.pop(fid, None)
+            self._features.update(fresh)
+            reloaded = len(fresh)
+        self._signature = signature
+        ordered = [self._features[fid] for fid in sorted(self._features)]
+        self._matrix = CatalogueMatrix(ordered, len(self.specialites), len(self.keywords), len(self.types))
+        logger.info("Recommendation matrix refreshed: %d formations, %d re-read in %.1f ms",
+                    len(ordered), reloaded, (time.perf_counter() - start) * 1000)
+
+    # -- scoring -----------------------------------------------------------------------------
+    def user_features(self, user, matrix: CatalogueMatrix) -> UserFeatures:
+        choices = user.orientation_choices or {}
+        interests = [t for key in ("domaines", "metiers") for value in choices.get(key) or [] for t in tokens(value)]
+        return UserFeatures(
+            specialites=self.specialites.lookup((fold(s) for s in user.specialites or []), matrix.n_specialites),
+            keywords=self.keywords.lookup(interests, matrix.n_keywords),
+            types=self.types.lookup((fold(t) for t in choices.get("types_formation") or []), matrix.n_types),
+            voie=bac_index(user.voie),
+            grade=average_grade(user.notes),
+            budget=parse_budget(user.budget),
+            latitude=math.nan if user.latitude is None else user.latitude,
+            longitude=math.nan if user.longitude is None else user.longitude,
+            radius_km=user.distance or DEFAULT_RADIUS_KM,
+            est_boursier=bool(user.est_boursier),
+        )
+
+    @staticmethod
+    def distances_km(matrix: CatalogueMatrix, latitude: float, longitude: float) -> np.ndarray:
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        a = (np.sin((matrix.lat - lat) / 2) ** 2
+             + math.cos(lat) * np.cos(matrix.lat) * np.sin((matrix.lon - lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def components(self, matrix: CatalogueMatrix, profile: UserFeatures) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Score components over the whole catalogue; components the profile cannot inform are omitted."""
+        n = len(matrix)
+        parts: Dict[str, np.ndarray] = {}
+        if profile.specialites.size:
+            hits = matrix.specialites.hits(profile.specialites, matrix.n_specialites)
+            parts["specialites"] = hits / profile.specialites.size
+        if profile.voie is not None:
+            parts["voie"] = matrix.voies[:, profile.voie].astype(np.float64)
+        if profile.keywords.size:
+            hits = matrix.keywords.hits(profile.keywords, matrix.n_keywords)
+            parts["interets"] = np.minimum(hits / (matrix.keyword_norm * math.sqrt(profile.keywords.size)), 1.0)
+        if profile.types.size:
+            parts["type_formation"] = np.isin(matrix.types, profile.types).astype(np.float64)
+        if math.isfinite(profile.budget):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(matrix.price > profile.budget, profile.budget / matrix.price, 1.0)
+            parts["budget"] = np.nan_to_num(ratio, nan=1.0)  # no known fee
+        distances = np.full(n, np.nan)
+        if not (math.isnan(profile.latitude) or math.isnan(profile.longitude)):
+            distances = self.distances_km(matrix, profile.latitude, profile.longitude)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                closeness = np.where(distances <= profile.radius_km, 1.0, profile.radius_km / distances)
+            parts["distance"] = np.nan_to_num(closeness, nan=0.5)  # formation without coordinates
+        if profile.est_boursier:
+            parts["boursiers"] = np.nan_to_num(matrix.boursiers, nan=0.0)
+        return parts, distances
+
+    def rank(self, matrix: CatalogueMatrix, profile: UserFeatures, limit: int) -> List[Recommendation]:
+        n = len(matrix)
+        if n == 0:
+            return []
+        parts, distances = self.components(matrix, profile)
+        total_weight = sum(WEIGHTS[name] for name in parts)
+        scores = np.zeros(n)
+        for name, values in parts.items():
+            scores += WEIGHTS[name] * values
+        if total_weight:
+            scores /= total_weight
+        k = min(limit, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((matrix.ids[top], -scores[top]))]
+        admissions = matrix.admission.estimates(top, profile.grade, profile.voie)
+        return [
+            Recommendation(
+                formation=matrix.features[i],
+                score=round(float(scores[i]), 4),
+                details={name: round(float(values[i]), 4) for name, values in parts.items()},
+                distance_km=None if math.isnan(distances[i]) else round(float(distances[i]), 1),
+                admission=admission,
+            )
+            for i, admission in zip(top, admissions)
+        ]
+
+    def recommend(self, db: Session, user, limit: int = 20) -> List[Recommendation]:
+        matrix = self.matrix(db)
+        with RECOMMENDATION_DURATION.time():
+            return self.rank(matrix, self.user_features(user, matrix), limit)
+
+    def admission(self, db: Session, user, formation_ids: Sequence[int]) -> Dict[int, AdmissionEstimate]:
+        """Admission estimates for `user` on the given formations (ids not yet in the matrix are skipped)."""
+        matrix = self.matrix(db)
+        known = [fid for fid in formation_ids if fid in matrix.position]
+        positions = np.fromiter((matrix.position[fid] for fid in known), dtype=np.int64, count=len(known))
+        estimates = matrix.admission.estimates(positions, average_grade(user.notes), bac_index(user.voie))
+        return dict(zip(known, estimates))
+
+
+recommendation_engine = RecommendationEngine(settings.RECOMMENDATION_REFRESH_SECONDS)
@@ -0,0 +1,303 @@
+# app/services/search.py
+"""
+French full-text search over the formation catalogue.
+
+Each formation is indexed with three weights, as in PostgreSQL's setweight():
+A titre, B établissement + search_keywords (matières, métiers, secteurs), C resume_programme.
+
+PostgreSQL: formations.search_vector is a generated tsvector using the french_unaccent text search
+configuration (french stemming after unaccent), with a GIN index. Queries use websearch_to_tsquery
+and are ranked with ts_rank. See ensure_search_schema(), which is applied by schema migration 4.
+
+Other databases (SQLite test runs): an in-process inverted index with the same weights, built on
+first use and kept current from the catalogue change log, like the recommendation matrix. Query
+terms are ANDed, and the last one also matches as a prefix (search-as-you-type).
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import SEARCH_DURATION, record_cache_lookup
+from app.models.Formation import DeboucheMetier, DeboucheSecteur, Formation, MatiereEnseignee
+from app.services import catalogue_changes
+from app.services.text import tokens
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "french_unaccent"
+# ts_rank's default weights for D, C, B, A are 0.1, 0.2, 0.4, 1.0
+FIELD_WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2}
+KEYWORD_COLUMNS = (MatiereEnseignee.matiere, DeboucheMetier.metier, DeboucheSecteur.secteur)
+MAX_PREFIX_EXPANSIONS = 50
+REFRESH_BATCH_SIZE = 500
+
+
+# ---------------------------------------------------------------------------
+# Schema / search_keywords maintenance
+# ---------------------------------------------------------------------------
+def _keywords_expression(dialect: str):
+    """Space-joined matières + métiers + secteurs of formations.id, as a correlated scalar expression."""
+    parts = []
+    for column in KEYWORD_COLUMNS:
+        table = column.class_
+        aggregate = func.string_agg(column, " ") if dialect == "postgresql" else func.group_concat(column, " ")
+        parts.append(func.coalesce(
+            select(aggregate).where(table.formation_id == Formation.id).scalar_subquery(), ""
+        ))
+    expression = parts[0]
+    for part in parts[1:]:
+        expression = expression + " " + part
+    return func.trim(expression)
+
+
+def refresh_search_keywords(conn: Connection, ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute formations.search_keywords from the child tables, for `ids` or every formation."""
+    statement = Formation.__table__.update().values(
+        search_keywords=_keywords_expression(conn.dialect.name)
+    )
+    if ids is None:
+        conn.execute(statement)
+        return
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        conn.execute(statement.where(Formation.id.in_(ids[start:start + REFRESH_BATCH_SIZE])))
+
+
+def ensure_search_schema(conn: Connection) -> None:
+    """PostgreSQL only: text search configuration, generated search_vector column and GIN index."""
+    has_unaccent = True
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS unaccent")
+    except Exception:
+        # Managed databases may refuse CREATE EXTENSION: keep French stemming, without accent folding
+        logger.warning("unaccent extension unavailable; full-text search will be accent-sensitive")
+        has_unaccent = False
+    exists = conn.execute(text("SELECT 1 FROM pg_ts_config WHERE cfgname = :name"), {"name": SEARCH_CONFIG}).first()
+    if not exists:
+        conn.exec_driver_sql(f"CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = french)")
+        if has_unaccent:
+            conn.exec_driver_sql(
+                f"ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem"
+            )
+    vector = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({source}, '')), '{weight}')"
+        for source, weight in (
+            ("titre", "A"),
+            ("coalesce(etablissement, '') || ' ' || coalesce(search_keywords, '')", "B"),
+            ("resume_programme", "C"),
+        )
+    )
+    conn.exec_driver_sql(
+        f"ALTER TABLE formations ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_formations_search_vector ON formations USING GIN (search_vector)"
+    )
+
+
+# ---------------------------------------------------------------------------
+# In-process inverted index
+# ---------------------------------------------------------------------------
+def stem(token: str) -> str:
+    """Very light French stemming, enough to match plurals: "sociaux" -> "social", "métiers" -> "metier"."""
+    if len(token) > 4 and token.endswith("aux"):
+        return token[:-3] + "al"
+    if len(token) > 3 and token[-1] in "sx":
+        return token[:-1]
+    return token
+
+
+def analyze(value: Optional[str]) -> List[str]:
+    return [stem(t) for t in tokens(value or "", min_length=2)]
+
+
+class InvertedIndex:
+    """term -> {formation id: weighted score}; documents can be replaced or removed one by one."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.documents: Dict[int, Tuple[str, ...]] = {}
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, formation_id: int, fields: Sequence[Tuple[Optional[str], str]]) -> None:
+        """Index `fields` as (text, weight letter) pairs, replacing any previous version."""
+        self.remove(formation_id)
+        scores: Dict[str, float] = {}
+        for value, weight in fields:
+            for term, count in Counter(analyze(value)).items():
+                scores[term] = scores.get(term, 0.0) + FIELD_WEIGHTS[weight] * (1.0 + math.log(count))
+        for term, score in scores.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._sorted_terms = None
+            postings[formation_id] = score
+        self.documents[formation_id] = tuple(scores)
+
+    def remove(self, formation_id: int) -> None:
+        for term in self.documents.pop(formation_id, ()):
+            postings = self.postings[term]
+            postings.pop(formation_id, None)
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+
+    def _prefix_postings(self, prefix: str) -> Dict[int, float]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        merged: Dict[int, float] = {}
+        start = bisect_left(self._sorted_terms, prefix)
+        for term in self._sorted_terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            for fid, score in self.postings[term].items():
+                if score > merged.get(fid, 0.0):
+                    merged[fid] = score
+        return merged
+
+    def search(self, query: str) -> Dict[int, float]:
+        """Formations matching every query term (the last one as a prefix too) -> summed score."""
+        raw = tokens(query, min_length=2)
+        if not raw:
+            return {}
+        lists = [self.postings.get(stem(t), {}) for t in raw[:-1]]
+        last = self.postings.get(stem(raw[-1]), {})
+        prefix = self._prefix_postings(raw[-1])
+        lists.append({**prefix, **last} if prefix else last)
+        lists.sort(key=len)  # intersect starting from the rarest term
+        results = dict(lists[0])
+        for postings in lists[1:]:
+            results = {fid: score + postings[fid] for fid, score in results.items() if fid in postings}
+            if not results:
+                break
+        return results
+
+
+def _document_rows(db: Session, ids: Optional[Sequence[int]] = None):
+    query = db.query(Formation.id, Formation.titre, Formation.etablissement, Formation.search_keywords,
+                     Formation.resume_programme)
+    if ids is None:
+        yield from query.yield_per(2000)
+        return
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        yield from query.filter(Formation.id.in_(ids[start:start + REFRESH_BATCH_SIZE]))
+
+
+class SearchEngine:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[InvertedIndex] = None
+        self._version = 0
+        self._checked_at = 0.0
+        self._changed: Set[int] = set()
+        self._deleted: Set[int] = set()
+        self._lock = threading.Lock()
+        catalogue_changes.subscribe(self.notify)
+
+    def notify(self, changed: Set[int], deleted: Set[int]) -> None:
+        with self._lock:
+            self._changed |= changed
+            self._deleted |= deleted
+            self._changed -= deleted
+
+    def _stale(self) -> bool:
+        return (self._index is None or bool(self._changed) or bool(self._deleted)
+                or time.monotonic() - self._checked_at >= self.refresh_seconds)
+
+    def index(self, db: Session) -> InvertedIndex:
+        index, version = self._index, self._version
+        if not self._stale():
+            record_cache_lookup("search", True)
+            return index
+        # Only one thread refreshes; the others keep the current index (and wait for in-place updates)
+        if not self._lock.acquire(blocking=index is None):
+            record_cache_lookup("search", True)
+            return index
+        try:
+            if self._stale():
+                self._refresh(db)
+            # A miss when this request waited for a build or an in-place update
+            record_cache_lookup("search", self._index is index and self._version == version)
+            return self._index
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session) -> None:
+        start = time.perf_counter()
+        version = catalogue_changes.catalogue_version(db)
+        self._checked_at = time.monotonic()
+        if self._index is None:
+            index = InvertedIndex()
+            for row in _document_rows(db):
+                index.add(row.id, self._fields(row))
+            self._index, self._version = index, version
+            self._changed, self._deleted = set(), set()
+            logger.info("Search index built: %d formations, %d terms in %.1f ms",
+                        len(index), len(index.postings), (time.perf_counter() - start) * 1000)
+            return
+        changed, deleted = self._changed, self._deleted
+        if version != self._version:
+            for _, fid, was_deleted in catalogue_changes.changes_since(db, self._version):
+                (deleted if was_deleted else changed).add(fid)
+        changed -= deleted
+        for fid in deleted:
+            self._index.remove(fid)
+        seen = set()
+        for row in _document_rows(db, sorted(changed)):
+            self._index.add(row.id, self._fields(row))
+            seen.add(row.id)
+        for fid in changed - seen:  # deleted after the notification
+            self._index.remove(fid)
+        self._changed, self._deleted = set(), set()
+        self._version = version
+
+    @staticmethod
+    def _fields(row) -> Tuple[Tuple[Optional[str], str], ...]:
+        return ((row.titre, "A"), (row.etablissement, "B"), (row.search_keywords, "B"), (row.resume_programme, "C"))
+
+    # -- queries -----------------------------------------------------------------------------
+    def search(self, db: Session, query: str, skip: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[int, float]]]:
+        """(total number of matches, [(formation id, score)] for the requested page, best first)."""
+        if db.get_bind().dialect.name == "postgresql":
+            with SEARCH_DURATION.labels("postgresql").time():
+                return self._search_postgresql(db, query, skip, limit)
+        index = self.index(db)
+        # Incremental refreshes mutate the index in place, so lookups share their lock
+        with SEARCH_DURATION.labels("memory").time(), self._lock:
+            matches = index.search(query)
+        page = heapq.nlargest(skip + limit, matches.items(), key=lambda item: (item[1], -item[0]))[skip:]
+        return len(matches), [(fid, round(score, 4)) for fid, score in page]
+
+    @staticmethod
+    def _search_postgresql(db: Session, query: str, skip: int, limit: int) -> Tuple[int, List[Tuple[int, float]]]:
+        rows = db.execute(text(
+            f"SELECT id, ts_rank(search_vector, q) AS rank, count(*) OVER () AS total "
+            f"FROM formations, websearch_to_tsquery('{SEARCH_CONFIG}', :query) AS q "
+            f"WHERE search_vector @@ q ORDER BY rank DESC, id LIMIT :limit OFFSET :skip"
+        ), {"query": query, "limit": limit, "skip": skip}).all()
+        if rows:
+            total = rows[0].total
+        else:  # past the last page: count separately
+            total = db.execute(text(
+                f"SELECT count(*) FROM formations WHERE search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', :query)"
+            ), {"query": query}).scalar() if skip else 0
+        return total, [(row.id, round(float(row.rank), 4)) for row in rows]
+
+
+search_engine = SearchEngine(settings.CATALOGUE_INDEX_REFRESH_SECONDS)
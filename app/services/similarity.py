@@ -0,0 +1,192 @@
+# app/services/similarity.py
+"""
+"Formations similaires", computed offline.
+
+Each formation becomes one sparse row made of weighted, separately L2-normalised blocks:
+
+    programme      TF-IDF of titre + resume_programme words (sublinear tf, smoothed idf)
+    matieres       IDF-weighted matières enseignées
+    debouches      IDF-weighted métiers and secteurs
+    type           type_formation, one-hot
+    lieu           ville, and académie with half the weight, one-hot
+
+so the dot product of two normalised rows is the weighted mean of the per-block cosines. Every row
+is compared with the whole catalogue in blocks of BLOCK_SIZE rows (one sparse x sparse product per
+block, densified only for that block) and the k best are kept with argpartition. The result
+replaces the formation_neighbors table in one transaction; see app.jobs.build_neighbors.
+"""
+import logging
+import math
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.orm import Session
+
+from app.models.catalogue import FormationNeighbor
+from app.models.Formation import DeboucheMetier, DeboucheSecteur, Formation, Lieu, MatiereEnseignee
+from app.services.text import fold, normalize, tokens
+
+logger = logging.getLogger(__name__)
+
+BLOCK_WEIGHTS = {
+    "programme": 3.0,
+    "matieres": 2.0,
+    "debouches": 2.0,
+    "type": 1.0,
+    "lieu": 0.5,
+}
+DEFAULT_NEIGHBORS = 10
+BLOCK_SIZE = 256  # rows per product: a 256 x catalogue float32 block, ~30 MB at 30k formations
+MIN_DOCUMENT_FREQUENCY = 2  # words seen in a single formation cannot relate it to another
+MIN_SCORE = 0.05
+INSERT_BATCH_SIZE = 5000
+
+
+class FeatureBlock:
+    """Sparse (formation row, feature) counts for one block, built term by term."""
+
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        self.rows: List[int] = []
+        self.terms: List[str] = []
+        self.values: List[float] = []
+
+    def add(self, row: int, counts: Dict[str, float]) -> None:
+        for term, value in counts.items():
+            self.rows.append(row)
+            self.terms.append(term)
+            self.values.append(value)
+
+    def matrix(self, idf: bool, sublinear: bool = False, min_df: int = 1) -> sp.csr_matrix:
+        """Rows L2-normalised; columns are weighted by smoothed idf when `idf`."""
+        vocabulary: Dict[str, int] = {}
+        columns = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in self.terms),
+                              dtype=np.int64, count=len(self.terms))
+        values = np.asarray(self.values, dtype=np.float64)
+        if sublinear:
+            values = 1.0 + np.log(values)
+        matrix = sp.csr_matrix((values, (np.asarray(self.rows, dtype=np.int64), columns)),
+                               shape=(self.n_rows, len(vocabulary)))
+        matrix.sum_duplicates()
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        if min_df > 1:
+            matrix = matrix[:, np.flatnonzero(df >= min_df)]
+            df = df[df >= min_df]
+        if idf:
+            matrix = matrix @ sp.diags(np.log((1.0 + self.n_rows) / (1.0 + df)) + 1.0)
+        return normalize_rows(matrix.tocsr())
+
+
+def normalize_rows(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.diags(1.0 / norms) @ matrix
+
+
+def _children(db: Session, column, rows: Dict[int, int]) -> Iterator[Tuple[int, str]]:
+    model = column.class_
+    for formation_id, value in db.query(model.formation_id, column).filter(column.isnot(None)).yield_per(5000):
+        if formation_id in rows and value:
+            yield rows[formation_id], value
+
+
+def build_feature_matrix(db: Session) -> Tuple[np.ndarray, sp.csr_matrix]:
+    """(formation ids, one L2-normalised feature row per formation)."""
+    formations = db.query(Formation.id, Formation.titre, Formation.resume_programme, Formation.type_formation) \
+        .order_by(Formation.id).all()
+    ids = np.array([f.id for f in formations], dtype=np.int64)
+    rows = {int(fid): row for row, fid in enumerate(ids)}
+    blocks = {name: FeatureBlock(len(ids)) for name in BLOCK_WEIGHTS}
+
+    for row, f in enumerate(formations):
+        words = tokens(f"{f.titre or ''} {f.resume_programme or ''}")
+        if words:
+            blocks["programme"].add(row, Counter(words))
+        if f.type_formation:
+            blocks["type"].add(row, {normalize(f.type_formation): 1.0})
+
+    matieres: Dict[int, Dict[str, float]] = {}
+    for row, value in _children(db, MatiereEnseignee.matiere, rows):
+        matieres.setdefault(row, {})[normalize(value)] = 1.0
+    debouches: Dict[int, Dict[str, float]] = {}
+    for row, value in _children(db, DeboucheMetier.metier, rows):
+        debouches.setdefault(row, {})["m:" + normalize(value)] = 1.0
+    for row, value in _children(db, DeboucheSecteur.secteur, rows):
+        debouches.setdefault(row, {})["s:" + normalize(value)] = 1.0
+    lieux: Dict[int, Dict[str, float]] = {}
+    for formation_id, ville, academy in db.query(Lieu.formation_id, Lieu.ville, Lieu.academy).yield_per(5000):
+        if formation_id in rows:
+            counts = lieux.setdefault(rows[formation_id], {})
+            if ville:
+                counts["v:" + fold(ville)] = 1.0
+            if academy:
+                counts["a:" + fold(academy)] = 0.5
+    for name, values in (("matieres", matieres), ("debouches", debouches), ("lieu", lieux)):
+        for row, counts in values.items():
+            blocks[name].add(row, counts)
+
+    matrices = [
+        blocks["programme"].matrix(idf=True, sublinear=True, min_df=MIN_DOCUMENT_FREQUENCY),
+        blocks["matieres"].matrix(idf=True),
+        blocks["debouches"].matrix(idf=True),
+        blocks["type"].matrix(idf=False),
+        blocks["lieu"].matrix(idf=False),
+    ]
+    total = sum(BLOCK_WEIGHTS.values())
+    weighted = [m * math.sqrt(BLOCK_WEIGHTS[name] / total) for name, m in zip(BLOCK_WEIGHTS, matrices)]
+    return ids, sp.hstack(weighted, format="csr", dtype=np.float32)
+
+
+def nearest_neighbors(features: sp.csr_matrix, k: int, block_size: int = BLOCK_SIZE,
+                      min_score: float = MIN_SCORE) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """(row, neighbour rows, scores) for every row, best first, excluding the row itself."""
+    n = features.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return
+    transposed = features.T.tocsc()
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        scores = (features[start:stop] @ transposed).toarray()
+        scores[np.arange(stop - start), np.arange(start, stop)] = -1.0  # not its own neighbour
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for offset in range(stop - start):
+            keep = top_scores[offset] >= min_score
+            yield start + offset, top[offset][keep], top_scores[offset][keep]
+
+
+def build_neighbors(db: Session, k: int = DEFAULT_NEIGHBORS, block_size: int = BLOCK_SIZE) -> int:
+    """Recompute formation_neighbors (replaced in the caller's transaction); returns the row count."""
+    started = time.perf_counter()
+    ids, features = build_feature_matrix(db)
+    logger.info("Feature matrix: %d formations x %d features, %d non-zeros in %.1f s",
+                features.shape[0], features.shape[1], features.nnz, time.perf_counter() - started)
+
+    table = FormationNeighbor.__table__
+    db.execute(table.delete())
+    batch: List[dict] = []
+    written = 0
+    for row, neighbors, scores in nearest_neighbors(features, k, block_size):
+        formation_id = int(ids[row])
+        batch.extend(
+            {"formation_id": formation_id, "rank": rank, "neighbor_id": int(ids[n]), "score": round(float(s), 4)}
+            for rank, (n, s) in enumerate(zip(neighbors, scores), start=1)
+        )
+        if len(batch) >= INSERT_BATCH_SIZE:
+            db.execute(table.insert(), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.execute(table.insert(), batch)
+        written += len(batch)
+    logger.info("formation_neighbors: %d rows for %d formations in %.1f s",
+                written, len(ids), time.perf_counter() - started)
+    return written
+
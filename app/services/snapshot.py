@@ -0,0 +1,273 @@
+# app/services/snapshot.py
+"""
+Downloadable catalogue snapshots.
+
+build_snapshot() copies the formations, their flattened child tables, académies and
+établissements into a standalone SQLite file (with lookup indexes, VACUUMed, gzip-compressed) and,
+when pyarrow is installed, into a zip of one Parquet file per table (zstd, child tables sorted by
+formation_id so row-group statistics act as an index). All tables are read in one transaction,
+streamed with server-side cursors. Files are named after their sha256, listed in manifest.json,
+and served as immutable downloads with Range support.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, Index, Integer, MetaData, String, Table, create_engine, select,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+from app.models.Academies import Academie, Etablissement
+from app.models.Formation import Formation, SousCritere
+from app.services.catalogue_changes import catalogue_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_FILE_PATTERN = re.compile(r"^catalogue-v(?P<version>\d+)-(?P<hash>[0-9a-f]{16})\.(sqlite\.gz|parquet\.zip)$")
+READ_BATCH_SIZE = 5000
+SNAPSHOT_TABLES: List[Table] = (
+    [Formation.__table__]
+    + [rel.mapper.local_table for rel in Formation.__mapper__.relationships]
+    + [SousCritere.__table__, Academie.__table__, Etablissement.__table__]
+)
+# Lookups an offline client does; the model indexes (unique url, établissement city, ...) come along
+EXTRA_INDEXES = {
+    "formations": [("titre",), ("type_formation",), ("etablissement",)],
+    "lieu": [("ville",), ("academy",)],
+    "sous_criteres": [("criteres_id",)],
+}
+
+
+@dataclass
+class SnapshotFile:
+    name: str
+    format: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class SnapshotManifest:
+    catalogue_version: int
+    generated_at: str
+    tables: Dict[str, int] = field(default_factory=dict)  # row counts
+    files: List[SnapshotFile] = field(default_factory=list)
+
+    def file(self, name: str) -> Optional[SnapshotFile]:
+        return next((f for f in self.files if f.name == name), None)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stream(conn: Connection, table: Table):
+    order = [table.c.formation_id, table.c.id] if "formation_id" in table.c else [table.c.id]
+    result = conn.execution_options(stream_results=True).execute(select(table).order_by(*order))
+    for rows in result.partitions(READ_BATCH_SIZE):
+        yield [dict(r._mapping) for r in rows]
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+def _sqlite_metadata() -> MetaData:
+    metadata = MetaData()
+    for table in SNAPSHOT_TABLES:
+        copy = table.to_metadata(metadata)
+        for column in copy.columns:
+            column.server_default = None  # now() defaults are not portable and never needed here
+        if "formation_id" in copy.c:
+            Index(f"ix_{copy.name}_formation_id", copy.c.formation_id)
+        for columns in EXTRA_INDEXES.get(copy.name, ()):
+            Index(f"ix_{copy.name}_{'_'.join(columns)}", *(copy.c[c] for c in columns))
+    Table("snapshot_meta", metadata, Column("key", String, primary_key=True), Column("value", String))
+    return metadata
+
+
+def build_sqlite(conn: Connection, path: str, version: int, generated_at: str) -> Dict[str, int]:
+    """Write the catalogue to a new SQLite database at `path`; returns row counts per table."""
+    metadata = _sqlite_metadata()
+    target = create_engine(f"sqlite:///{path}")
+    counts = {}
+    try:
+        with target.begin() as out:
+            # Indexes are created after the bulk copy
+            for table in metadata.sorted_tables:
+                out.execute(CreateTable(table))
+            for source in SNAPSHOT_TABLES:
+                table = metadata.tables[source.name]
+                counts[source.name] = 0
+                for rows in _stream(conn, source):
+                    out.execute(table.insert(), rows)
+                    counts[source.name] += len(rows)
+            out.execute(metadata.tables["snapshot_meta"].insert(), [
+                {"key": "catalogue_version", "value": str(version)},
+                {"key": "generated_at", "value": generated_at},
+            ])
+            for table in metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(out)
+        with target.connect() as out:
+            out.exec_driver_sql("ANALYZE")
+            out.exec_driver_sql("VACUUM")
+    finally:
+        target.dispose()
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Parquet (optional: pyarrow)
+# ---------------------------------------------------------------------------
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _arrow_schema(table: Table):
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us", tz="UTC")
+        return pa.string()
+
+    return pa.schema([(c.name, arrow_type(c)) for c in table.columns])
+
+
+def build_parquet(conn: Connection, path: str) -> None:
+    """One zstd Parquet file per table, zipped (stored: Parquet pages are already compressed)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    workdir = tempfile.mkdtemp(prefix="snapshot-parquet-")
+    try:
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as bundle:
+            for table in SNAPSHOT_TABLES:
+                schema = _arrow_schema(table)
+                file_path = os.path.join(workdir, f"{table.name}.parquet")
+                with pq.ParquetWriter(file_path, schema, compression="zstd") as writer:
+                    for rows in _stream(conn, table):
+                        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                bundle.write(file_path, f"{table.name}.parquet")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Build / read
+# ---------------------------------------------------------------------------
+def _publish(tmp_path: str, directory: str, stem: str, suffix: str, fmt: str) -> SnapshotFile:
+    sha = _sha256(tmp_path)
+    name = f"{stem}-{sha[:16]}{suffix}"
+    os.replace(tmp_path, os.path.join(directory, name))
+    return SnapshotFile(name=name, format=fmt, size=os.path.getsize(os.path.join(directory, name)), sha256=sha)
+
+
+def build_snapshot(engine, directory: Optional[str] = None, parquet: Optional[bool] = None,
+                   force: bool = False) -> SnapshotManifest:
+    """
+    Build every snapshot format from one consistent read and publish a new manifest. Nothing is
+    rebuilt when the published snapshot already has the current catalogue version, unless `force`.
+    """
+    directory = directory or settings.SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    parquet = parquet_available() if parquet is None else parquet
+    published = read_manifest(directory)
+    if published is not None and not force:
+        with engine.connect() as conn:
+            if catalogue_version(conn) == published.catalogue_version:
+                logger.info("Catalogue snapshot v%d is current", published.catalogue_version)
+                return published
+    generated_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    workdir = tempfile.mkdtemp(prefix="snapshot-", dir=directory)
+    try:
+        options = {"isolation_level": "REPEATABLE READ"} if engine.dialect.name == "postgresql" else {}
+        with engine.execution_options(**options).connect() as conn, conn.begin():
+            version = catalogue_version(conn)
+            stem = f"catalogue-v{version}"
+            manifest = SnapshotManifest(catalogue_version=version, generated_at=generated_at)
+
+            raw = os.path.join(workdir, "catalogue.sqlite")
+            manifest.tables = build_sqlite(conn, raw, version, generated_at)
+            compressed = raw + ".gz"
+            with open(raw, "rb") as src, gzip.open(compressed, "wb", compresslevel=9) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            manifest.files.append(_publish(compressed, directory, stem, ".sqlite.gz", "sqlite+gzip"))
+
+            if parquet:
+                bundle = os.path.join(workdir, "catalogue.parquet.zip")
+                build_parquet(conn, bundle)
+                manifest.files.append(_publish(bundle, directory, stem, ".parquet.zip", "parquet+zip"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    tmp_manifest = os.path.join(directory, MANIFEST_NAME + ".tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as fh:
+        json.dump(asdict(manifest), fh, ensure_ascii=False, indent=2)
+    os.replace(tmp_manifest, os.path.join(directory, MANIFEST_NAME))
+    _prune(directory, manifest, keep=settings.SNAPSHOT_KEEP)
+    logger.info("Catalogue snapshot v%d written: %s", version,
+                ", ".join(f"{f.name} ({f.size} bytes)" for f in manifest.files))
+    return manifest
+
+
+def _prune(directory: str, manifest: SnapshotManifest, keep: int) -> None:
+    """Keep the `keep` most recent catalogue versions; a rebuilt version replaces its older files."""
+    current = {f.name for f in manifest.files}
+    versions: Dict[int, List[str]] = {}
+    for name in os.listdir(directory):
+        match = SNAPSHOT_FILE_PATTERN.match(name)
+        if match and name not in current:
+            versions.setdefault(int(match.group("version")), []).append(name)
+    stale = versions.pop(manifest.catalogue_version, [])
+    for version in sorted(versions, reverse=True)[max(keep - 1, 0):]:
+        stale += versions[version]
+    for name in stale:
+        os.remove(os.path.join(directory, name))
+
+
+def read_manifest(directory: Optional[str] = None) -> Optional[SnapshotManifest]:
+    path = os.path.join(directory or settings.SNAPSHOT_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return None
+    files = [SnapshotFile(**f) for f in data.pop("files", [])]
+    return SnapshotManifest(files=files, **data)
+
+
+def snapshot_file(name: str, directory: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """(path, content hash prefix) of a published snapshot file, or None for unknown names."""
+    match = SNAPSHOT_FILE_PATTERN.match(name)
+    if not match:
+        return None
+    path = os.path.join(directory or settings.SNAPSHOT_DIR, name)
+    return (path, match.group("hash")) if os.path.isfile(path) else None
@@ -0,0 +1,33 @@
+# app/services/text.py
+# Text normalisation shared by the catalogue engines (matching, search, autocomplete).
+import re
+import unicodedata
+from typing import List
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+# Combining diacritical mark blocks: what NFKD splits off Latin letters
+_COMBINING = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]+")
+
+# Short French function words that carry no matching signal
+STOPWORDS = frozenset({
+    "les", "des", "aux", "une", "pour", "par", "sur", "dans", "avec", "sans", "et", "ou", "en", "de",
+    "du", "la", "le", "un", "au", "a", "d", "l", "s", "the", "and",
+})
+
+
+def fold(value: str) -> str:
+    """Lower-case and strip accents: "Économie-Gestion" -> "economie-gestion"."""
+    value = value or ""
+    if value.isascii():
+        return value.lower().strip()
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", value)).lower().strip()
+
+
+def normalize(value: str) -> str:
+    """Folded words separated by single spaces: " Lycée  Saint-Exupéry" -> "lycee saint exupery"."""
+    return " ".join(w for w in _NON_WORD.split(fold(value)) if w)
+
+
+def tokens(value: str, min_length: int = 3) -> List[str]:
+    """Accent-folded words, without stopwords and very short tokens."""
+    return [t for t in _NON_WORD.split(fold(value)) if len(t) >= min_length and t not in STOPWORDS]
@@ -0,0 +1,245 @@
+# benchmarks/generator.py
+"""
+Deterministic synthetic catalogue: N formations with every child table populated,
+académies with établissements, and users with an assigned plan and step progress.
+The same seed always produces the same rows, so runs are comparable.
+"""
+import json
+import random
+from datetime import date, datetime, timedelta
+
+from passlib.context import CryptContext
+
+from app.models.Academies import Academie, Etablissement
+from app.models.Formation import (
+    Formation, Lieu, SalaireBornes, Badge, FiliereBac, SpecialiteFavorisee, MatiereEnseignee, DeboucheMetier,
+    DeboucheSecteur, TsTauxParBac, IntervalsAdmis, CriteresCandidature, SousCritere, Boursiers, ProfilsAdmis,
+    PromoCharacteristics, PostFormationOutcomes, VoieGenerale, VoiePro, VoieTechnologique,
+)
+from app.models.PlanAction import PlanAction, PlanStep, UserStepProgress
+from app.models.user import User
+
+BENCH_PASSWORD = "benchmark-password"
+
+SPECIALITES = [
+    "Mathématiques", "Physique-Chimie", "SVT", "NSI", "SES", "HGGSP", "HLP", "LLCER Anglais",
+    "Sciences de l'ingénieur", "Arts plastiques", "Biologie-écologie", "Management",
+]
+FILIERES = ["Générale", "STMG", "STI2D", "ST2S", "STL", "Bac pro"]
+TYPES_FORMATION = ["Licence", "BTS", "BUT", "CPGE", "École d'ingénieur", "École de commerce", "Diplôme d'État"]
+TYPES_ETABLISSEMENT = ["Université", "Lycée", "IUT", "École privée", "École publique"]
+MATIERES = [
+    "Algorithmique", "Analyse", "Algèbre", "Comptabilité", "Droit", "Économie", "Marketing", "Biologie",
+    "Chimie", "Anglais", "Gestion de projet", "Statistiques", "Programmation", "Électronique", "Histoire",
+]
+METIERS = [
+    "Développeur", "Data scientist", "Infirmier", "Comptable", "Ingénieur", "Juriste", "Chef de projet",
+    "Enseignant", "Commercial", "Technicien de laboratoire", "Architecte", "Designer",
+]
+SECTEURS = ["Informatique", "Santé", "Finance", "Industrie", "Droit", "Éducation", "Commerce", "Recherche"]
+BADGES = ["Public", "Privé", "Alternance possible", "Internat", "Formation reconnue"]
+# (ville, région, département, académie, latitude, longitude)
+LIEUX = [
+    ("Paris", "Île-de-France", "Paris", "Paris", 48.8566, 2.3522),
+    ("Versailles", "Île-de-France", "Yvelines", "Versailles", 48.8049, 2.1204),
+    ("Lyon", "Auvergne-Rhône-Alpes", "Rhône", "Lyon", 45.7640, 4.8357),
+    ("Grenoble", "Auvergne-Rhône-Alpes", "Isère", "Grenoble", 45.1885, 5.7245),
+    ("Marseille", "Provence-Alpes-Côte d'Azur", "Bouches-du-Rhône", "Aix-Marseille", 43.2965, 5.3698),
+    ("Nice", "Provence-Alpes-Côte d'Azur", "Alpes-Maritimes", "Nice", 43.7102, 7.2620),
+    ("Toulouse", "Occitanie", "Haute-Garonne", "Toulouse", 43.6047, 1.4442),
+    ("Montpellier", "Occitanie", "Hérault", "Montpellier", 43.6108, 3.8767),
+    ("Bordeaux", "Nouvelle-Aquitaine", "Gironde", "Bordeaux", 44.8378, -0.5792),
+    ("Lille", "Hauts-de-France", "Nord", "Lille", 50.6292, 3.0573),
+    ("Nantes", "Pays de la Loire", "Loire-Atlantique", "Nantes", 47.2184, -1.5536),
+    ("Rennes", "Bretagne", "Ille-et-Vilaine", "Rennes", 48.1173, -1.6778),
+    ("Strasbourg", "Grand Est", "Bas-Rhin", "Strasbourg", 48.5734, 7.7521),
+    ("Dijon", "Bourgogne-Franche-Comté", "Côte-d'Or", "Dijon", 47.3220, 5.0415),
+]
+PLAN_STEPS = [
+    "mes infos de base", "définir mes préférences", "commencer l’exploration de formations",
+    "identifier mes intérêts professionnels", "explorer mes formations (2/2)",
+    "commencer ma liste de formations favorites",
+]
+RIASEC = "RIASEC"
+
+
+def _pct(rng: random.Random) -> str:
+    return f"{rng.randint(20, 98)} %"
+
+
+def _interval(rng: random.Random) -> str:
+    low = round(rng.uniform(8, 15), 1)
+    return f"{low} - {round(low + rng.uniform(1, 4), 1)}"
+
+
+def build_formation(rng: random.Random, i: int) -> Formation:
+    ville, region, departement, academy, lat, lon = rng.choice(LIEUX)
+    type_formation = rng.choice(TYPES_FORMATION)
+    matieres = rng.sample(MATIERES, 4)
+    metiers = rng.sample(METIERS, 3)
+    new_bac = rng.randint(10, 300)
+    total = new_bac + rng.randint(0, 100)
+    female = round(rng.uniform(10, 90), 1)
+    f = Formation(
+        timestamp=datetime(2025, 1, 1).isoformat(),
+        url=f"https://bench.example/formations/{i}",
+        titre=f"{type_formation} {matieres[0]} et {matieres[1]} — {ville} #{i}",
+        etablissement=f"{rng.choice(TYPES_ETABLISSEMENT)} de {ville} {i % 50}",
+        type_formation=type_formation,
+        type_etablissement=rng.choice(TYPES_ETABLISSEMENT),
+        formation_controlee_par_etat=rng.random() < 0.8,
+        apprentissage=rng.choice(["Oui", "Non"]),
+        prix_annuel=float(rng.choice([0, 170, 243, 380, 601, 3500, 8900, 12500])),
+        salaire_moyen=float(rng.randint(1500, 3800)),
+        poursuite_etudes=_pct(rng),
+        taux_insertion=_pct(rng),
+        lien_onisep=f"https://www.onisep.fr/bench/{i}",
+        resume_programme=" ".join(
+            f"Cours de {m.lower()} appliqués au secteur {rng.choice(SECTEURS).lower()}." for m in matieres
+        ),
+        duree=rng.choice(["2 ans", "3 ans", "5 ans"]),
+        formation_selective=rng.random() < 0.6,
+        taux_passage_2e_annee=_pct(rng),
+        acces_formation=rng.choice(["Parcoursup", "Concours", "Dossier"]),
+        pre_bac_admission_percentage=round(rng.uniform(0, 100), 1),
+        female_percentage=female,
+        new_bac_students_count=new_bac,
+        total_admitted_count=total,
+        complementary_phase_acceptance_percentage=round(rng.uniform(0, 100), 1),
+        taux_reussite_3_4_ans=_pct(rng),
+    )
+    f.lieu = Lieu(ville=ville, region=region, departement=departement, academy=academy,
+                  gps_coordinates=f"{lat + rng.uniform(-0.1, 0.1):.5f}, {lon + rng.uniform(-0.1, 0.1):.5f}")
+    f.salaire_bornes = SalaireBornes(min=f.salaire_moyen - 300, max=f.salaire_moyen + 600)
+    f.badges = [Badge(badge=b) for b in rng.sample(BADGES, 2)]
+    f.filieres_bac = [FiliereBac(filiere=x) for x in rng.sample(FILIERES, 2)]
+    f.specialites_favorisees = [SpecialiteFavorisee(specialite=x) for x in rng.sample(SPECIALITES, 3)]
+    f.matieres_enseignees = [MatiereEnseignee(matiere=m) for m in matieres]
+    f.debouches_metiers = [DeboucheMetier(metier=m) for m in metiers]
+    f.debouches_secteurs = [DeboucheSecteur(secteur=s) for s in rng.sample(SECTEURS, 2)]
+    f.ts_taux_par_bac = [TsTauxParBac(bac_type=b, taux=_pct(rng)) for b in ("Générale", "Technologique", "Professionnelle")]
+    f.intervalles_admis = [
+        IntervalsAdmis(interval_type=t, tle_generale=_interval(rng), tle_techno=_interval(rng), tle_pro=_interval(rng))
+        for t in ("Notes des admis", "Notes en spécialités")
+    ]
+    f.criteres_candidature = [
+        CriteresCandidature(
+            categorie=c, poids=float(rng.randint(10, 50)),
+            sous_criteres=[SousCritere(type="Essentiel", titre=f"{c} {k}", description="Critère généré.") for k in range(2)],
+        )
+        for c in ("Résultats académiques", "Motivation", "Savoir-être")
+    ]
+    f.boursiers = Boursiers(taux_minimum_boursiers=_pct(rng), pourcentage_boursiers_neo_bacheliers=round(rng.uniform(5, 40), 1))
+    general = round(rng.uniform(40, 90), 1)
+    techno = round(rng.uniform(0, 100 - general), 1)
+    f.profils_admis = [
+        ProfilsAdmis(bac_type="Bac général", percentage=general),
+        ProfilsAdmis(bac_type="Bac technologique", percentage=techno),
+        ProfilsAdmis(bac_type="Bac professionnel", percentage=round(100 - general - techno, 1)),
+    ]
+    f.promo_characteristics = PromoCharacteristics(new_bac_students_count=new_bac, female_percentage=female,
+                                                   total_admitted_count=total)
+    f.post_formation_outcomes = PostFormationOutcomes(poursuivent_etudes=_pct(rng), en_emploi=_pct(rng),
+                                                      autre_situation=_pct(rng))
+    f.voie_generale = VoieGenerale(filieres=json.dumps(["Générale"]),
+                                   specialities=json.dumps(rng.sample(SPECIALITES, 3), ensure_ascii=False))
+    if rng.random() < 0.5:
+        f.voie_technologique = VoieTechnologique(
+            filieres=json.dumps(rng.sample(FILIERES[1:5], 2)),
+            specialities=json.dumps({"STMG": rng.sample(SPECIALITES, 2)}, ensure_ascii=False),
+        )
+    if rng.random() < 0.3:
+        f.voie_pro = VoiePro(filieres=json.dumps(["Bac pro"]), specialities=json.dumps([]))
+    return f
+
+
+def build_user(rng: random.Random, i: int, password_hash: str, etablissements) -> User:
+    ville, region, departement, academy, lat, lon = rng.choice(LIEUX)
+    etab = rng.choice(etablissements) if etablissements else None
+    scores = {letter: rng.randint(0, 100) for letter in RIASEC}
+    return User(
+        email=f"bench.user{i}@bench.example",
+        password_hash=password_hash,
+        nom=f"Nom{i}",
+        prenom=f"Prénom{i}",
+        sexe=rng.choice(["M", "F"]),
+        date_naissance=date(2007, 1, 1) + timedelta(days=rng.randint(0, 730)),
+        niveau_scolaire="Terminale",
+        voie=rng.choice(["Générale", "Technologique", "Professionnelle"]),
+        specialites=rng.sample(SPECIALITES, 2),
+        filiere=rng.choice(FILIERES),
+        budget=rng.choice(["0-1000", "1000-5000", "5000+"]),
+        est_boursier=rng.random() < 0.3,
+        orientation_choices={
+            "domaines": rng.sample(SECTEURS, 2),
+            "metiers": rng.sample(METIERS, 2),
+            "types_formation": rng.sample(TYPES_FORMATION, 2),
+        },
+        riasec_differentiation={"scores": scores, "differentiation": max(scores.values()) - min(scores.values())},
+        preferences={"questions": [{"id": q, "answer": rng.randint(1, 5)} for q in range(20)]},
+        notes=[{"subject": m, "score": round(rng.uniform(6, 19), 1)} for m in rng.sample(MATIERES, 5)],
+        adresse=f"{i} rue de la République, {ville}",
+        distance=float(rng.choice([20, 50, 100, 300])),
+        latitude=lat,
+        longitude=lon,
+        etablissement=etab.etablissement if etab else None,
+        academie=academy,
+    )
+
+
+def attach_plan(db, rng: random.Random, user: User) -> None:
+    today = date(2025, 9, 1)
+    plan = PlanAction(nom=f"Plan d’action de {user.prenom}", start_date=today, end_date=today + timedelta(days=30))
+    plan.steps = [
+        PlanStep(titre=titre, description=titre, ordre=idx, start_date=today + timedelta(days=7 * (idx - 1)),
+                 end_date=today + timedelta(days=7 * (idx - 1) + 14))
+        for idx, titre in enumerate(PLAN_STEPS, start=1)
+    ]
+    db.add(plan)
+    db.flush()
+    user.plan_action_id = plan.id
+    for step in plan.steps:
+        done = rng.random() < 0.4
+        db.add(UserStepProgress(user_id=user.id, step_id=step.id, is_done=done,
+                                done_at=datetime(2025, 9, 2) if done else None))
+
+
+def seed(db, formations: int = 1000, academies: int = 10, etablissements_per_academie: int = 20,
+         users: int = 100, seed_value: int = 42, batch_size: int = 500, log=print) -> None:
+    """Populate an empty database. Row contents depend only on the arguments."""
+    rng = random.Random(seed_value)
+
+    for start in range(0, formations, batch_size):
+        db.add_all(build_formation(rng, i) for i in range(start, min(start + batch_size, formations)))
+        db.commit()
+        log(f"  formations: {min(start + batch_size, formations)}/{formations}")
+
+    etablissements = []
+    for a in range(academies):
+        ville, region, departement, academy, lat, lon = LIEUX[a % len(LIEUX)]
+        academie = Academie(name=f"{academy} {a}" if a >= len(LIEUX) else academy,
+                            url=f"https://bench.example/academies/{a}")
+        academie.etablissements = [
+            Etablissement(
+                etablissement=f"Lycée {rng.choice(['Victor Hugo', 'Jean Moulin', 'Marie Curie', 'Jules Ferry'])} {a}-{e}",
+                city=ville, sector=rng.choice(["Public", "Privé"]),
+                track=rng.choice(["Général", "Technologique", "Professionnel"]),
+                school_url=f"https://bench.example/etablissements/{a}/{e}",
+            )
+            for e in range(etablissements_per_academie)
+        ]
+        etablissements.extend(academie.etablissements)
+        db.add(academie)
+    db.commit()
+    log(f"  académies: {academies}, établissements: {academies * etablissements_per_academie}")
+
+    # bcrypt once; every synthetic user shares BENCH_PASSWORD
+    password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(BENCH_PASSWORD)
+    for start in range(0, users, batch_size):
+        batch = [build_user(rng, i, password_hash, etablissements) for i in range(start, min(start + batch_size, users))]
+        db.add_all(batch)
+        db.flush()
+        for user in batch:
+            attach_plan(db, rng, user)
+        db.commit()
+        log(f"  users: {min(start + batch_size, users)}/{users}")
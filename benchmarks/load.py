@@ -0,0 +1,182 @@
+# benchmarks/load.py
+"""
+Endpoint-level load scenarios. Each worker thread keeps one persistent HTTP/1.1 connection,
+so the numbers reflect server latency rather than connection setup. Queries per request are
+read from the Server-Timing header emitted by the SQL instrumentation middleware (SQL_SERVER_TIMING).
+"""
+import http.client
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from benchmarks.generator import BENCH_PASSWORD
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Sample:
+    label: str
+    seconds: float
+    status: int
+    queries: Optional[int]
+
+
+class HTTPClient:
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self._conn = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, label: str, method: str, path: str, body=None, token: Optional[str] = None):
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return Sample(label, time.perf_counter() - start, 0, None), None
+        elapsed = time.perf_counter() - start
+        match = _QUERIES.search(response.getheader("Server-Timing") or "")
+        return Sample(label, elapsed, response.status, int(match.group(1)) if match else None), payload
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Context:
+    """Shared, read-mostly state for scenarios (catalogue size, tokens, SMTP stand-in)."""
+
+    def __init__(self, formations: int, users: int, smtp=None, tokens: Optional[List[str]] = None):
+        self.formations = formations
+        self.users = users
+        self.smtp = smtp
+        self.tokens = tokens or []
+        self._registration_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_registration_id(self) -> int:
+        with self._lock:
+            return next(self._registration_ids)
+
+
+def catalogue_browse(prefix: str):
+    def scenario(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+        skip = rng.randint(0, max(ctx.formations - 10, 0))
+        return [client.request(f"{prefix} catalogue_browse", "GET", f"/api/{prefix}/formations/?skip={skip}&limit=10")[0]]
+    return scenario
+
+
+def formation_detail(prefix: str):
+    def scenario(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+        formation_id = rng.randint(1, ctx.formations)
+        return [client.request(f"{prefix} formation_detail", "GET", f"/api/{prefix}/formations/{formation_id}")[0]]
+    return scenario
+
+
+def reference_lists(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+    return [client.request("academies", "GET", "/api/auth/academies")[0]]
+
+
+def profile(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+    return [client.request("me", "GET", "/api/auth/me", token=rng.choice(ctx.tokens))[0]]
+
+
+def recommendations(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+    return [client.request("me/recommendations", "GET", "/api/auth/me/recommendations?limit=20",
+                           token=rng.choice(ctx.tokens))[0]]
+
+
+def login_burst(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+    email = f"bench.user{rng.randrange(ctx.users)}@bench.example"
+    return [client.request("login", "POST", "/api/auth/login", {"email": email, "password": BENCH_PASSWORD})[0]]
+
+
+def registration(client: HTTPClient, rng: random.Random, ctx: Context) -> List[Sample]:
+    email = f"bench.register{ctx.next_registration_id()}.{rng.randrange(10 ** 9)}@bench.example"
+    register, _ = client.request("register", "POST", "/api/auth/register", {
+        "email": email, "password": BENCH_PASSWORD, "nom": "Bench", "prenom": "Register",
+        "sexe": "F", "date_naissance": "2007-05-01",
+    })
+    samples = [register]
+    if register.status == 202:
+        code = ctx.smtp.wait_for_code(email)
+        if code is None:
+            samples.append(Sample("verify_registration", 0.0, 0, None))
+        else:
+            samples.append(client.request("verify_registration", "POST", "/api/auth/verify-registration",
+                                          {"email": email, "code": code})[0])
+    return samples
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "catalogue": catalogue_browse("auth"),
+    "catalogue_async": catalogue_browse("async"),
+    "detail": formation_detail("auth"),
+    "detail_async": formation_detail("async"),
+    "reference": reference_lists,
+    "profile": profile,
+    "recommendations": recommendations,
+    "login": login_burst,
+    "registration": registration,
+}
+
+
+def fetch_tokens(base_url: str, users: int, count: int) -> List[str]:
+    client = HTTPClient(base_url)
+    tokens = []
+    for i in range(min(count, users)):
+        sample, payload = client.request("setup login", "POST", "/api/auth/login",
+                                         {"email": f"bench.user{i}@bench.example", "password": BENCH_PASSWORD})
+        if sample.status == 200:
+            tokens.append(json.loads(payload)["access_token"])
+    client.close()
+    return tokens
+
+
+def run_scenario(base_url: str, scenario: Callable, ctx: Context, concurrency: int, iterations: int,
+                 seed: int = 0):
+    """Run `iterations` scenario executions across `concurrency` workers; returns (samples, wall seconds)."""
+    counter = itertools.count()
+    results: List[List[Sample]] = []
+
+    def worker(worker_id: int) -> List[Sample]:
+        rng = random.Random(seed * 1000 + worker_id)
+        client = HTTPClient(base_url)
+        samples: List[Sample] = []
+        try:
+            while next(counter) < iterations:
+                samples.extend(scenario(client, rng, ctx))
+        finally:
+            client.close()
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for samples in pool.map(worker, range(concurrency)):
+            results.append(samples)
+    wall = time.perf_counter() - start
+    return [s for samples in results for s in samples], wall
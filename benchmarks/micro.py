@@ -0,0 +1,101 @@
+# benchmarks/micro.py
+"""Microbenchmarks: response serialisation and the query shapes used by the formation endpoints."""
+import random
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import lazyload
+
+from app.api.formation.loaders import formation_detail_options
+from app.api.formation.schemas import FormationSchema
+from app.core.sql_instrumentation import collect_sql_stats
+from app.models.Formation import Formation
+from app.models.user import User
+from app.services.recommendation import RecommendationEngine
+from benchmarks.report import percentile
+
+# Relationships touched by the lazy-loading detail endpoint
+_RELATIONSHIPS = [
+    "lieu", "salaire_bornes", "badges", "filieres_bac", "specialites_favorisees", "matieres_enseignees",
+    "debouches_metiers", "debouches_secteurs", "ts_taux_par_bac", "intervalles_admis", "profils_admis",
+    "criteres_candidature", "boursiers", "promo_characteristics", "post_formation_outcomes",
+    "voie_generale", "voie_pro", "voie_technologique",
+]
+
+
+def _measure(session_factory, label: str, op: Callable, repeat: int) -> Dict:
+    timings: List[float] = []
+    queries: List[int] = []
+    for i in range(repeat):
+        db = session_factory()
+        try:
+            with collect_sql_stats() as stats:
+                start = time.perf_counter()
+                op(db, i)
+                timings.append(time.perf_counter() - start)
+            queries.append(stats.count)
+        finally:
+            db.close()
+    timings.sort()
+    return {
+        "label": label,
+        "runs": repeat,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "queries_per_op": round(sum(queries) / len(queries), 2),
+    }
+
+
+def run_microbenchmarks(session_factory, formations: int, repeat: int = 50, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    ids = [rng.randint(1, formations) for _ in range(repeat)]
+    pages = [rng.randint(0, max(formations - 10, 0)) for _ in range(repeat)]
+
+    def detail_lazy(db, i):
+        formation = db.query(Formation).options(lazyload("*")).filter(Formation.id == ids[i]).first()
+        for name in _RELATIONSHIPS:
+            getattr(formation, name)
+
+    def detail_selectin(db, i):
+        db.query(Formation).options(*formation_detail_options()).filter(Formation.id == ids[i]).first()
+
+    def page_lazy(db, i):
+        for formation in db.query(Formation).order_by(Formation.id).offset(pages[i]).limit(10).all():
+            FormationSchema.from_orm(formation)
+
+    def page_selectin(db, i):
+        db.query(Formation).options(*formation_detail_options()).order_by(Formation.id) \
+            .offset(pages[i]).limit(10).all()
+
+    # Serialisation is measured on preloaded objects so it excludes SQL entirely
+    db = session_factory()
+    page = db.query(Formation).options(*formation_detail_options()).order_by(Formation.id).limit(100).all()
+
+    def serialize_from_orm(_db, _i):
+        [FormationSchema.from_orm(f) for f in page]
+
+    def serialize_json(_db, _i):
+        [FormationSchema.from_orm(f).json() for f in page]
+
+    # Ranking only: the matrix is compiled once up front, as in the running API
+    engine = RecommendationEngine(refresh_seconds=float("inf"))
+    matrix = engine.matrix(db)
+    users = db.query(User).order_by(User.id).limit(repeat).all()
+
+    def recommend_rank(_db, i):
+        if users:
+            engine.rank(matrix, engine.user_features(users[i % len(users)], matrix), 20)
+
+    try:
+        return [
+            _measure(session_factory, "detail: lazy relationship loads", detail_lazy, repeat),
+            _measure(session_factory, "detail: selectinload options", detail_selectin, repeat),
+            _measure(session_factory, "page of 10: lazy (N+1)", page_lazy, repeat),
+            _measure(session_factory, "page of 10: selectinload options", page_selectin, repeat),
+            _measure(session_factory, "serialize 100: from_orm", serialize_from_orm, repeat),
+            _measure(session_factory, "serialize 100: from_orm + json", serialize_json, repeat),
+            _measure(session_factory, f"recommendations: rank {len(matrix)} formations, top 20", recommend_rank, repeat),
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+# benchmarks/report.py
+import json
+import math
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, wall_seconds: float) -> List[Dict]:
+    by_label = defaultdict(list)
+    for sample in samples:
+        by_label[sample.label].append(sample)
+    rows = []
+    for label, group in by_label.items():
+        ok = sorted(s.seconds for s in group if 200 <= s.status < 400)
+        queries = [s.queries for s in group if s.queries is not None]
+        rows.append({
+            "label": label,
+            "requests": len(group),
+            "errors": sum(1 for s in group if not 200 <= s.status < 400),
+            "throughput_rps": round(len(group) / wall_seconds, 1) if wall_seconds else None,
+            "p50_ms": round(percentile(ok, 50) * 1000, 2),
+            "p95_ms": round(percentile(ok, 95) * 1000, 2),
+            "p99_ms": round(percentile(ok, 99) * 1000, 2),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        })
+    return rows
+
+
+def format_table(title: str, rows: List[Dict]) -> str:
+    if not rows:
+        return f"{title}\n  (no samples)\n"
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    lines = [title, "  " + "  ".join(c.ljust(widths[c]) for c in columns)]
+    lines += ["  " + "  ".join(str(r[c]).ljust(widths[c]) for c in columns) for r in rows]
+    return "\n".join(lines) + "\n"
+
+
+def write_report(path: str, sections: Dict[str, List[Dict]], meta: Dict) -> str:
+    text = "\n".join(
+        [f"# benchmark run {json.dumps(meta, ensure_ascii=False)}\n"]
+        + [format_table(title, rows) for title, rows in sections.items()]
+    )
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    with open(path.rsplit(".", 1)[0] + ".json", "w", encoding="utf-8") as fh:
+        json.dump({"meta": meta, "sections": sections}, fh, ensure_ascii=False, indent=2)
+    return text
@@ -0,0 +1,116 @@
+# benchmarks/smtp_stub.py
+"""
+Local SMTP stand-in for the registration / reset scenarios. Speaks just enough SMTP for
+smtplib (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT), accepts every message
+and keeps the last verification code per recipient so the load driver can complete the flow.
+Run the app with EMAIL_USE_SSL=false, EMAIL_USE_STARTTLS=false and EMAIL_VERIFY_RECIPIENT=false.
+"""
+import email
+import re
+import socketserver
+import threading
+import time
+from typing import Dict, Optional
+
+# Both templates render the code as <div class="verification-code">123456</div>
+_CODE = re.compile(r'class="verification-code">\s*(\d{6})')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        mailbox: "SMTPStub" = self.server.mailbox
+        recipients = []
+        self._reply("220 bench-smtp ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-bench-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    self._reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line.decode(errors="replace"))
+                mailbox.deliver(recipients, "".join(lines))
+                self._reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _Server((host, port), _Handler)
+        self._server.mailbox = self
+        self.host, self.port = self._server.server_address
+        self._codes: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self.delivered = 0
+
+    @staticmethod
+    def _text_of(raw: str) -> str:
+        # The app sends a MIME message whose HTML part is usually base64-encoded
+        message = email.message_from_string(raw)
+        parts = [
+            part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+            for part in message.walk() if not part.is_multipart()
+        ]
+        return "\n".join(parts)
+
+    def deliver(self, recipients, raw: str) -> None:
+        match = _CODE.search(self._text_of(raw))
+        with self._cond:
+            self.delivered += 1
+            if match:
+                for rcpt in recipients:
+                    self._codes[rcpt.lower()] = match.group(1)
+            self._cond.notify_all()
+
+    def wait_for_code(self, address: str, timeout: float = 10.0) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while address.lower() not in self._codes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._codes.pop(address.lower())
+
+    def start(self) -> "SMTPStub":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()